@@ -90,6 +90,13 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
     self._updatingGUIFromParameterNode = False
     self._inputPointsNode = None
     self._dockWidgetAdded = False
+    self._liveAnalysis = None
+    self._liveAnalysisInputs = None
+    self._pointListInputs = None
+    self._pointListNumberOfDefinedControlPoints = None
+    self._pointListShowAllPointLabels = None
+    self._pendingReports = []
+    self._displayProxyModelNode = None
 
   def setup(self):
     """
@@ -125,11 +132,14 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
     self.pointListDockWidget = qt.QDockWidget("Orthodontic Analysis Points", mainWindow)
     self.pointListDockWidget.setObjectName("OrthodonticAnalysisPoints")
     self.pointListDockWidget.setFeatures(qt.QDockWidget.DockWidgetClosable + qt.QDockWidget.DockWidgetMovable + qt.QDockWidget.DockWidgetFloatable)
-    self.pointListTextBrowser = qt.QTextBrowser()
-    self.pointListTextBrowser.lineWrapMode = qt.QTextBrowser.NoWrap
-    self.pointListDockWidget.setWidget(self.pointListTextBrowser)
-    slicer.w=self.pointListDockWidget
-    slicer.t=self.pointListTextBrowser
+    # Each point is a row in the model, so that only rows of points that changed state need to be updated
+    self.pointListModel = qt.QStandardItemModel()
+    self.pointListView = qt.QListView()
+    self.pointListView.setModel(self.pointListModel)
+    self.pointListView.setEditTriggers(qt.QAbstractItemView.NoEditTriggers)
+    self.pointListView.setSelectionMode(qt.QAbstractItemView.NoSelection)
+    self.pointListView.setUniformItemSizes(True)
+    self.pointListDockWidget.setWidget(self.pointListView)
 
     # Connections
 
@@ -141,10 +151,37 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
     # (in the selected parameter node).
     self.analysisButtonGroup.connect("buttonClicked(QAbstractButton*)", self.updateParameterNodeFromGUI)
     self.ui.inputPointsSelector.connect("currentNodeChanged(vtkMRMLNode*)", self.updateParameterNodeFromGUI)
+    self.ui.inputFolderSelector.connect("currentItemChanged(vtkIdType)", self.updateParameterNodeFromGUI)
+    self.ui.longitudinalCheckBox.connect("toggled(bool)", self.updateParameterNodeFromGUI)
     self.ui.reportFolderPathLineEdit.connect("currentPathChanged(QString)", self.updateParameterNodeFromGUI)
+    self.ui.screenshotModeComboBox.connect("currentIndexChanged(int)", self.updateParameterNodeFromGUI)
+    self.ui.screenshotViewComboBox.connect("currentIndexChanged(int)", self.updateParameterNodeFromGUI)
+    self.ui.screenshotFormatComboBox.connect("currentIndexChanged(int)", self.updateParameterNodeFromGUI)
+    self.ui.screenshotQualitySliderWidget.connect("valueChanged(double)", self.updateParameterNodeFromGUI)
+    self.ui.profilingCheckBox.connect("toggled(bool)", self.updateParameterNodeFromGUI)
+    self.ui.snapModeComboBox.connect("currentIndexChanged(int)", self.updateParameterNodeFromGUI)
+    self.ui.snapModelSelector.connect("currentNodeChanged(vtkMRMLNode*)", self.updateParameterNodeFromGUI)
+    self.ui.snapRadiusSliderWidget.connect("valueChanged(double)", self.updateParameterNodeFromGUI)
+    self.ui.useDisplayProxyCheckBox.connect("toggled(bool)", self.updateParameterNodeFromGUI)
+    self.ui.proxyMaximumTrianglesSpinBox.connect("valueChanged(int)", self.updateParameterNodeFromGUI)
+    self.ui.templateTransformComboBox.connect("currentIndexChanged(int)", self.updateParameterNodeFromGUI)
+    self.ui.uncertaintyCheckBox.connect("toggled(bool)", self.updateParameterNodeFromGUI)
+    self.ui.landmarkErrorModelComboBox.connect("currentIndexChanged(int)", self.updateParameterNodeFromGUI)
+    self.ui.landmarkErrorSliderWidget.connect("valueChanged(double)", self.updateParameterNodeFromGUI)
+    self.ui.uncertaintySamplesSpinBox.connect("valueChanged(int)", self.updateParameterNodeFromGUI)
+    self.ui.archiveReportsCheckBox.connect("toggled(bool)", self.updateParameterNodeFromGUI)
+
+    # Surface model is displayed with reduced resolution while points are placed
+    self.ui.MarkupsPlaceWidget.connect("activeMarkupsPlaceModeChanged(bool)", self.onPlaceModeChanged)
 
     # Buttons
     self.ui.applyButton.connect('clicked(bool)', self.onApplyButton)
+    self.ui.preplaceButton.connect('clicked(bool)', self.onPreplaceButton)
+
+    # Reports are written in a background thread, this timer checks if they are completed
+    self.reportWriterTimer = qt.QTimer()
+    self.reportWriterTimer.setInterval(100)
+    self.reportWriterTimer.connect('timeout()', self.onReportWriterTimer)
 
     # Make sure parameter node is initialized (needed for module reload)
     self.initializeParameterNode()
@@ -165,6 +202,8 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
     Called when the application closes and the module widget is destroyed.
     """
     slicer.util.mainWindow().removeDockWidget(self.pointListDockWidget)
+    self.reportWriterTimer.stop()
+    self.logic.removeDisplayProxies()
     self.removeObservers()
 
   def enter(self):
@@ -181,6 +220,8 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
     # Do not react to parameter node changes (GUI wlil be updated when the user enters into the module)
     self.removeObserver(self._parameterNode, vtk.vtkCommand.ModifiedEvent, self.updateGUIFromParameterNode)
     self.showPointListWidget(False)
+    self.ui.MarkupsPlaceWidget.placeModeEnabled = False
+    self.updateDisplayProxy()
 
   def onSceneStartClose(self, caller, event):
     """
@@ -188,6 +229,10 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
     """
     # Parameter node will be reset, do not use it anymore
     self.setParameterNode(None)
+    # Models will be removed, do not keep their surface locators
+    self.logic.surfaceLocators.clear()
+    self.logic.removeDisplayProxies()
+    self._displayProxyModelNode = None
 
   def onSceneEndClose(self, caller, event):
     """
@@ -262,6 +307,10 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
         self.removeObserver(self._inputPointsNode, slicer.vtkMRMLMarkupsNode.PointRemovedEvent, self.onInputPointsModified)
         self.removeObserver(self._inputPointsNode, slicer.vtkMRMLMarkupsNode.PointPositionDefinedEvent, self.onInputPointsModified)
         self.removeObserver(self._inputPointsNode, slicer.vtkMRMLMarkupsNode.PointPositionUndefinedEvent, self.onInputPointsModified)
+        self.removeObserver(self._inputPointsNode, slicer.vtkMRMLMarkupsNode.PointPositionDefinedEvent, self.onInputPointPositionDefined)
+        for event in self.livePointEvents:
+          self.removeObserver(self._inputPointsNode, event, self.onInputPointPositionModified)
+        self.removeObserver(self._inputPointsNode, slicer.vtkMRMLMarkupsNode.PointRemovedEvent, self.onInputPointRemoved)
       self._inputPointsNode = inputPointsNode
       if inputPointsNode is not None:
         self.onInputPointsModified()
@@ -269,14 +318,68 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
         self.addObserver(inputPointsNode, slicer.vtkMRMLMarkupsNode.PointRemovedEvent, self.onInputPointsModified)
         self.addObserver(inputPointsNode, slicer.vtkMRMLMarkupsNode.PointPositionDefinedEvent, self.onInputPointsModified)
         self.addObserver(inputPointsNode, slicer.vtkMRMLMarkupsNode.PointPositionUndefinedEvent, self.onInputPointsModified)
+        self.addObserver(inputPointsNode, slicer.vtkMRMLMarkupsNode.PointPositionDefinedEvent, self.onInputPointPositionDefined)
+        # Live results are updated point by point (point removal may shift indices, so that requires full update)
+        for event in self.livePointEvents:
+          self.addObserver(inputPointsNode, event, self.onInputPointPositionModified)
+        self.addObserver(inputPointsNode, slicer.vtkMRMLMarkupsNode.PointRemovedEvent, self.onInputPointRemoved)
+
+    if self._liveAnalysisInputs != (analysisType, inputPointsNode):
+      self.updateLiveAnalysis()
 
     self.ui.inputPointsSelector.setCurrentNode(self._parameterNode.GetNodeReference("InputPoints"))
+    self.ui.inputFolderSelector.setCurrentItem(int(self._parameterNode.GetParameter("InputFolder") or 0))
+    self.ui.longitudinalCheckBox.checked = (self._parameterNode.GetParameter("Longitudinal") == "true")
+    self.ui.longitudinalCheckBox.enabled = bool(self._parameterNode.GetParameter("InputFolder"))
     self.addObserver(self._parameterNode, vtk.vtkCommand.ModifiedEvent, self.updateGUIFromParameterNode)
 
     self.ui.reportFolderPathLineEdit.currentPath = self._parameterNode.GetParameter("ReportFolder")
 
+    screenshotMode = self._parameterNode.GetParameter("ScreenshotMode")
+    self.ui.screenshotModeComboBox.currentText = screenshotMode
+    screenshotView = self._parameterNode.GetParameter("ScreenshotView")
+    if screenshotView not in self.logic.screenshotViews:
+      screenshotView = self.logic.defaultCaptureSettings["ScreenshotView"]
+    self.ui.screenshotViewComboBox.currentIndex = self.logic.screenshotViews.index(screenshotView)
+    self.ui.screenshotFormatComboBox.currentText = self._parameterNode.GetParameter("ScreenshotFormat")
+    self.ui.screenshotQualitySliderWidget.value = float(self._parameterNode.GetParameter("ScreenshotQuality"))
+    self.ui.screenshotViewComboBox.enabled = (screenshotMode != "None")
+    self.ui.screenshotFormatComboBox.enabled = (screenshotMode != "None")
+    self.ui.screenshotQualitySliderWidget.enabled = (screenshotMode != "None") and (self.ui.screenshotFormatComboBox.currentText != "PNG")
+    self.ui.profilingCheckBox.checked = (self._parameterNode.GetParameter("Profiling") == "true")
+    self.logic.timer.setProfilingEnabled(self.ui.profilingCheckBox.checked)
+    from OrthodonticAnalysisLib.SurfaceSnapping import snapModes
+    snapMode = self.getSnapMode()
+    self.ui.snapModeComboBox.currentIndex = snapModes.index(snapMode)
+    self.ui.snapModelSelector.setCurrentNode(self._parameterNode.GetNodeReference("SnapModel"))
+    self.ui.snapRadiusSliderWidget.value = float(self._parameterNode.GetParameter("SnapRadius"))
+    self.ui.snapRadiusSliderWidget.enabled = (snapMode == "Extremum")
+    self.ui.useDisplayProxyCheckBox.checked = (self._parameterNode.GetParameter("UseDisplayProxy") == "true")
+    self.ui.proxyMaximumTrianglesSpinBox.value = int(self._parameterNode.GetParameter("ProxyMaximumTriangles"))
+    self.ui.proxyMaximumTrianglesSpinBox.enabled = self.ui.useDisplayProxyCheckBox.checked
+    self.ui.templateTransformComboBox.currentText = self._parameterNode.GetParameter("TemplateTransform")
+    self.ui.uncertaintyCheckBox.checked = (self._parameterNode.GetParameter("UncertaintyAnalysis") == "true")
+    self.ui.landmarkErrorModelComboBox.currentText = self._parameterNode.GetParameter("LandmarkErrorModel")
+    self.ui.landmarkErrorSliderWidget.value = float(self._parameterNode.GetParameter("LandmarkError"))
+    self.ui.uncertaintySamplesSpinBox.value = int(self._parameterNode.GetParameter("UncertaintySamples"))
+    self.ui.landmarkErrorModelComboBox.enabled = self.ui.uncertaintyCheckBox.checked
+    self.ui.landmarkErrorSliderWidget.enabled = self.ui.uncertaintyCheckBox.checked
+    self.ui.uncertaintySamplesSpinBox.enabled = self.ui.uncertaintyCheckBox.checked
+    self.ui.archiveReportsCheckBox.checked = (self._parameterNode.GetParameter("ArchiveReports") == "true")
+    self.logic.archiveReports = self.ui.archiveReportsCheckBox.checked
+    self.updateDisplayProxy()
+
     # Update buttons states and tooltips
-    if self._parameterNode.GetNodeReference("InputPoints") and self._parameterNode.GetParameter("ReportFolder"):
+    self.ui.preplaceButton.enabled = bool(self._parameterNode.GetNodeReference("InputPoints")
+      and self._parameterNode.GetNodeReference("SnapModel"))
+    reportFolder = self._parameterNode.GetParameter("ReportFolder")
+    if reportFolder and self._parameterNode.GetParameter("InputFolder"):
+      if self._parameterNode.GetParameter("Longitudinal") == "true":
+        self.ui.applyButton.toolTip = "Compare analysis results of the visits in the batch input folder"
+      else:
+        self.ui.applyButton.toolTip = "Compute analysis results of all point lists in the batch input folder into a combined report"
+      self.ui.applyButton.enabled = True
+    elif reportFolder and self._parameterNode.GetNodeReference("InputPoints"):
       self.ui.applyButton.toolTip = "Compute analysis results"
       self.ui.applyButton.enabled = True
     else:
@@ -313,16 +416,43 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
       self.onInputPointsModified()
 
     self._parameterNode.SetNodeReferenceID("InputPoints", self.ui.inputPointsSelector.currentNodeID)
+    self._parameterNode.SetParameter("InputFolder", str(self.ui.inputFolderSelector.currentItem()) if self.ui.inputFolderSelector.currentItem() else "")
+    self._parameterNode.SetParameter("Longitudinal", "true" if self.ui.longitudinalCheckBox.checked else "false")
 
     self._parameterNode.SetParameter("ReportFolder", self.ui.reportFolderPathLineEdit.currentPath)
+    self._parameterNode.SetParameter("ScreenshotMode", self.ui.screenshotModeComboBox.currentText)
+    self._parameterNode.SetParameter("ScreenshotView", self.logic.screenshotViews[self.ui.screenshotViewComboBox.currentIndex])
+    self._parameterNode.SetParameter("ScreenshotFormat", self.ui.screenshotFormatComboBox.currentText)
+    self._parameterNode.SetParameter("ScreenshotQuality", str(int(self.ui.screenshotQualitySliderWidget.value)))
+    self._parameterNode.SetParameter("Profiling", "true" if self.ui.profilingCheckBox.checked else "false")
+    from OrthodonticAnalysisLib.SurfaceSnapping import snapModes
+    self._parameterNode.SetParameter("SnapMode", snapModes[self.ui.snapModeComboBox.currentIndex])
+    self._parameterNode.SetNodeReferenceID("SnapModel", self.ui.snapModelSelector.currentNodeID)
+    self._parameterNode.SetParameter("SnapRadius", str(self.ui.snapRadiusSliderWidget.value))
+    self._parameterNode.SetParameter("UseDisplayProxy", "true" if self.ui.useDisplayProxyCheckBox.checked else "false")
+    self._parameterNode.SetParameter("ProxyMaximumTriangles", str(self.ui.proxyMaximumTrianglesSpinBox.value))
+    self._parameterNode.SetParameter("TemplateTransform", self.ui.templateTransformComboBox.currentText)
+    self._parameterNode.SetParameter("UncertaintyAnalysis", "true" if self.ui.uncertaintyCheckBox.checked else "false")
+    self._parameterNode.SetParameter("LandmarkErrorModel", self.ui.landmarkErrorModelComboBox.currentText)
+    self._parameterNode.SetParameter("LandmarkError", str(self.ui.landmarkErrorSliderWidget.value))
+    self._parameterNode.SetParameter("UncertaintySamples", str(self.ui.uncertaintySamplesSpinBox.value))
+    self._parameterNode.SetParameter("ArchiveReports", "true" if self.ui.archiveReportsCheckBox.checked else "false")
 
     self._parameterNode.EndModify(wasModified)
 
   def onInputPointsModified(self, caller=None, event=None):
+    with self.logic.timer.stage("onInputPointsModified"):
+      self.updatePointList()
+
+  def updatePointList(self):
+    """
+    Update point list and control point labels to show which point has to be placed next.
+    """
     analysisType = self._parameterNode.GetParameter("AnalysisType")
     inputPointsNode = self._parameterNode.GetNodeReference("InputPoints")
     if (not analysisType) or (not inputPointsNode):
-      self.pointListTextBrowser.setPlainText("")
+      self.pointListModel.clear()
+      self._pointListInputs = None
       self.showPointListWidget(False)
       return
 
@@ -334,23 +464,47 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
     # (labels would occlude the model, which is distracting while marking)
     showAllPointLabels = (numberOfDefinedControlPoints >= len(pointNames))
 
-    pointDescription = "<html>\n<ol>\n"
-    for pointIndex, [shortName, longName] in enumerate(pointNames):
-      style = ""
-      if pointIndex < numberOfDefinedControlPoints:  
-        prefix = "&#x2611;"  # checked box (already placed)
+    if self._pointListInputs != (analysisType, inputPointsNode):
+      # Analysis type or input points changed, all rows and labels must be updated
+      self._pointListInputs = (analysisType, inputPointsNode)
+      self.pointListModel.clear()
+      for shortName, longName in pointNames:
+        self.pointListModel.appendRow(qt.QStandardItem())
+      rowsToUpdate = range(len(pointNames))
+      pointsToLabel = range(min(numberOfControlPoints, len(pointNames)))
+    else:
+      # Only the previously and currently placed points change state
+      previousNumberOfDefinedControlPoints = self._pointListNumberOfDefinedControlPoints
+      rowsToUpdate = range(min(previousNumberOfDefinedControlPoints, numberOfDefinedControlPoints),
+        min(max(previousNumberOfDefinedControlPoints, numberOfDefinedControlPoints) + 1, len(pointNames)))
+      if showAllPointLabels != self._pointListShowAllPointLabels:
+        pointsToLabel = range(min(numberOfControlPoints, len(pointNames)))
+      else:
+        pointsToLabel = [pointIndex for pointIndex in sorted({previousNumberOfDefinedControlPoints, numberOfDefinedControlPoints})
+          if pointIndex < min(numberOfControlPoints, len(pointNames))]
+    self._pointListNumberOfDefinedControlPoints = numberOfDefinedControlPoints
+    self._pointListShowAllPointLabels = showAllPointLabels
+
+    for pointIndex in rowsToUpdate:
+      shortName, longName = pointNames[pointIndex]
+      if pointIndex < numberOfDefinedControlPoints:
+        prefix = "\u2611"  # checked box (already placed)
       elif pointIndex == numberOfDefinedControlPoints:
-        prefix = "&raquo;"  # double-arrow (being placed)
-        style="font-weight: bold;"
+        prefix = "\u00bb"  # double-arrow (being placed)
       else:
-        prefix = "&#x2610;"  # empty box (to be placed)
-      pointDescription += '<li id="{0}"><div style="{1}">{2} {3} ({4})</div></li>\n'.format(shortName, style, prefix, longName, shortName)
-      if pointIndex < numberOfControlPoints:
-        # Only show label of the current point (unless markup is complete)
-        label = shortName if (showAllPointLabels or (pointIndex == numberOfDefinedControlPoints)) else ""
+        prefix = "\u2610"  # empty box (to be placed)
+      item = self.pointListModel.item(pointIndex)
+      item.setText("{0}. {1} {2} ({3})".format(pointIndex + 1, prefix, longName, shortName))
+      font = item.font()
+      font.setBold(pointIndex == numberOfDefinedControlPoints)
+      item.setFont(font)
+
+    for pointIndex in pointsToLabel:
+      # Only show label of the current point (unless markup is complete)
+      shortName = pointNames[pointIndex][0]
+      label = shortName if (showAllPointLabels or (pointIndex == numberOfDefinedControlPoints)) else ""
+      if inputPointsNode.GetNthControlPointLabel(pointIndex) != label:
         inputPointsNode.SetNthControlPointLabel(pointIndex, label)
-    pointDescription += "</html>\n"
-    self.pointListTextBrowser.setHtml(pointDescription)
 
     if numberOfDefinedControlPoints>=len(pointNames):
       # finished landmarking
@@ -360,12 +514,121 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
       # landmarking is in progress
       self.showPointListWidget(True)
       topPointShownInList = max(numberOfDefinedControlPoints - 3, 0)
-      self.pointListTextBrowser.scrollToAnchor(pointNames[topPointShownInList][0])
+      self.pointListView.scrollTo(self.pointListModel.index(topPointShownInList, 0), qt.QAbstractItemView.PositionAtTop)
+
+    if inputPointsNode.GetNumberOfControlPoints() > len(pointNames):
+      wasModified = inputPointsNode.StartModify()
+      while inputPointsNode.GetNumberOfControlPoints() > len(pointNames):
+        inputPointsNode.RemoveNthControlPoint(inputPointsNode.GetNumberOfControlPoints()-1)
+      inputPointsNode.EndModify(wasModified)
+
+  @property
+  def livePointEvents(self):
+    return [
+      slicer.vtkMRMLMarkupsNode.PointAddedEvent,
+      slicer.vtkMRMLMarkupsNode.PointModifiedEvent,
+      slicer.vtkMRMLMarkupsNode.PointPositionDefinedEvent,
+      slicer.vtkMRMLMarkupsNode.PointPositionUndefinedEvent,
+      ]
+
+  def updateLiveAnalysis(self):
+    """
+    Recompute all live results. Called when analysis type or input points node is changed.
+    """
+    from OrthodonticAnalysisLib.LiveAnalysis import LiveAnalysis
 
-    wasModified = inputPointsNode.StartModify()
-    while inputPointsNode.GetNumberOfControlPoints() > len(pointNames):
-      inputPointsNode.RemoveNthControlPoint(inputPointsNode.GetNumberOfControlPoints()-1)
-    inputPointsNode.EndModify(wasModified)
+    analysisType = self._parameterNode.GetParameter("AnalysisType") if self._parameterNode else ""
+    inputPointsNode = self._parameterNode.GetNodeReference("InputPoints") if self._parameterNode else None
+    self._liveAnalysisInputs = (analysisType, inputPointsNode)
+
+    tableWidget = self.ui.liveResultsTableWidget
+    if (not analysisType) or (not inputPointsNode):
+      self._liveAnalysis = None
+      tableWidget.setRowCount(0)
+      return
+
+    self._liveAnalysis = LiveAnalysis(analysisType, self.logic.getPointNames(analysisType))
+    positions = slicer.util.arrayFromMarkupsControlPoints(inputPointsNode)
+    defined = [inputPointsNode.GetNthControlPointPositionStatus(pointIndex) == slicer.vtkMRMLMarkupsNode.PositionDefined
+      for pointIndex in range(inputPointsNode.GetNumberOfControlPoints())]
+    self._liveAnalysis.setPoints(positions, defined)
+
+    tableWidget.setRowCount(len(self._liveAnalysis.names))
+    for row, name in enumerate(self._liveAnalysis.names):
+      tableWidget.setItem(row, 0, qt.QTableWidgetItem(name))
+      tableWidget.setItem(row, 1, qt.QTableWidgetItem(self._liveAnalysis.formatItem(row)))
+
+  @vtk.calldata_type(vtk.VTK_INT)
+  def onInputPointPositionModified(self, caller, event, pointIndex):
+    """
+    Update only those live results that depend on the modified point.
+    """
+    if self._liveAnalysis is None or pointIndex < 0 or pointIndex >= caller.GetNumberOfControlPoints():
+      return
+    position = None
+    if caller.GetNthControlPointPositionStatus(pointIndex) == slicer.vtkMRMLMarkupsNode.PositionDefined:
+      position = [0.0, 0.0, 0.0]
+      caller.GetNthControlPointPosition(pointIndex, position)
+    for row in self._liveAnalysis.updatePoint(pointIndex, position):
+      self.ui.liveResultsTableWidget.item(row, 1).setText(self._liveAnalysis.formatItem(row))
+
+  @vtk.calldata_type(vtk.VTK_INT)
+  def getSnapMode(self):
+    """
+    Return snap mode stored in the parameter node, "None" if the stored value is invalid
+    (e.g., a snap mode that is added in a later version of the module).
+    """
+    from OrthodonticAnalysisLib.SurfaceSnapping import snapModes
+    snapMode = self._parameterNode.GetParameter("SnapMode")
+    return snapMode if snapMode in snapModes else "None"
+
+  def onInputPointPositionDefined(self, caller, event, pointIndex):
+    """
+    Snap the newly placed point to the surface model (if snapping is enabled).
+    If a decimated copy of the surface model is displayed then the point is placed on the decimated surface,
+    therefore it is always projected to the full-resolution surface.
+    """
+    snapMode = self.getSnapMode()
+    modelNode = self._parameterNode.GetNodeReference("SnapModel")
+    if snapMode == "None" and modelNode and modelNode is self._displayProxyModelNode:
+      snapMode = "Surface"
+    if snapMode == "None" or not modelNode or pointIndex < 0 or pointIndex >= caller.GetNumberOfControlPoints():
+      return
+    try:
+      position = [0.0, 0.0, 0.0]
+      caller.GetNthControlPointPositionWorld(pointIndex, position)
+      snappedPosition = self.logic.snapPoint(position, modelNode, snapMode, float(self._parameterNode.GetParameter("SnapRadius")))
+      caller.SetNthControlPointPositionWorld(pointIndex, snappedPosition[0], snappedPosition[1], snappedPosition[2])
+    except Exception as e:
+      logging.error("Failed to snap point to model surface: {0}".format(e))
+
+  def onPlaceModeChanged(self, placeModeEnabled):
+    self.updateDisplayProxy()
+
+  def updateDisplayProxy(self):
+    """
+    Display decimated copy of the surface model while points are placed, and full-resolution model otherwise.
+    """
+    modelNode = None
+    if (self._parameterNode and self.ui.MarkupsPlaceWidget.placeModeEnabled
+      and self._parameterNode.GetParameter("UseDisplayProxy") == "true"):
+      modelNode = self._parameterNode.GetNodeReference("SnapModel")
+    if self._displayProxyModelNode and self._displayProxyModelNode is not modelNode:
+      self.logic.setDisplayProxyEnabled(self._displayProxyModelNode, False)
+      self._displayProxyModelNode = None
+    if not modelNode:
+      return
+    try:
+      if self.logic.setDisplayProxyEnabled(modelNode, True, int(self._parameterNode.GetParameter("ProxyMaximumTriangles"))):
+        self._displayProxyModelNode = modelNode
+      else:
+        self._displayProxyModelNode = None
+    except Exception as e:
+      logging.error("Failed to create decimated display of the surface model: {0}".format(e))
+
+  def onInputPointRemoved(self, caller=None, event=None):
+    # Indices of the points after the removed point are shifted, therefore all results are recomputed
+    self.updateLiveAnalysis()
 
   def onApplyButton(self):
     """
@@ -378,16 +641,71 @@ class OrthodonticAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMixi
       inputPointsNode = self._parameterNode.GetNodeReference("InputPoints")
       reportFolder = self._parameterNode.GetParameter("ReportFolder")
 
-      # Compute output
-      reportFilename = self.logic.compute(analysisType, inputPointsNode, reportFolder)
-      logging.info("Report generated: {0}".format(reportFilename))
-      qt.QDesktopServices.openUrl(qt.QUrl().fromLocalFile(reportFilename))
+      # Compute output (report is written in the background, it is opened when completed)
+      captureSettings = self.logic.getCaptureSettings(self._parameterNode)
+      uncertaintySettings = self.logic.getUncertaintySettings(self._parameterNode)
+      inputFolderItemID = int(self._parameterNode.GetParameter("InputFolder") or 0)
+      if inputFolderItemID:
+        # All point lists of the folder are computed together and written into a combined report
+        inputPointsNodes = self.logic.getInputPointsNodes(inputFolderItemID)
+        if not inputPointsNodes:
+          raise ValueError("No point lists are found in the selected folder")
+        with slicer.util.WaitCursor():
+          if self._parameterNode.GetParameter("Longitudinal") == "true":
+            # Point lists of the folder are visits of the same patient, the folder name is used as patient name
+            shNode = slicer.vtkMRMLSubjectHierarchyNode.GetSubjectHierarchyNode(slicer.mrmlScene)
+            self._pendingReports.append(self.logic.computeLongitudinalAsync(analysisType, inputPointsNodes, reportFolder,
+              shNode.GetItemName(inputFolderItemID)))
+          else:
+            self._pendingReports.append(self.logic.computeMultipleAsync(analysisType, inputPointsNodes, reportFolder, captureSettings,
+              uncertaintySettings))
+      else:
+        self._pendingReports.append(self.logic.computeAsync(analysisType, inputPointsNode, reportFolder, captureSettings,
+          uncertaintySettings))
+      self.reportWriterTimer.start()
 
     except Exception as e:
       slicer.util.errorDisplay("Failed to compute results: "+str(e))
       import traceback
       traceback.print_exc()
 
+  def onPreplaceButton(self):
+    """
+    Place all points of the analysis by registering the reference landmarks to the surface model.
+    """
+    inputPointsNode = self._parameterNode.GetNodeReference("InputPoints")
+    if inputPointsNode.GetNumberOfDefinedControlPoints() > 0:
+      if not slicer.util.confirmOkCancelDisplay("Points that are already placed will be replaced. Continue?"):
+        return
+    try:
+      with slicer.util.WaitCursor():
+        self.ui.MarkupsPlaceWidget.placeModeEnabled = False
+        registrationError = self.logic.preplacePoints(self._parameterNode.GetParameter("AnalysisType"), inputPointsNode,
+          self._parameterNode.GetNodeReference("SnapModel"), self._parameterNode.GetParameter("TemplateTransform"))
+      slicer.util.showStatusMessage("Points are pre-placed (registration error: {0:.2f}mm)".format(registrationError), 5000)
+    except Exception as e:
+      slicer.util.errorDisplay("Failed to pre-place points: "+str(e))
+      import traceback
+      traceback.print_exc()
+
+  def onReportWriterTimer(self):
+    """
+    Open reports that have been completely written.
+    """
+    for future in [future for future in self._pendingReports if future.done()]:
+      self._pendingReports.remove(future)
+      try:
+        reportFilename = future.result()
+      except Exception as e:
+        slicer.util.errorDisplay("Failed to write report: "+str(e))
+        continue
+      logging.info("Report generated: {0}".format(reportFilename))
+      self.logic.logTimings(self._parameterNode)
+      slicer.util.showStatusMessage("Report generated: {0}".format(reportFilename), 3000)
+      qt.QDesktopServices.openUrl(qt.QUrl().fromLocalFile(reportFilename))
+    if not self._pendingReports:
+      self.reportWriterTimer.stop()
+
 
 #
 # OrthodonticAnalysisLogic
@@ -409,99 +727,49 @@ class OrthodonticAnalysisLogic(ScriptedLoadableModuleLogic):
     """
     ScriptedLoadableModuleLogic.__init__(self)
 
-    self.pointsPeckAndPeck = [
-      ["32-D", "Distal point of Tooth 32"], ["32-M", "Mesial point of Tooth 32"], ["32-V", "Vestibular point of Tooth 32"], ["32-L", "Lingual point of Tooth 32"],
-      ["31-D", "Distal point of Tooth 31"], ["31-M", "Mesial point of Tooth 31"], ["31-V", "Vestibular point of Tooth 31"], ["31-L", "Lingual point of Tooth 31"],
-      ["41-D", "Distal point of Tooth 41"], ["41-M", "Mesial point of Tooth 41"], ["41-V", "Vestibular point of Tooth 41"], ["41-L", "Lingual point of Tooth 41"],
-      ["42-D", "Distal point of Tooth 42"], ["42-M", "Mesial point of Tooth 42"], ["42-V", "Vestibular point of Tooth 42"], ["42-L", "Lingual point of Tooth 42"],
-    ]
-
-    self.pointsBolton = [
-      ["16-D", "Distal point of Tooth 16"],  ["16-M", "Mesial point of Tooth 16"],
-      ["15-D", "Distal point of Tooth 15"],  ["15-M", "Mesial point of Tooth 15"],
-      ["14-D", "Distal point of Tooth 14"],  ["14-M", "Mesial point of Tooth 14"],
-      ["13-D", "Distal point of Tooth 13"],  ["13-M", "Mesial point of Tooth 13"],
-      ["12-D", "Distal point of Tooth 12"],  ["12-M", "Mesial point of Tooth 12"],
-      ["11-D", "Distal point of Tooth 11"],  ["11-M", "Mesial point of Tooth 11"],
-      ["21-M", "Mesial point of Tooth 21"],  ["21-D", "Distal point of Tooth 21"],
-      ["22-M", "Mesial point of Tooth 22"],  ["22-D", "Distal point of Tooth 22"],
-      ["23-M", "Mesial point of Tooth 23"],  ["23-D", "Distal point of Tooth 23"],
-      ["24-M", "Mesial point of Tooth 24"],  ["24-D", "Distal point of Tooth 24"],
-      ["25-M", "Mesial point of Tooth 25"],  ["25-D", "Distal point of Tooth 25"],
-      ["26-M", "Mesial point of Tooth 26"],  ["26-D", "Distal point of Tooth 26"],
-      ["36-D", "Distal point of Tooth 36"],  ["36-M", "Mesial point of Tooth 36"],
-      ["35-D", "Distal point of Tooth 35"],  ["35-M", "Mesial point of Tooth 35"],
-      ["34-D", "Distal point of Tooth 34"],  ["34-M", "Mesial point of Tooth 34"],
-      ["33-D", "Distal point of Tooth 33"],  ["33-M", "Mesial point of Tooth 33"],
-      ["32-D", "Distal point of Tooth 32"],  ["32-M", "Mesial point of Tooth 32"],
-      ["31-D", "Distal point of Tooth 31"],  ["31-M", "Mesial point of Tooth 31"],
-      ["41-M", "Mesial point of Tooth 41"],  ["41-D", "Distal point of Tooth 41"],
-      ["42-M", "Mesial point of Tooth 42"],  ["42-D", "Distal point of Tooth 42"],
-      ["43-M", "Mesial point of Tooth 43"],  ["43-D", "Distal point of Tooth 43"],
-      ["44-M", "Mesial point of Tooth 44"],  ["44-D", "Distal point of Tooth 44"],
-      ["45-M", "Mesial point of Tooth 45"],  ["45-D", "Distal point of Tooth 45"],
-      ["46-M", "Mesial point of Tooth 46"],  ["46-D", "Distal point of Tooth 46"],
-    ]
-
-    pointsInferiorMid = [
-      ["35-34-D", "Distal point of Teeth segment 35-34"],
-      ["35-34-M-33-D", "Mesial point of Teeth segment 35-34 and Distal of Tooth 33"],
-      ["33-MS", "Mesial point of Tooth segment 33"],
-      ["IAM", "Inferior Arch Midpoint"],
-      ["43-MS", "Mesial point of Tooth segment 43"],
-      ["45-44-M-43-D", "Mesial point of Teeth segment 45-44 and Distal of Tooth 43"],
-      ["45-44-D", "Distal point of Teeth segment 45-44"],
-    ]
-
-    self.pointsInferiorSpace = [
-      ["35-D", "Distal point of Tooth 35"],  ["35-M", "Mesial point of Tooth 35"],
-      ["34-D", "Distal point of Tooth 34"],  ["34-M", "Mesial point of Tooth 34"],
-      ["33-D", "Distal point of Tooth 33"],  ["33-M", "Mesial point of Tooth 33"],
-      ["32-D", "Distal point of Tooth 32"],  ["32-M", "Mesial point of Tooth 32"],
-      ["31-D", "Distal point of Tooth 31"],  ["31-M", "Mesial point of Tooth 31"],
-      ["41-M", "Mesial point of Tooth 41"],  ["41-D", "Distal point of Tooth 41"],
-      ["42-M", "Mesial point of Tooth 42"],  ["42-D", "Distal point of Tooth 42"],
-      ["43-M", "Mesial point of Tooth 43"],  ["43-D", "Distal point of Tooth 43"],
-      ["44-M", "Mesial point of Tooth 44"],  ["44-D", "Distal point of Tooth 44"],
-      ["45-M", "Mesial point of Tooth 45"],  ["45-D", "Distal point of Tooth 45"],
-    ]
-    self.pointsInferiorSpace.extend(pointsInferiorMid)
-
-    pointsSuperiorMid = [
-      ["15-14-D", "Distal point of Teeth segment 15-14"],
-      ["15-14-M-13-D", "Mesial point of Teeth segment 15-14 and Distal of Tooth 13"],
-      ["13-MS", "Mesial point of Tooth segment 13"],
-      ["SAM", "Superior Arch Midpoint"],
-      ["23-MS", "Mesial point of Tooth segment 23"],
-      ["25-24-M-23-D", "Mesial point of Teeth segment 25-24 and Distal of Tooth 23"],
-      ["25-24-D", "Distal point of Teeth segment 25-24"],
-    ]
-
-    self.pointsSuperiorSpace = [
-      ["15-D", "Distal point of Tooth 15"],  ["15-M", "Mesial point of Tooth 15"],
-      ["14-D", "Distal point of Tooth 14"],  ["14-M", "Mesial point of Tooth 14"],
-      ["13-D", "Distal point of Tooth 13"],  ["13-M", "Mesial point of Tooth 13"],
-      ["12-D", "Distal point of Tooth 12"],  ["12-M", "Mesial point of Tooth 12"],
-      ["11-D", "Distal point of Tooth 11"],  ["11-M", "Mesial point of Tooth 11"],
-      ["21-M", "Mesial point of Tooth 21"],  ["21-D", "Distal point of Tooth 21"],
-      ["22-M", "Mesial point of Tooth 22"],  ["22-D", "Distal point of Tooth 22"],
-      ["23-M", "Mesial point of Tooth 23"],  ["23-D", "Distal point of Tooth 23"],
-      ["24-M", "Mesial point of Tooth 24"],  ["24-D", "Distal point of Tooth 24"],
-      ["25-M", "Mesial point of Tooth 25"],  ["25-D", "Distal point of Tooth 25"],
-    ]
-    self.pointsSuperiorSpace.extend(pointsSuperiorMid)
-
-    self.pointsAll = []
-    self.pointsAll.extend(self.pointsBolton)
-    self.pointsAll.extend(pointsSuperiorMid)
-    self.pointsAll.extend(pointsInferiorMid)
-    # Peck and Peck without medial-distal points
-    self.pointsAll.extend([
-      ["32-V", "Vestibular point of Tooth 32"], ["32-L", "Lingual point of Tooth 32"],
-      ["31-V", "Vestibular point of Tooth 31"], ["31-L", "Lingual point of Tooth 31"],
-      ["41-V", "Vestibular point of Tooth 41"], ["41-L", "Lingual point of Tooth 41"],
-      ["42-V", "Vestibular point of Tooth 42"], ["42-L", "Lingual point of Tooth 42"],
-    ])
+    self._reportWriter = None
+    self._resultCache = None
+    self._surfaceLocators = None
+    self._modelProxies = None
+    self._resultStores = {}  # report folder -> ResultStore
+    self._reportArchives = {}  # report folder -> ReportArchive
+    self._reportIndices = {}  # report folder -> ReportIndex
+    self._displayProxyNodes = {}  # model node ID -> decimated display model node
+
+    # If enabled then reports are stored in the content-addressed archive of the report folder instead of separate files
+    # (see OrthodonticAnalysisLib.ReportArchive), and reports are opened from the report view folder
+    self.archiveReports = False
+
+    # Time of each processing stage is measured (see logTimings)
+    from OrthodonticAnalysisLib.StageTimer import StageTimer
+    self.timer = StageTimer()
+
+    # Screenshot capture settings (parameter node values are stored as strings)
+    self.screenshotModes = ["None", "Thumbnail", "Full"]
+    self.screenshotViews = ["AllViews", "3DView"]
+    self.defaultCaptureSettings = {
+      "ScreenshotMode": "Full",
+      "ScreenshotView": "AllViews",
+      "ScreenshotFormat": "PNG",
+      "ScreenshotQuality": 90,
+      "ScreenshotThumbnailSize": 400,
+      }
+
+    # Landmark uncertainty analysis settings (see OrthodonticAnalysisLib.UncertaintyAnalysis)
+    self.defaultUncertaintySettings = {
+      "UncertaintyAnalysis": "false",
+      "LandmarkErrorModel": "Gaussian",
+      "LandmarkError": 0.3,
+      "UncertaintySamples": 2000,
+      }
+
+    # Point lists of all analysis types are defined in OrthodonticAnalysisLib.AnalysisPoints
+    from OrthodonticAnalysisLib import AnalysisPoints
+    self.pointsPeckAndPeck = AnalysisPoints.pointsPeckAndPeck
+    self.pointsBolton = AnalysisPoints.pointsBolton
+    self.pointsInferiorSpace = AnalysisPoints.pointsInferiorSpace
+    self.pointsSuperiorSpace = AnalysisPoints.pointsSuperiorSpace
+    self.pointsAll = AnalysisPoints.pointsAll
 
   def setDefaultParameters(self, parameterNode):
     """
@@ -511,21 +779,32 @@ class OrthodonticAnalysisLogic(ScriptedLoadableModuleLogic):
       parameterNode.SetParameter("AnalysisType", "Superior")
     if not parameterNode.GetParameter("ReportFolder"):
       parameterNode.SetParameter("ReportFolder", slicer.app.defaultScenePath)
+    for name, value in self.defaultCaptureSettings.items():
+      if not parameterNode.GetParameter(name):
+        parameterNode.SetParameter(name, str(value))
+    if not parameterNode.GetParameter("Profiling"):
+      parameterNode.SetParameter("Profiling", "false")
+    if not parameterNode.GetParameter("Longitudinal"):
+      parameterNode.SetParameter("Longitudinal", "false")
+    if not parameterNode.GetParameter("ArchiveReports"):
+      parameterNode.SetParameter("ArchiveReports", "false")
+    if not parameterNode.GetParameter("SnapMode"):
+      parameterNode.SetParameter("SnapMode", "None")
+    if not parameterNode.GetParameter("SnapRadius"):
+      parameterNode.SetParameter("SnapRadius", "1.0")
+    if not parameterNode.GetParameter("UseDisplayProxy"):
+      parameterNode.SetParameter("UseDisplayProxy", "true")
+    if not parameterNode.GetParameter("ProxyMaximumTriangles"):
+      parameterNode.SetParameter("ProxyMaximumTriangles", "200000")
+    if not parameterNode.GetParameter("TemplateTransform"):
+      parameterNode.SetParameter("TemplateTransform", "Similarity")
+    for name, value in self.defaultUncertaintySettings.items():
+      if not parameterNode.GetParameter(name):
+        parameterNode.SetParameter(name, str(value))
 
   def getPointNames(self, analysisType):
-    if analysisType == "Superior":
-      pointList = self.pointsSuperiorSpace
-    elif analysisType == "Inferior":
-      pointList = self.pointsInferiorSpace
-    elif analysisType == "Bolton":
-      pointList = self.pointsBolton
-    elif analysisType == "PeckAndPeck":
-      pointList = self.pointsPeckAndPeck
-    elif analysisType == "All":
-      pointList = self.pointsAll
-    else:
-      raise ValueError("Invalid analysisType: {0}".format(analysisType))
-    return pointList
+    from OrthodonticAnalysisLib.AnalysisPoints import getPointNames
+    return getPointNames(analysisType)
 
   def getLabeledPoints(self, labels, markupsPointNode):
     """
@@ -545,345 +824,739 @@ class OrthodonticAnalysisLogic(ScriptedLoadableModuleLogic):
         return None
     return np.linalg.norm(labeledPoints[label1]-labeledPoints[label2])
 
-  def compute(self, analysisType, inputPointsNode, reportFolder):
-    from time import gmtime, strftime
-    timestamp = strftime("%Y%m%d-%H%M%S", gmtime())
-    reportFilename = "{0}/OrthodonticAnalysis-{1}-{2}.html".format(reportFolder, analysisType, timestamp)
-    reportScreenshotFilenameName = "OrthodonticAnalysis-{0}-{1}.png".format(analysisType, timestamp)
-    reportScreenshotFilename = "{0}/{1}".format(reportFolder, reportScreenshotFilenameName)
-
-    if analysisType=="Superior":
-      report = self.computeSuperiorSpaceAnalysis(inputPointsNode)
-    elif analysisType=="Inferior":
-      report = self.computeInferiorSpaceAnalysis(inputPointsNode)
-    elif analysisType=="Bolton":
-      report = self.computeBoltonAnalysis(inputPointsNode)
-    elif analysisType=="PeckAndPeck":
-      report = self.computePeckAndPeckAnalysis(inputPointsNode)
-    elif analysisType=="All":
-      report = self.computeAllAnalysis(inputPointsNode)
+  def getAnalysisEngine(self, pointNames):
+    """
+    Return vectorized analysis engine for a point list.
+    """
+    from OrthodonticAnalysisLib.AnalysisEngine import getAnalysisEngine
+    return getAnalysisEngine(pointNames)
+
+  def getAnalysisPoints(self, pointNames, markupsPointNode=None, labeledPoints=None):
+    """
+    Return point names and positions (as a 1xKx3 array) from a markups node or from labeled points.
+    If labeled points are specified then only those points of pointNames are used that are found in labeledPoints.
+    """
+    import numpy as np
+    if labeledPoints:
+      pointNames = [[shortName, longName] for shortName, longName in pointNames if longName in labeledPoints]
+      pointPositions = np.array([labeledPoints[longName] for shortName, longName in pointNames])
     else:
-      raise ValueError("Invalid analysisType: {0}".format(analysisType))
+      pointPositions = slicer.util.arrayFromMarkupsControlPoints(markupsPointNode)
+      if len(pointPositions) < len(pointNames):
+        raise ValueError("Analysis requires {0} points but only {1} points are defined".format(len(pointNames), len(pointPositions)))
+      pointPositions = pointPositions[:len(pointNames)]
+    return pointNames, pointPositions[np.newaxis]
 
-    import ScreenCapture
-    cap = ScreenCapture.ScreenCaptureLogic()
-    cap.showViewControllers(False)
-    cap.captureImageFromView(None, reportScreenshotFilename)
-    cap.showViewControllers(True)
+  def computeBatch(self, analysisType, points):
+    """
+    Compute results of an analysis for a stack of patients.
+    points is an NxKx3 array, containing points in the order returned by getPointNames.
+    Returns a dict that maps analysis name to a dict of results, each value is an array of N elements.
+    """
+    from OrthodonticAnalysisLib.AnalysisEngine import computeAnalysis
+    return computeAnalysis(analysisType, points)
 
-    screenshot = '<img src="{0}">'.format(reportScreenshotFilenameName)
+  def computeFolder(self, analysisType, inputFolder, outputFilename, numberOfWorkers=None, statisticsFilename=None, storeFolder=None,
+    recursive=False):
+    """
+    Compute analysis results for all markups files in a folder (and its subfolders, if recursive), without loading
+    them into the scene (see OrthodonticAnalysisLib.MarkupsReader), using a pool of worker processes (one per CPU core
+    by default). No screenshots are taken.
+    All results are written into a single CSV or JSON file (depending on outputFilename extension).
+    If statisticsFilename is specified then population statistics of the results are written into a summary report
+    (see OrthodonticAnalysisLib.CohortStatistics).
+    If storeFolder is specified then results are appended to the result store in that folder (see OrthodonticAnalysisLib.ResultStore).
+    Returns number of successfully processed files and list of (filename, error message) pairs.
+    """
+    # BatchAnalysis functions must be referenced from the imported module so that worker processes can find them
+    from OrthodonticAnalysisLib import BatchAnalysis
+    return BatchAnalysis.computeFolder(analysisType, self.getPointNames(analysisType), inputFolder, outputFilename, numberOfWorkers,
+      statisticsFilename=statisticsFilename, storeFolder=storeFolder, recursive=recursive)
+
+  def createLandmarkArchive(self, filename, analysisType, markupsPointNodes):
+    """
+    Create a memory-mapped landmark archive (see OrthodonticAnalysisLib.LandmarkArchive) from markups nodes
+    that contain points of an analysis type. Cases are named after the nodes. Returns the archive.
+    """
+    import numpy as np
+    from OrthodonticAnalysisLib.LandmarkArchive import LandmarkArchive
+    pointNames = self.getPointNames(analysisType)
+    archive = LandmarkArchive.create(filename, pointNames)
+    points = [self.getAnalysisPoints(pointNames, markupsPointNode)[1][0] for markupsPointNode in markupsPointNodes]
+    if points:
+      archive.append(np.array(points), [markupsPointNode.GetName() for markupsPointNode in markupsPointNodes])
+    return archive
+
+  @property
+  def reportWriter(self):
+    if self._reportWriter is None:
+      from OrthodonticAnalysisLib.ReportWriter import ReportWriter
+      self._reportWriter = ReportWriter(self.timer)
+    return self._reportWriter
+
+  @property
+  def resultCache(self):
+    """
+    Cache of generated reports (see OrthodonticAnalysisLib.ResultCache).
+    """
+    if self._resultCache is None:
+      from OrthodonticAnalysisLib.ResultCache import ResultCache
+      self._resultCache = ResultCache()
+    return self._resultCache
 
-    with open(reportFilename, 'w') as file_object:
-      file_object.write("<html>\n{0}\n{1}\n</html>".format(report, screenshot))
+  def getCacheKey(self, analysisType, inputPointsNode, captureSettings=None):
+    from OrthodonticAnalysisLib.ResultCache import getCacheKey
+    return getCacheKey(analysisType, slicer.util.arrayFromMarkupsControlPoints(inputPointsNode), captureSettings)
 
-    return reportFilename
+  def getCachedReport(self, analysisType, inputPointsNode, reportFolder, captureSettings=None):
+    """
+    Return (AnalysisResults, report filename) of a report previously generated from the same
+    control point positions, or None if there is no such report.
+    """
+    if captureSettings is None:
+      captureSettings = self.getCaptureSettings()
+    return self.resultCache.get(reportFolder, self.getCacheKey(analysisType, inputPointsNode, captureSettings))
 
+  def getResultStore(self, reportFolder):
+    """
+    Return the columnar store of all results computed in a report folder (see OrthodonticAnalysisLib.ResultStore).
+    """
+    if reportFolder not in self._resultStores:
+      from OrthodonticAnalysisLib.ResultStore import ResultStore
+      self._resultStores[reportFolder] = ResultStore(os.path.join(reportFolder, ResultStore.folderName))
+    return self._resultStores[reportFolder]
 
-  def computeSuperiorSpaceAnalysis(self, markupsPointNode=None, labeledPoints=None):
+  def getReportIndex(self, reportFolder):
+    """
+    Return the SQLite index of the results of reports generated in a report folder (see OrthodonticAnalysisLib.ReportIndex).
+    """
+    if reportFolder not in self._reportIndices:
+      from OrthodonticAnalysisLib.ReportIndex import ReportIndex
+      self._reportIndices[reportFolder] = ReportIndex(os.path.join(reportFolder, ReportIndex.filename))
+    return self._reportIndices[reportFolder]
 
-    if labeledPoints:
-      p = labeledPoints
-    else:
-      p = self.getLabeledPoints(self.pointsSuperiorSpace, markupsPointNode)
-
-    dente16 = self.distance(p, "Distal point of Tooth 16", "Mesial point of Tooth 16", False)
-    dente15 = self.distance(p, "Distal point of Tooth 15", "Mesial point of Tooth 15")
-    dente14 = self.distance(p, "Distal point of Tooth 14", "Mesial point of Tooth 14")
-    dente13 = self.distance(p, "Distal point of Tooth 13", "Mesial point of Tooth 13")
-    dente12 = self.distance(p, "Distal point of Tooth 12", "Mesial point of Tooth 12")
-    dente11 = self.distance(p, "Distal point of Tooth 11", "Mesial point of Tooth 11")
-    dente21 = self.distance(p, "Distal point of Tooth 21", "Mesial point of Tooth 21")
-    dente22 = self.distance(p, "Distal point of Tooth 22", "Mesial point of Tooth 22")
-    dente23 = self.distance(p, "Distal point of Tooth 23", "Mesial point of Tooth 23")
-    dente24 = self.distance(p, "Distal point of Tooth 24", "Mesial point of Tooth 24")
-    dente25 = self.distance(p, "Distal point of Tooth 25", "Mesial point of Tooth 25")
-    dente26 = self.distance(p, "Distal point of Tooth 26", "Mesial point of Tooth 26", False)
-
-    # Space code required
-    esp_r_sup = dente15 + dente14 + dente13 + dente12 + dente11 + dente21 + dente22 + dente23 + dente24 + dente25
-    
-    # Rated space code superior and inferior
-    esp_a_sup = (self.distance(p, "Distal point of Teeth segment 15-14", "Mesial point of Teeth segment 15-14 and Distal of Tooth 13")
-      + self.distance(p, "Mesial point of Teeth segment 15-14 and Distal of Tooth 13", "Mesial point of Tooth segment 13")
-      + self.distance(p, "Mesial point of Tooth segment 13", "Superior Arch Midpoint")
-      + self.distance(p, "Superior Arch Midpoint", "Mesial point of Tooth segment 23")
-      + self.distance(p, "Mesial point of Tooth segment 23", "Mesial point of Teeth segment 25-24 and Distal of Tooth 23")
-      + self.distance(p, "Mesial point of Teeth segment 25-24 and Distal of Tooth 23", "Distal point of Teeth segment 25-24"))
-    
-    # Result code
-    disc_sup = esp_a_sup - esp_r_sup
-
-    htmlReport = """<h2>SUPERIOR SPACE ANALYSIS</h2>
-
-<h3>Spaces</h3>
-<ul>
-  <li>Superior arch discrepancy: {0:.2f}mm</li>
-  <li>Required Space: {1:.2f}mm</li>
-  <li>Rated Space: {2:.2f}mm</li>
-</ul>""".format(disc_sup, esp_r_sup, esp_a_sup)
-
-    htmlReport +="""
-<h3>Diameters</h3>
-<ul>
-"""
-    if dente16 is not None:
-      htmlReport += "  <li>Tooth 16: {0:.2f}mm</li>\n".format(dente16)
-    htmlReport += """
-  <li>Tooth 15: {0:.2f}mm</li>
-  <li>Tooth 14: {1:.2f}mm</li>
-  <li>Tooth 13: {2:.2f}mm</li>
-  <li>Tooth 12: {3:.2f}mm</li>
-  <li>Tooth 11: {4:.2f}mm</li>
-  <li>Tooth 21: {5:.2f}mm</li>
-  <li>Tooth 22: {6:.2f}mm</li>
-  <li>Tooth 23: {7:.2f}mm</li>
-  <li>Tooth 24: {8:.2f}mm</li>
-  <li>Tooth 25: {9:.2f}mm</li>
-""".format(dente15, dente14, dente13, dente12, dente11, dente21, dente22, dente23, dente24, dente25)
-    if dente26 is not None:
-      htmlReport += "  <li>Tooth 26: {0:.2f}mm</li>\n".format(dente26)
-
-    htmlReport += "</ul>\n"
-
-    return htmlReport
+  def queryReports(self, reportFolder, conditions=(), columns=(), **filters):
+    """
+    Return reports of a report folder whose results match all conditions, such as
+    ["bolton.anterior.excessArch=Inferior", "bolton.anterior.excess>1.5"].
+    filters (analysisType, caseName, since, until, latest) and the returned rows are described in ReportIndex.query.
+    """
+    from OrthodonticAnalysisLib.ReportIndex import parseCondition
+    conditions = [parseCondition(condition) if isinstance(condition, str) else condition for condition in conditions]
+    return self.getReportIndex(reportFolder).query(conditions, columns, **filters)
 
+  def getReportArchive(self, reportFolder):
+    """
+    Return the archive of reports generated in a report folder (see OrthodonticAnalysisLib.ReportArchive).
+    """
+    if reportFolder not in self._reportArchives:
+      from OrthodonticAnalysisLib.ReportArchive import ReportArchive
+      self._reportArchives[reportFolder] = ReportArchive(os.path.join(reportFolder, ReportArchive.folderName))
+    return self._reportArchives[reportFolder]
 
-  def computeInferiorSpaceAnalysis(self, markupsPointNode=None, labeledPoints=None):
+  def closeReportFolder(self, reportFolder):
+    """
+    Close the result store, report index, and report archive of a report folder (e.g., before the folder is removed).
+    Reports that are being written are completed first.
+    """
+    self.reportWriter.shutdown()
+    self._resultStores.pop(reportFolder, None)
+    self._reportArchives.pop(reportFolder, None)
+    reportIndex = self._reportIndices.pop(reportFolder, None)
+    if reportIndex:
+      reportIndex.close()
+
+  @property
+  def reportViewFolder(self):
+    """
+    Folder where archived reports are extracted to be opened.
+    """
+    return os.path.join(slicer.app.temporaryPath, "OrthodonticAnalysisReports")
 
-    if labeledPoints:
-      p = labeledPoints
+  def getReportName(self, analysisType, timestamp):
+    """
+    Return base name of report files. Archived reports are named without timestamp,
+    so that reports generated again from the same inputs are identical (and stored only once).
+    """
+    if self.archiveReports:
+      return "OrthodonticAnalysis-{0}".format(analysisType)
+    return "OrthodonticAnalysis-{0}-{1}".format(analysisType, timestamp)
+
+  def submitReport(self, reportFolder, reportFiles, reportFilename, results, **reportProperties):
+    """
+    Write report files in the background, or store them in the report archive if archiveReports is enabled.
+    When the report is stored, results (AnalysisResults or list of them, None if the report has no results to store)
+    are appended to the result store and added to the report index. reportProperties (timestamp, analysisType,
+    caseNames, key) are stored in the archive manifest.
+    Returns a concurrent.futures.Future that provides the filename of the report to open.
+    """
+    # Results are stored in the writer thread once the report is stored, so the result store and the index never
+    # refer to a missing report, and the main thread does not wait for the report folder (e.g., on a network drive).
+    # Results are already stored when the returned future is done.
+    if results is None:
+      storeResults = None
     else:
-      p = self.getLabeledPoints(self.pointsInferiorSpace, markupsPointNode)
-
-    dente36 = self.distance(p, "Distal point of Tooth 36", "Mesial point of Tooth 36", False)
-    dente35 = self.distance(p, "Distal point of Tooth 35", "Mesial point of Tooth 35")
-    dente34 = self.distance(p, "Distal point of Tooth 34", "Mesial point of Tooth 34")
-    dente33 = self.distance(p, "Distal point of Tooth 33", "Mesial point of Tooth 33")
-    dente32 = self.distance(p, "Distal point of Tooth 32", "Mesial point of Tooth 32")
-    dente31 = self.distance(p, "Distal point of Tooth 31", "Mesial point of Tooth 31")
-    dente41 = self.distance(p, "Distal point of Tooth 41", "Mesial point of Tooth 41")
-    dente42 = self.distance(p, "Distal point of Tooth 42", "Mesial point of Tooth 42")
-    dente43 = self.distance(p, "Distal point of Tooth 43", "Mesial point of Tooth 43")
-    dente44 = self.distance(p, "Distal point of Tooth 44", "Mesial point of Tooth 44")
-    dente45 = self.distance(p, "Distal point of Tooth 45", "Mesial point of Tooth 45")
-    dente46 = self.distance(p, "Distal point of Tooth 46", "Mesial point of Tooth 46", False)
-
-    # Space code required
-    esp_r_inf = dente35 + dente34 + dente33 + dente32 + dente31 + dente41 + dente42 + dente43 + dente44 + dente45
-    
-    # Rated space code superior and inferior
-    esp_a_inf = (self.distance(p, "Distal point of Teeth segment 35-34", "Mesial point of Teeth segment 35-34 and Distal of Tooth 33")
-      + self.distance(p, "Mesial point of Teeth segment 35-34 and Distal of Tooth 33", "Mesial point of Tooth segment 33")
-      + self.distance(p, "Mesial point of Tooth segment 33", "Inferior Arch Midpoint")
-      + self.distance(p, "Inferior Arch Midpoint", "Mesial point of Tooth segment 43")
-      + self.distance(p, "Mesial point of Tooth segment 43", "Mesial point of Teeth segment 45-44 and Distal of Tooth 43")
-      + self.distance(p, "Mesial point of Teeth segment 45-44 and Distal of Tooth 43", "Distal point of Teeth segment 45-44"))
-
-    # Result code
-    disc_inf = esp_a_inf - esp_r_inf
-
-    htmlReport = """<h2>INFERIOR SPACE ANALYSIS</h2>
-
-<h3>Spaces</h3>
-<ul>
-  <li>Inferior arch discrepancy: {0:.2f}mm</li>
-  <li>Required Space: {1:.2f}mm</li>
-  <li>Rated Space: {2:.2f}mm</li>
-</ul>""".format(disc_inf, esp_r_inf, esp_a_inf)
-
-    htmlReport +="""
-<h3>Diameters</h3>
-<ul>
-"""
-    if dente36 is not None:
-      htmlReport += "  <li>Tooth 36: {0:.2f}mm</li>\n".format(dente36)
-    htmlReport += """
-  <li>Tooth 35: {0:.2f}mm</li>
-  <li>Tooth 34: {1:.2f}mm</li>
-  <li>Tooth 33: {2:.2f}mm</li>
-  <li>Tooth 32: {3:.2f}mm</li>
-  <li>Tooth 31: {4:.2f}mm</li>
-  <li>Tooth 41: {5:.2f}mm</li>
-  <li>Tooth 42: {6:.2f}mm</li>
-  <li>Tooth 43: {7:.2f}mm</li>
-  <li>Tooth 44: {8:.2f}mm</li>
-  <li>Tooth 45: {9:.2f}mm</li>
-""".format(dente35, dente34, dente33, dente32, dente31, dente41, dente42, dente43, dente44, dente45)
-    if dente46 is not None:
-      htmlReport += "  <li>Tooth 46: {0:.2f}mm</li>\n".format(dente46)
-
-    htmlReport += "</ul>\n"
-
-    return htmlReport
+      resultStore = self.getResultStore(reportFolder)
+      reportIndex = self.getReportIndex(reportFolder)
+      def storeResults(report, archived=False):
+        with self.timer.stage("store"):
+          resultStore.appendResults(results)
+          reportIndex.addResults(results, report, archived)
+    if not self.archiveReports:
+      return self.reportWriter.submit(reportFiles, reportFilename,
+        (lambda: storeResults(os.path.relpath(reportFilename, reportFolder))) if storeResults else None)
+    # Archived reports are indexed by their id in the archive, as they are extracted into the temporary view folder
+    archive = self.getReportArchive(reportFolder)
+    return self.reportWriter.submitToArchive(archive, reportFiles, self.reportViewFolder, os.path.basename(reportFilename),
+      (lambda entry: storeResults(archive.getReportId(entry), archived=True)) if storeResults else None, **reportProperties)
+
+  def getIndexedReportFilename(self, reportFolder, indexedReport):
+    """
+    Return filename of a report returned by queryReports (archived reports are extracted into the report view folder).
+    Returns None if the report is not found.
+    """
+    if not indexedReport["archived"]:
+      reportFilename = os.path.join(reportFolder, indexedReport["report"])
+      return reportFilename if os.path.exists(reportFilename) else None
+    archive = self.getReportArchive(reportFolder)
+    entry = archive.findReportById(indexedReport["report"])
+    return archive.extractReport(entry, self.reportViewFolder) if entry else None
+
+  def getReportFileResults(self, results):
+    """
+    Return results (AnalysisResults or list of them) as they are rendered into report files. If archiveReports is enabled
+    then timestamps are omitted (the archive manifest records them), so that a report generated again from the same
+    inputs is stored in the same blobs.
+    """
+    if not self.archiveReports:
+      return results
+    import dataclasses
+    if isinstance(results, list):
+      return [dataclasses.replace(caseResults, timestamp="") for caseResults in results]
+    return dataclasses.replace(results, timestamp="")
+
+  @property
+  def surfaceLocators(self):
+    """
+    Spatial search structures of model surfaces, reused until the model mesh changes
+    (see OrthodonticAnalysisLib.SurfaceSnapping).
+    """
+    if self._surfaceLocators is None:
+      from OrthodonticAnalysisLib.SurfaceSnapping import SurfaceLocatorCache
+      self._surfaceLocators = SurfaceLocatorCache()
+    return self._surfaceLocators
 
+  def snapPoint(self, position, modelNode, snapMode="Surface", radius=1.0):
+    """
+    Return position (in world coordinate system) snapped to the surface of a model node.
+    snapMode is "Surface" (closest surface point) or "Extremum" (most protruding surface point within radius).
+    """
+    with self.timer.stage("snap"):
+      locator = self.surfaceLocators.getLocator(modelNode)
+      transformNode = modelNode.GetParentTransformNode()
+      if transformNode:
+        worldToModel = vtk.vtkGeneralTransform()
+        transformNode.GetTransformFromWorld(worldToModel)
+        position = worldToModel.TransformPoint(position)
+      snappedPosition = locator.snap(position, snapMode, radius)
+      if transformNode:
+        modelToWorld = vtk.vtkGeneralTransform()
+        transformNode.GetTransformToWorld(modelToWorld)
+        snappedPosition = modelToWorld.TransformPoint(snappedPosition)
+      return list(snappedPosition)
+
+  def preplacePoints(self, analysisType, inputPointsNode, modelNode, transformType="Similarity"):
+    """
+    Place all points of an analysis on the surface of a model, by registering the reference landmarks
+    (see OrthodonticAnalysisLib.ReferenceLandmarks) to the surface and projecting them onto the surface.
+    Existing control points of inputPointsNode are replaced.
+    transformType is "Rigid", "Similarity", or "Affine". Returns the root mean square registration error (in mm).
+    """
+    import numpy as np
+    from OrthodonticAnalysisLib.ReferenceLandmarks import getReferencePoints, referenceToothPoints
+    from OrthodonticAnalysisLib.TemplateRegistration import placeTemplate
+    with self.timer.stage("preplace"):
+      pointNames = self.getPointNames(analysisType)
+      templatePoints = getReferencePoints(pointNames)
+      # Synthesized reference points (segment, vestibular, and lingual points) are not used for registration,
+      # as they are not necessarily on the surface
+      registrationPoints = np.array([templatePoints[index] for index, [shortName, longName] in enumerate(pointNames)
+        if shortName in referenceToothPoints])
+      locator = self.surfaceLocators.getLocator(modelNode)
+      placedPoints, registrationError = placeTemplate(templatePoints, locator, transformType,
+        registrationPoints if len(registrationPoints) >= 4 else None)
+      # Registration is performed in the model coordinate system
+      transformNode = modelNode.GetParentTransformNode()
+      if transformNode:
+        modelToWorld = vtk.vtkGeneralTransform()
+        transformNode.GetTransformToWorld(modelToWorld)
+        placedPoints = np.array([modelToWorld.TransformPoint(point) for point in placedPoints])
+      slicer.util.updateMarkupsControlPointsFromArray(inputPointsNode, placedPoints)
+      return registrationError
+
+  @property
+  def modelProxies(self):
+    """
+    Decimated meshes of models, reused until the model mesh changes (see OrthodonticAnalysisLib.ModelProxies).
+    """
+    if self._modelProxies is None:
+      from OrthodonticAnalysisLib.ModelProxies import ModelProxyCache
+      self._modelProxies = ModelProxyCache()
+    return self._modelProxies
 
-  def computeBoltonAnalysis(self, markupsPointNode=None, labeledPoints=None):
+  def getDisplayProxyModel(self, modelNode, maximumNumberOfTriangles=200000):
+    """
+    Return a model node that contains a decimated copy of the model (hidden from editors and not saved with the scene),
+    or None if the model has no more than maximumNumberOfTriangles triangles.
+    """
+    with self.timer.stage("decimate"):
+      proxyPolyData = self.modelProxies.getProxyPolyData(modelNode, maximumNumberOfTriangles)
+    proxyNode = self._displayProxyNodes.get(modelNode.GetID())
+    if proxyNode is not None and proxyNode.GetScene() is None:
+      # proxy node has been removed from the scene
+      proxyNode = None
+    if proxyPolyData is None:
+      if proxyNode is not None:
+        slicer.mrmlScene.RemoveNode(proxyNode)
+      self._displayProxyNodes.pop(modelNode.GetID(), None)
+      return None
+    if proxyNode is None:
+      proxyNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", modelNode.GetName() + " (decimated)")
+      proxyNode.SetHideFromEditors(True)
+      proxyNode.SetSaveWithScene(False)
+      proxyNode.CreateDefaultDisplayNodes()
+      proxyNode.GetDisplayNode().SetSaveWithScene(False)
+      proxyNode.SetDisplayVisibility(False)
+      self._displayProxyNodes[modelNode.GetID()] = proxyNode
+    if proxyNode.GetPolyData() is not proxyPolyData:
+      proxyNode.SetAndObservePolyData(proxyPolyData)
+    proxyNode.SetAndObserveTransformNodeID(modelNode.GetTransformNodeID())
+    return proxyNode
+
+  def setDisplayProxyEnabled(self, modelNode, enabled, maximumNumberOfTriangles=200000):
+    """
+    Show a decimated copy of the model instead of the model (so that it is rendered and picked instead of the model),
+    or show the model again. The model is replaced only if it is visible and it has more than maximumNumberOfTriangles triangles.
+    Returns True if the decimated copy is shown.
+    """
+    displayNode = modelNode.GetDisplayNode()
+    proxyNode = self._displayProxyNodes.get(modelNode.GetID())
+    proxyShown = (proxyNode is not None and proxyNode.GetScene() is not None and proxyNode.GetDisplayVisibility())
+    if not enabled or not displayNode or not (proxyShown or displayNode.GetVisibility()):
+      if proxyShown:
+        proxyNode.SetDisplayVisibility(False)
+        if displayNode:
+          displayNode.SetVisibility(True)
+      return False
+    proxyNode = self.getDisplayProxyModel(modelNode, maximumNumberOfTriangles)
+    if proxyNode is None:
+      displayNode.SetVisibility(True)
+      return False
+    if not proxyShown:
+      proxyDisplayNode = proxyNode.GetDisplayNode()
+      proxyDisplayNode.SetColor(displayNode.GetColor())
+      proxyDisplayNode.SetOpacity(displayNode.GetOpacity())
+      proxyDisplayNode.SetVisibility2D(displayNode.GetVisibility2D())
+      displayNode.SetVisibility(False)
+      proxyDisplayNode.SetVisibility(True)
+    return True
+
+  def removeDisplayProxies(self):
+    """
+    Show the original models and remove all decimated copies from the scene.
+    """
+    for modelNodeID, proxyNode in self._displayProxyNodes.items():
+      modelNode = slicer.mrmlScene.GetNodeByID(modelNodeID)
+      if proxyNode.GetScene() is None:
+        continue
+      if modelNode and modelNode.GetDisplayNode() and proxyNode.GetDisplayVisibility():
+        modelNode.GetDisplayNode().SetVisibility(True)
+      slicer.mrmlScene.RemoveNode(proxyNode)
+    self._displayProxyNodes = {}
+    self.modelProxies.clear()
+
+  def logTimings(self, parameterNode=None):
+    """
+    Log time of processing stages (and profiling statistics, if profiling is enabled)
+    on the timing logger channel and store stage times in the parameter node (as JSON in "StageTimings" parameter).
+    """
+    import json
+    self.timer.logger.info("Processing stage times:\n" + self.timer.formatSummary())
+    if self.timer.profilingEnabled:
+      self.timer.logger.info("Profiling statistics:\n" + self.timer.getProfileStats())
+    if parameterNode:
+      parameterNode.SetParameter("StageTimings", json.dumps(self.timer.getSummary()))
+
+  def getCaptureSettings(self, parameterNode=None):
+    """
+    Return screenshot capture settings stored in the parameter node (default settings if parameter node is not specified).
+    """
+    captureSettings = dict(self.defaultCaptureSettings)
+    if parameterNode:
+      for name in captureSettings:
+        if parameterNode.GetParameter(name):
+          captureSettings[name] = parameterNode.GetParameter(name)
+    if captureSettings["ScreenshotView"] not in self.screenshotViews:
+      # For example, a view that is added in a later version of the module
+      logging.warning("Invalid screenshot view: {0}, {1} is captured instead".format(
+        captureSettings["ScreenshotView"], self.defaultCaptureSettings["ScreenshotView"]))
+      captureSettings["ScreenshotView"] = self.defaultCaptureSettings["ScreenshotView"]
+    captureSettings["ScreenshotQuality"] = int(captureSettings["ScreenshotQuality"])
+    captureSettings["ScreenshotThumbnailSize"] = int(captureSettings["ScreenshotThumbnailSize"])
+    return captureSettings
+
+  def getUncertaintySettings(self, parameterNode=None):
+    """
+    Return landmark uncertainty analysis settings stored in the parameter node (default settings if parameter node
+    is not specified) as keyword arguments of UncertaintyAnalysis.computeUncertainty.
+    Returns None if uncertainty analysis is disabled.
+    """
+    settings = dict(self.defaultUncertaintySettings)
+    if parameterNode:
+      for name in settings:
+        if parameterNode.GetParameter(name):
+          settings[name] = parameterNode.GetParameter(name)
+    if settings["UncertaintyAnalysis"] != "true":
+      return None
+    return {
+      "errorModel": settings["LandmarkErrorModel"],
+      "landmarkError": float(settings["LandmarkError"]),
+      "numberOfSamples": int(settings["UncertaintySamples"]),
+      }
+
+  def computeUncertainty(self, analysisType, inputPointsNode, uncertaintySettings):
+    """
+    Compute confidence intervals of analysis results of a markups node by perturbing the landmarks
+    (see OrthodonticAnalysisLib.UncertaintyAnalysis). uncertaintySettings is a dict returned by getUncertaintySettings.
+    """
+    from OrthodonticAnalysisLib.UncertaintyAnalysis import computeUncertainty
+    pointNames = self.getPointNames(analysisType)
+    with self.timer.stage("uncertainty"):
+      return computeUncertainty(analysisType, self.getAnalysisPoints(pointNames, inputPointsNode)[1][0], pointNames,
+        **uncertaintySettings)
 
-    if labeledPoints:
-      p = labeledPoints
-    else:
-      p = self.getLabeledPoints(self.pointsBolton, markupsPointNode)
-
-    dente16 = self.distance(p, "Distal point of Tooth 16", "Mesial point of Tooth 16")
-    dente15 = self.distance(p, "Distal point of Tooth 15", "Mesial point of Tooth 15")
-    dente14 = self.distance(p, "Distal point of Tooth 14", "Mesial point of Tooth 14")
-    dente13 = self.distance(p, "Distal point of Tooth 13", "Mesial point of Tooth 13")
-    dente12 = self.distance(p, "Distal point of Tooth 12", "Mesial point of Tooth 12")
-    dente11 = self.distance(p, "Distal point of Tooth 11", "Mesial point of Tooth 11")
-    dente21 = self.distance(p, "Distal point of Tooth 21", "Mesial point of Tooth 21")
-    dente22 = self.distance(p, "Distal point of Tooth 22", "Mesial point of Tooth 22")
-    dente23 = self.distance(p, "Distal point of Tooth 23", "Mesial point of Tooth 23")
-    dente24 = self.distance(p, "Distal point of Tooth 24", "Mesial point of Tooth 24")
-    dente25 = self.distance(p, "Distal point of Tooth 25", "Mesial point of Tooth 25")
-    dente26 = self.distance(p, "Distal point of Tooth 26", "Mesial point of Tooth 26")
-
-    dente36 = self.distance(p, "Distal point of Tooth 36", "Mesial point of Tooth 36")
-    dente35 = self.distance(p, "Distal point of Tooth 35", "Mesial point of Tooth 35")
-    dente34 = self.distance(p, "Distal point of Tooth 34", "Mesial point of Tooth 34")
-    dente33 = self.distance(p, "Distal point of Tooth 33", "Mesial point of Tooth 33")
-    dente32 = self.distance(p, "Distal point of Tooth 32", "Mesial point of Tooth 32")
-    dente31 = self.distance(p, "Distal point of Tooth 31", "Mesial point of Tooth 31")
-    dente41 = self.distance(p, "Distal point of Tooth 41", "Mesial point of Tooth 41")
-    dente42 = self.distance(p, "Distal point of Tooth 42", "Mesial point of Tooth 42")
-    dente43 = self.distance(p, "Distal point of Tooth 43", "Mesial point of Tooth 43")
-    dente44 = self.distance(p, "Distal point of Tooth 44", "Mesial point of Tooth 44")
-    dente45 = self.distance(p, "Distal point of Tooth 45", "Mesial point of Tooth 45")
-    dente46 = self.distance(p, "Distal point of Tooth 46", "Mesial point of Tooth 46")
-
-    # Arcs division code
-    dist_12_sup = dente16 + dente15 + dente14 + dente13 + dente12 + dente11 + dente21 + dente22 + dente23 + dente24 + dente25 + dente26
-    dist_12_inf = dente36 + dente35 + dente34 + dente33 + dente32 + dente31 + dente41 + dente42 + dente43 + dente44 + dente45 + dente46
- 
-    dist_6_sup = dente13 + dente12 + dente11 + dente21 + dente22 + dente23
-    dist_6_inf = dente33 + dente32 + dente31 + dente41 + dente42 + dente43
-    
-    r_bolt_12 = (dist_12_inf/dist_12_sup)*100
-    r_bolt_6 = (dist_6_inf/dist_6_sup)*100
-
-    htmlReport = "<h2>BOLTON ANALYSIS</h2>"
-
-    # Total
-    ideal_12_sup = None
-    ideal_12_inf = None
-    if r_bolt_12 > 91.3:
-        # Excess on inferior arch (superior is used as ideal)
-        excess_12_arch = "Inferior"
-        ideal_12_sup = dist_12_sup
-        ideal_12_inf = dist_12_sup * 0.913
-        excess_12 = dist_12_inf - ideal_12_inf
-    else:
-        # Excess on superior arch (inferior is used as ideal)
-        excess_12_arch = "Superior"
-        ideal_12_sup = dist_12_inf / 0.913
-        ideal_12_inf = dist_12_inf
-        excess_12 = dist_12_sup - ideal_12_sup
-
-    htmlReport+= """
-<h3>Total Bolton Analysis</h3>
-<ul>
-<li>Excess on {0} arch: {1:.1f}mm</li>
-<li>Ideal superior arch length: {2:.1f}mm</li>
-<li>Ideal inferior arch length: {3:.1f}mm</li>
-</ul>
-""".format(excess_12_arch, excess_12, ideal_12_sup, ideal_12_inf)
-
-    # Anterior
-    ideal_6_sup = None
-    ideal_6_inf = None
-    if r_bolt_6 > 77.2:
-        # Excess on inferior arch (superior is used as ideal)
-        excess_6_arch = "Inferior"
-        ideal_6_sup = dist_6_sup
-        ideal_6_inf = dist_6_sup * 0.772
-        excess_6 = dist_6_inf - ideal_6_inf
+  @staticmethod
+  def imageDataToArray(imageData):
+    """
+    Convert vtkImageData to an HxWxC array (first row is the top of the image).
+    """
+    from vtk.util.numpy_support import vtk_to_numpy
+    width, height, depth = imageData.GetDimensions()
+    scalars = imageData.GetPointData().GetScalars()
+    image = vtk_to_numpy(scalars).reshape(height, width, scalars.GetNumberOfComponents())
+    # VTK image starts with the bottom row
+    return image[::-1].copy()
+
+  def captureScreenshot(self, view="AllViews"):
+    """
+    Capture all views (without view controllers) or the first 3D view into an HxWxC uint8 array.
+    All views are captured if the layout has no 3D view.
+    Only the render buffer is grabbed here, image encoding is left to the report writer.
+    """
+    if view == "3DView" and slicer.app.layoutManager().threeDWidget(0) is None:
+      logging.warning("The layout has no 3D view, all views are captured instead")
+      view = "AllViews"
+    if view == "3DView":
+      # Render only the 3D view into its back buffer: other views are not redrawn
+      # and view controllers do not need to be hidden.
+      threeDView = slicer.app.layoutManager().threeDWidget(0).threeDView()
+      windowToImage = vtk.vtkWindowToImageFilter()
+      windowToImage.SetInput(threeDView.renderWindow())
+      windowToImage.SetInputBufferTypeToRGB()
+      windowToImage.ReadFrontBufferOff()
+      windowToImage.ShouldRerenderOn()
+      windowToImage.Update()
+      return self.imageDataToArray(windowToImage.GetOutput())
+    elif view == "AllViews":
+      import ScreenCapture
+      cap = ScreenCapture.ScreenCaptureLogic()
+      cap.showViewControllers(False)
+      try:
+        capturedImage = cap.captureImageFromView(None)
+      finally:
+        cap.showViewControllers(True)
+      return self.imageDataToArray(capturedImage)
     else:
-        # Excess on superior arch (inferior is used as ideal)
-        excess_6_arch = "Superior"
-        ideal_6_sup = dist_6_inf / 0.772
-        ideal_6_inf = dist_6_inf
-        excess_6 = dist_6_sup - ideal_6_sup
+      raise ValueError("Invalid screenshot view: {0}".format(view))
 
-    htmlReport+= """
-<h3>Anterior Bolton Analysis</h3>
-<ul>
-<li>Excess on {0} arch: {1:.1f}mm</li>
-<li>Ideal superior arch length: {2:.1f}mm</li>
-<li>Ideal inferior arch length: {3:.1f}mm</li>
-</ul>
-""".format(excess_6_arch, excess_6, ideal_6_sup, ideal_6_inf)
+  def captureScreenshotContent(self, captureSettings):
+    """
+    Capture the views as specified in captureSettings. Returns ImageContent (see OrthodonticAnalysisLib.ReportWriter)
+    or None if screenshot mode is "None".
+    """
+    from OrthodonticAnalysisLib.ReportWriter import ImageContent, isImageFormatSupported
+    screenshotMode = captureSettings["ScreenshotMode"]
+    if screenshotMode not in self.screenshotModes:
+      raise ValueError("Invalid screenshot mode: {0}".format(screenshotMode))
+    if screenshotMode == "None":
+      return None
+    imageFormat = captureSettings["ScreenshotFormat"]
+    if not isImageFormatSupported(imageFormat):
+      logging.warning("{0} screenshot format is not supported, PNG is used instead".format(imageFormat))
+      imageFormat = "PNG"
+    with self.timer.stage("capture"):
+      screenshotImage = self.captureScreenshot(captureSettings["ScreenshotView"])
+    return ImageContent(screenshotImage, imageFormat, captureSettings["ScreenshotQuality"],
+      captureSettings["ScreenshotThumbnailSize"] if screenshotMode == "Thumbnail" else None)
+
+  def compute(self, analysisType, inputPointsNode, reportFolder, captureSettings=None, uncertaintySettings=None):
+    """
+    Compute analysis results and write report. Returns the report filename when the report is written.
+    """
+    return self.computeAsync(analysisType, inputPointsNode, reportFolder, captureSettings, uncertaintySettings).result()
 
-    return htmlReport
+  def computeAsync(self, analysisType, inputPointsNode, reportFolder, captureSettings=None, uncertaintySettings=None):
+    """
+    Compute analysis results and capture the views, then write report files in a background thread.
+    captureSettings is a dict returned by getCaptureSettings (default settings are used if not specified).
+    If uncertaintySettings (dict returned by getUncertaintySettings) is specified then confidence intervals
+    of the results are computed and included in the report.
+    Returns a concurrent.futures.Future that provides the report filename when all report files are written.
+    If a report has been already generated from the same inputs then the existing report is returned.
+    """
+    # Time of the main thread part (the report is written in the background)
+    with self.timer.stage("compute"):
+      if captureSettings is None:
+        captureSettings = self.getCaptureSettings()
+
+      with self.timer.stage("cacheLookup"):
+        cacheKey = self.getCacheKey(analysisType, inputPointsNode,
+          dict(captureSettings, uncertainty=uncertaintySettings) if uncertaintySettings else captureSettings)
+        if self.archiveReports:
+          archive = self.getReportArchive(reportFolder)
+          entry = archive.findReport(cacheKey)
+          cachedReport = (None, archive.extractReport(entry, self.reportViewFolder)) if entry else None
+        else:
+          cachedReport = self.resultCache.get(reportFolder, cacheKey)
+      if cachedReport:
+        results, reportFilename = cachedReport
+        logging.info("Inputs have not changed, using existing report: {0}".format(reportFilename))
+        from concurrent.futures import Future
+        future = Future()
+        future.set_result(reportFilename)
+        return future
+
+      from time import gmtime, strftime
+      timestamp = strftime("%Y%m%d-%H%M%S", gmtime())
+      reportName = self.getReportName(analysisType, timestamp)
+      reportFilename = "{0}/{1}.html".format(reportFolder, reportName)
+
+      if analysisType=="Superior":
+        results = self.computeSuperiorSpaceAnalysis(inputPointsNode)
+      elif analysisType=="Inferior":
+        results = self.computeInferiorSpaceAnalysis(inputPointsNode)
+      elif analysisType=="Bolton":
+        results = self.computeBoltonAnalysis(inputPointsNode)
+      elif analysisType=="PeckAndPeck":
+        results = self.computePeckAndPeckAnalysis(inputPointsNode)
+      elif analysisType=="All":
+        results = self.computeAllAnalysis(inputPointsNode)
+      else:
+        raise ValueError("Invalid analysisType: {0}".format(analysisType))
+      results.timestamp = timestamp
+      if uncertaintySettings:
+        results.uncertainty = self.computeUncertainty(analysisType, inputPointsNode, uncertaintySettings)
+
+      from OrthodonticAnalysisLib.ReportRenderers import getRenderer
+      reportFiles = []
+
+      reportScreenshotFilenameName = None
+      screenshot = self.captureScreenshotContent(captureSettings)
+      if screenshot:
+        reportScreenshotFilenameName = reportName + screenshot.fileExtension
+        reportFiles.append(("{0}/{1}".format(reportFolder, reportScreenshotFilenameName), screenshot))
+
+      with self.timer.stage("render"):
+        # Numeric results are saved next to the HTML report so that they can be processed without parsing the report
+        reportFiles.append((os.path.splitext(reportFilename)[0] + ".json", getRenderer("json").render(self.getReportFileResults(results))))
+        # HTML report is written last, so when it appears all files that it refers to are available
+        reportFiles.append((reportFilename, getRenderer("html").render(results, reportScreenshotFilenameName)))
+      if self.archiveReports:
+        # Archive manifest refers to the report by the cache key
+        return self.submitReport(reportFolder, reportFiles, reportFilename, results, timestamp=timestamp,
+          analysisType=analysisType, caseNames=[results.name], key=cacheKey)
+
+      # Cache entry refers to the report, therefore it is written after the report
+      reportFiles.append((self.resultCache.getCacheFilename(reportFolder, cacheKey),
+        self.resultCache.getEntryContent(reportFolder, results, reportFilename)))
+      future = self.submitReport(reportFolder, reportFiles, reportFilename, results)
+      def addToCache(future):
+        if not future.exception():
+          self.resultCache.add(reportFolder, cacheKey, results, reportFilename)
+      future.add_done_callback(addToCache)
+      return future
+
+  def getInputPointsNodes(self, itemID):
+    """
+    Return markups point list nodes in a subject hierarchy folder (including subfolders), in the order they appear
+    in the hierarchy. If the item is a point list node then only that node is returned.
+    """
+    shNode = slicer.vtkMRMLSubjectHierarchyNode.GetSubjectHierarchyNode(slicer.mrmlScene)
+    itemIDs = vtk.vtkIdList()
+    itemIDs.InsertNextId(itemID)
+    shNode.GetItemChildren(itemID, itemIDs, True)
+    inputPointsNodes = []
+    for index in range(itemIDs.GetNumberOfIds()):
+      dataNode = shNode.GetItemDataNode(itemIDs.GetId(index))
+      if dataNode and dataNode.IsA("vtkMRMLMarkupsFiducialNode"):
+        inputPointsNodes.append(dataNode)
+    return inputPointsNodes
+
+  def getStackedAnalysisPoints(self, pointNames, inputPointsNodes):
+    """
+    Return positions of the points of several markups nodes as an NxKx3 array.
+    """
+    import numpy as np
+    points = []
+    for inputPointsNode in inputPointsNodes:
+      try:
+        points.append(self.getAnalysisPoints(pointNames, inputPointsNode)[1][0])
+      except ValueError as e:
+        raise ValueError("{0}: {1}".format(inputPointsNode.GetName(), e))
+    return np.array(points)
+
+  def computeMultiple(self, analysisType, inputPointsNodes, reportFolder, captureSettings=None, uncertaintySettings=None):
+    """
+    Compute analysis results of several markups nodes and write a combined report. Returns the report filename
+    when the report is written.
+    """
+    return self.computeMultipleAsync(analysisType, inputPointsNodes, reportFolder, captureSettings, uncertaintySettings).result()
 
+  def computeMultipleAsync(self, analysisType, inputPointsNodes, reportFolder, captureSettings=None, uncertaintySettings=None):
+    """
+    Compute analysis results of several markups nodes (patients or timepoints of a session) in a single vectorized
+    pass and capture the views once for each node (only that node is shown), then write a combined report
+    in a background thread. Results of each node are appended to the result store.
+    If uncertaintySettings is specified then confidence intervals of the results of each node are computed, too.
+    Returns a concurrent.futures.Future that provides the report filename when all report files are written.
+    """
+    from OrthodonticAnalysisLib.AnalysisResults import AnalysisResults
+    from OrthodonticAnalysisLib.ReportRenderers import getRenderer
+
+    if not inputPointsNodes:
+      raise ValueError("No point lists are specified")
+    with self.timer.stage("compute"):
+      if captureSettings is None:
+        captureSettings = self.getCaptureSettings()
+
+      from time import gmtime, strftime
+      timestamp = strftime("%Y%m%d-%H%M%S", gmtime())
+      reportName = self.getReportName(analysisType, timestamp)
+      reportFilename = "{0}/{1}-{2}cases.html".format(reportFolder, reportName, len(inputPointsNodes))
+
+      pointNames = self.getPointNames(analysisType)
+      with self.timer.stage("getPoints"):
+        points = self.getStackedAnalysisPoints(pointNames, inputPointsNodes)
+      with self.timer.stage("analysis"):
+        engineResults = self.getAnalysisEngine(pointNames).compute(analysisType, points)
+        results = AnalysisResults.listFromEngineResults(analysisType, engineResults,
+          [inputPointsNode.GetName() for inputPointsNode in inputPointsNodes], timestamp)
+      if uncertaintySettings:
+        for caseResults, inputPointsNode in zip(results, inputPointsNodes):
+          caseResults.uncertainty = self.computeUncertainty(analysisType, inputPointsNode, uncertaintySettings)
+
+      reportFiles = []
+      screenshotFilenames = [None] * len(inputPointsNodes)
+      if captureSettings["ScreenshotMode"] != "None":
+        # Each node is captured alone, visibility of the nodes is restored afterwards
+        displayNodes = [inputPointsNode.GetDisplayNode() for inputPointsNode in inputPointsNodes]
+        visibilities = [displayNode.GetVisibility() if displayNode else None for displayNode in displayNodes]
+        try:
+          for caseIndex in range(len(inputPointsNodes)):
+            for displayIndex, displayNode in enumerate(displayNodes):
+              if displayNode:
+                displayNode.SetVisibility(displayIndex == caseIndex)
+            slicer.util.forceRenderAllViews()
+            screenshot = self.captureScreenshotContent(captureSettings)
+            screenshotFilenames[caseIndex] = "{0}-{1}{2}".format(reportName, caseIndex + 1, screenshot.fileExtension)
+            reportFiles.append(("{0}/{1}".format(reportFolder, screenshotFilenames[caseIndex]), screenshot))
+        finally:
+          for displayNode, visibility in zip(displayNodes, visibilities):
+            if displayNode:
+              displayNode.SetVisibility(visibility)
+
+      with self.timer.stage("render"):
+        reportFileResults = self.getReportFileResults(results)
+        reportFiles.append((os.path.splitext(reportFilename)[0] + ".json", getRenderer("json").render(reportFileResults)))
+        reportFiles.append((os.path.splitext(reportFilename)[0] + ".csv", getRenderer("csv").render(reportFileResults)))
+        reportFiles.append((reportFilename, getRenderer("html").renderCases(results, screenshotFilenames)))
+
+      return self.submitReport(reportFolder, reportFiles, reportFilename, results, timestamp=timestamp,
+        analysisType=analysisType, caseNames=[caseResults.name for caseResults in results])
+
+  def computeLongitudinal(self, analysisType, inputPointsNodes, reportFolder, patientName=None):
+    """
+    Compare analysis results of the visits of a patient and write a longitudinal report.
+    Returns the report filename when the report is written.
+    """
+    return self.computeLongitudinalAsync(analysisType, inputPointsNodes, reportFolder, patientName).result()
 
-  def computePeckAndPeckAnalysis(self, markupsPointNode=None, labeledPoints=None):
+  def computeLongitudinalAsync(self, analysisType, inputPointsNodes, reportFolder, patientName=None):
+    """
+    Compare analysis results of the visits of a patient (markups nodes, in chronological order). All visits are computed
+    in a single vectorized pass and a report of per-tooth and per-arch changes with trend plots is written
+    in a background thread (see OrthodonticAnalysisLib.LongitudinalAnalysis). Visits are named after the nodes.
+    Returns a concurrent.futures.Future that provides the report filename when all report files are written.
+    """
+    from OrthodonticAnalysisLib.LongitudinalAnalysis import computeVisits, renderLongitudinalReport
+
+    if not inputPointsNodes:
+      raise ValueError("No point lists are specified")
+    if patientName is None:
+      patientName = inputPointsNodes[0].GetName()
+    with self.timer.stage("compute"):
+      from time import gmtime, strftime
+      timestamp = strftime("%Y%m%d-%H%M%S", gmtime())
+      reportFilename = "{0}/{1}-longitudinal.html".format(reportFolder, self.getReportName(analysisType, timestamp))
+
+      pointNames = self.getPointNames(analysisType)
+      with self.timer.stage("getPoints"):
+        points = self.getStackedAnalysisPoints(pointNames, inputPointsNodes)
+      with self.timer.stage("analysis"):
+        columns = computeVisits(analysisType, points, pointNames)
+
+      with self.timer.stage("render"):
+        visitNames = [inputPointsNode.GetName() for inputPointsNode in inputPointsNodes]
+        visitTimes = [float("nan")] * len(visitNames)
+        reportFiles = [(os.path.splitext(reportFilename)[0] + extension,
+          renderLongitudinalReport(patientName, analysisType, visitNames, visitTimes, columns, reportFormat))
+          for extension, reportFormat in [(".json", "json"), (".csv", "csv"), (".html", "html")]]
+
+      # Longitudinal reports contain changes, not results of single visits, therefore they are not indexed
+      return self.submitReport(reportFolder, reportFiles, reportFilename, None, timestamp=timestamp, analysisType=analysisType,
+        caseNames=[patientName])
+
+  def computeAnalysisResults(self, analysisType, pointNames, markupsPointNode=None, labeledPoints=None):
+    """
+    Compute results of an analysis for a single case. Returns AnalysisResults.
+    """
+    from OrthodonticAnalysisLib.AnalysisResults import AnalysisResults
+    with self.timer.stage("getPoints"):
+      pointNames, points = self.getAnalysisPoints(pointNames, markupsPointNode, labeledPoints)
+    with self.timer.stage("analysis"):
+      engineResults = self.getAnalysisEngine(pointNames).compute(analysisType, points)
+      name = markupsPointNode.GetName() if markupsPointNode else ""
+      return AnalysisResults.fromEngineResults(analysisType, engineResults, name=name)
 
-    if labeledPoints:
-      p = labeledPoints
-    else:
-      p = self.getLabeledPoints(self.pointsPeckAndPeck, markupsPointNode)
-
-    dente32_md = self.distance(p, "Distal point of Tooth 32", "Mesial point of Tooth 32")
-    dente32_fl = self.distance(p, "Vestibular point of Tooth 32", "Lingual point of Tooth 32")
-    dente31_md = self.distance(p, "Distal point of Tooth 31", "Mesial point of Tooth 31")
-    dente31_fl = self.distance(p, "Vestibular point of Tooth 31", "Lingual point of Tooth 31")
-    dente41_md = self.distance(p, "Distal point of Tooth 41", "Mesial point of Tooth 41")
-    dente41_fl = self.distance(p, "Vestibular point of Tooth 41", "Lingual point of Tooth 41")
-    dente42_md = self.distance(p, "Distal point of Tooth 42", "Mesial point of Tooth 42")
-    dente42_fl = self.distance(p, "Vestibular point of Tooth 42", "Lingual point of Tooth 42")
-
-    indice_d42 = (dente42_md/dente42_fl)*100.0
-    indice_d41 = (dente41_md/dente41_fl)*100.0
-    indice_d31 = (dente31_md/dente31_fl)*100.0
-    indice_d32 = (dente32_md/dente32_fl)*100.0
-
-    results = [
-      indice_d42, indice_d41, indice_d31, indice_d32,
-      dente32_md, dente32_fl, dente31_md, dente31_fl, dente41_md, dente41_fl, dente42_md, dente42_fl]
-
-    htmlReportTemplate = """<h2>PECK & PECK ANALYSIS</h2>
-
-<h3>Results (%)</h3>
-
-<table border="1">
-  <tr> <th>Tooth</th>  <th>Result</th>    <th>Normal range</th>  </tr>
-  <tr> <td>32</td>     <td>{3:.2f}%</td>  <td>90-95%</td>        </tr>
-  <tr> <td>31</td>     <td>{2:.2f}%</td>  <td>88-92%</td>        </tr>
-  <tr> <td>41</td>     <td>{1:.2f}%</td>  <td>88-92%</td>        </tr>
-  <tr> <td>42</td>     <td>{0:.2f}%</td>  <td>90-95%</td>        </tr>
-</table>
-
-<h3>Diameters (mm)</h3>
-
-<table border="1">
-  <tr> <th>Tooth</th>  <th>Axis</th>          <th>Diameter</th>  </tr>
-  <tr> <td>32</td>     <td>Mesiodistal</td>   <td>{4:.2f}mm</td>   </tr>
-  <tr> <td>32</td>     <td>Faciolingual</td>  <td>{5:.2f}mm</td>   </tr>
-  <tr> <td>31</td>     <td>Mesiodistal</td>   <td>{6:.2f}mm</td>   </tr>
-  <tr> <td>31</td>     <td>Faciolingual</td>  <td>{7:.2f}mm</td>   </tr>
-  <tr> <td>41</td>     <td>Mesiodistal</td>   <td>{8:.2f}mm</td>   </tr>
-  <tr> <td>41</td>     <td>Faciolingual</td>  <td>{9:.2f}mm</td>   </tr>
-  <tr> <td>42</td>     <td>Mesiodistal</td>   <td>{10:.2f}mm</td>   </tr>
-  <tr> <td>42</td>     <td>Faciolingual</td>  <td>{11:.2f}mm</td>   </tr>
-</table>
-"""
 
-    htmlReport = htmlReportTemplate.format(*results)
-    return htmlReport
+  def computeSuperiorSpaceAnalysis(self, markupsPointNode=None, labeledPoints=None):
+    return self.computeAnalysisResults("Superior", self.pointsSuperiorSpace, markupsPointNode, labeledPoints)
 
 
-  def computeAllAnalysis(self, markupsPointNode=None, labeledPoints=None):
+  def computeInferiorSpaceAnalysis(self, markupsPointNode=None, labeledPoints=None):
+    return self.computeAnalysisResults("Inferior", self.pointsInferiorSpace, markupsPointNode, labeledPoints)
+
+
+  def computeBoltonAnalysis(self, markupsPointNode=None, labeledPoints=None):
+    return self.computeAnalysisResults("Bolton", self.pointsBolton, markupsPointNode, labeledPoints)
 
-    if labeledPoints:
-      p = labeledPoints
-    else:
-      p = self.getLabeledPoints(self.pointsAll, markupsPointNode)
 
-    htmlReport = self.computeSuperiorSpaceAnalysis(labeledPoints=p)
-    htmlReport += self.computeInferiorSpaceAnalysis(labeledPoints=p)
-    htmlReport += self.computeBoltonAnalysis(labeledPoints=p)
-    htmlReport += self.computePeckAndPeckAnalysis(labeledPoints=p)
+  def computePeckAndPeckAnalysis(self, markupsPointNode=None, labeledPoints=None):
+    return self.computeAnalysisResults("PeckAndPeck", self.pointsPeckAndPeck, markupsPointNode, labeledPoints)
+
 
-    return htmlReport
+  def computeAllAnalysis(self, markupsPointNode=None, labeledPoints=None):
+    return self.computeAnalysisResults("All", self.pointsAll, markupsPointNode, labeledPoints)
 
 
 #
@@ -907,6 +1580,14 @@ class OrthodonticAnalysisTest(ScriptedLoadableModuleTest):
     """
     self.setUp()
     self.test_OrthodonticAnalysis1()
+    self.test_OrthodonticAnalysisBatch()
+
+  def getBoltonPoints(self):
+    """
+    Reference points of Bolton analysis on the TeethSurface sample data set.
+    """
+    from OrthodonticAnalysisLib.ReferenceLandmarks import getReferencePoints
+    return getReferencePoints(OrthodonticAnalysisLogic().pointsBolton)
 
   def test_OrthodonticAnalysis1(self):
     """ Ideally you should have several levels of tests.  At the lowest level
@@ -931,57 +1612,7 @@ class OrthodonticAnalysisTest(ScriptedLoadableModuleTest):
     inputModel = SampleData.downloadSample('TeethSurface')
     self.delayDisplay('Loaded test data set')
 
-    boltonPoints = np.array([
-        [ 22.08201981, -23.33771133,  20.25755501],
-        [ 22.24702835, -31.33755684,  21.34285164],
-        [ 21.05020905, -33.57769394,  20.82586288],
-        [ 19.80578232, -38.49482346,  21.96247864],
-        [ 18.11996651, -39.62874985,  20.58876419],
-        [ 15.6773119 , -43.51329041,  20.84062958],
-        [ 14.88829422, -45.93460083,  22.75982285],
-        [ 13.19761467, -49.92071915,  24.98643875],
-        [ 11.26348495, -51.92196655,  24.92158699],
-        [  8.64679909, -54.30356979,  24.28428459],
-        [  6.33776236, -56.0610466 ,  25.04037094],
-        [  1.78006351, -56.95132446,  25.48031998],
-        [ -2.16635013, -56.97172546,  25.0060463 ],
-        [ -6.92025566, -56.07076645,  25.30604935],
-        [ -9.60852814, -54.69460678,  22.86414337],
-        [-12.39715576, -51.92007065,  24.64757919],
-        [-13.62540627, -50.76442337,  22.39550209],
-        [-16.08952713, -47.632267  ,  24.58095741],
-        [-16.86974907, -44.14796448,  21.01618767],
-        [-19.02500725, -40.79146957,  21.13197517],
-        [-20.02264214, -38.30114746,  20.2833786 ],
-        [-22.63177681, -33.98239517,  21.14200592],
-        [-22.84235001, -32.13227844,  20.34781075],
-        [-23.02272606, -23.87202072,  20.32165146],
-
-        [-21.21748734,  28.36712456,  19.8465004 ],
-        [-20.2088089 ,  35.91403961,  19.19993591],
-        [-19.53867912,  39.61227798,  18.90285492],
-        [-18.82330132,  42.92764664,  18.90742874],
-        [-17.66699791,  45.53125   ,  19.33840942],
-        [-14.75944424,  48.4083519 ,  18.84576416],
-        [-13.24126625,  50.82159424,  17.86232758],
-        [-10.98532295,  53.38891983,  19.96564484],
-        [ -8.72065449,  55.52565384,  18.94808769],
-        [ -7.38320017,  56.39972687,  18.83339882],
-        [ -4.97158384,  57.34194565,  19.23067856],
-        [ -1.77612793,  57.65716171,  19.53565407],
-        [  1.08269632,  57.6644516 ,  18.88643074],
-        [  3.59803629,  57.58930969,  18.73008728],
-        [  6.15127277,  57.16143036,  18.54046822],
-        [  9.16291714,  55.95013428,  19.57354355],
-        [ 10.80373573,  54.19895172,  20.96066284],
-        [ 13.1416111 ,  52.37386703,  20.06233978],
-        [ 15.6479454 ,  49.06868744,  19.79941177],
-        [ 16.05915833,  45.21175385,  19.17629242],
-        [ 17.35715103,  43.17802811,  19.32717133],
-        [ 18.95762825,  38.32523727,  19.18061638],
-        [ 20.97534943,  36.32210541,  19.83763313],
-        [ 21.8088131 ,  28.76040459,  20.85327911]
-        ])
+    boltonPoints = self.getBoltonPoints()
 
     inputPointsNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLMarkupsFiducialNode", "P")
     slicer.util.updateMarkupsControlPointsFromArray(inputPointsNode, boltonPoints)
@@ -990,8 +1621,209 @@ class OrthodonticAnalysisTest(ScriptedLoadableModuleTest):
 
     logic = OrthodonticAnalysisLogic()
 
-    # Test algorithm with non-inverted threshold
-    reportPath = logic.compute("Bolton", inputPointsNode, slicer.app.temporaryPath)
-    self.assertIsNotNone(reportPath)
+    # Reports, result cache, result store, index, and archive are written into a new folder, so that
+    # reports of previous test runs are not reused
+    import shutil
+    import tempfile
+    reportFolder = tempfile.mkdtemp()
+    try:
+      # Test algorithm with non-inverted threshold
+      reportPath = logic.compute("Bolton", inputPointsNode, reportFolder)
+      self.assertIsNotNone(reportPath)
+
+      # Numeric results are saved next to the report
+      import json
+      with open(os.path.splitext(reportPath)[0] + ".json") as file_object:
+        results = json.load(file_object)
+      self.assertEqual(results["analysisType"], "Bolton")
+      self.assertEqual(results["bolton"]["total"]["excessArch"], logic.computeBoltonAnalysis(inputPointsNode).bolton.total.excessArch)
+
+      # Report is reused if points have not changed (also after restart, when the in-memory cache is empty)
+      numberOfStoredResults = logic.getResultStore(reportFolder).numberOfRows
+      logic.resultCache.clear()
+      self.assertEqual(logic.compute("Bolton", inputPointsNode, reportFolder), reportPath)
+      # Report is computed again if points have changed (report name may be the same if computed within the same second)
+      inputPointsNode.SetNthControlPointPosition(0, 22.0, -23.0, 20.0)
+      changedReportPath = logic.compute("Bolton", inputPointsNode, reportFolder)
+      with open(os.path.splitext(changedReportPath)[0] + ".json") as file_object:
+        changedResults = json.load(file_object)
+      self.assertNotEqual(changedResults["bolton"]["diameters"], results["bolton"]["diameters"])
+      self.assertEqual(changedResults["bolton"]["diameters"], logic.computeBoltonAnalysis(inputPointsNode).bolton.diameters)
+
+      # Each computed (not reused) report is appended to the result store
+      from OrthodonticAnalysisLib.ResultStore import ResultStore
+      resultStore = ResultStore(logic.getResultStore(reportFolder).folder)
+      self.assertEqual(resultStore.numberOfRows, numberOfStoredResults + 1)
+      self.assertEqual(resultStore.getCaseNames()[-1], "P")
+      self.assertAlmostEqual(resultStore.getColumn("bolton.total.ratio")[-1], logic.computeBoltonAnalysis(inputPointsNode).bolton.total.ratio)
+
+      # Results of computed reports are indexed
+      boltonRatio = logic.computeBoltonAnalysis(inputPointsNode).bolton.total.ratio
+      indexedReports = logic.queryReports(reportFolder, ["bolton.total.ratio>={0}".format(boltonRatio - 0.01)],
+        caseName="P", analysisType="Bolton", latest=True)
+      self.assertEqual(len(indexedReports), 1)
+      self.assertAlmostEqual(indexedReports[0]["bolton.total.ratio"], boltonRatio)
+      self.assertTrue(os.path.samefile(logic.getIndexedReportFilename(reportFolder, indexedReports[0]), changedReportPath))
+      # Results that are indexed again (e.g., computed within the same second) are kept as another report
+      from OrthodonticAnalysisLib.ReportIndex import ReportIndex
+      reportIndex = ReportIndex(os.path.join(reportFolder, "OrthodonticAnalysisIndexTest.sqlite"))
+      reportIndex.addResults(logic.computeBoltonAnalysis(inputPointsNode), "first.html")
+      reportIndex.addResults(logic.computeBoltonAnalysis(inputPointsNode), "second.html")
+      self.assertEqual([row["report"] for row in reportIndex.query(caseName="P")], ["first.html", "second.html"])
+      self.assertEqual([row["report"] for row in reportIndex.query(caseName="P", latest=True)], ["second.html"])
+      reportIndex.close()
+
+      # Archived reports are stored once and found by the manifest
+      logic.archiveReports = True
+      try:
+        archivedReportPath = logic.compute("Bolton", inputPointsNode, reportFolder)
+        self.assertEqual(logic.compute("Bolton", inputPointsNode, reportFolder), archivedReportPath)
+        archive = logic.getReportArchive(reportFolder)
+        entry = archive.getReports(caseName="P")[-1]
+        self.assertEqual(entry["report"], os.path.basename(archivedReportPath))
+        # Timestamp is recorded in the manifest only, so reports generated again from the same inputs are stored once
+        archivedResults = json.loads(archive.readBlob(entry["files"][os.path.splitext(entry["report"])[0] + ".json"]))
+        self.assertEqual(archivedResults["timestamp"], "")
+        self.assertTrue(entry["timestamp"])
+        # Archived reports are indexed by their id in the archive
+        archivedReports = logic.queryReports(reportFolder, caseName="P", analysisType="Bolton", latest=True)
+        self.assertTrue(archivedReports[0]["archived"])
+        self.assertTrue(os.path.samefile(logic.getIndexedReportFilename(reportFolder, archivedReports[0]), archivedReportPath))
+      finally:
+        logic.archiveReports = False
+
+      # Unknown screenshot view (e.g., stored by a later version of the module) falls back to the default view
+      parameterNode = logic.getParameterNode()
+      parameterNode.SetParameter("ScreenshotView", "UnknownView")
+      self.assertEqual(logic.getCaptureSettings(parameterNode)["ScreenshotView"], logic.defaultCaptureSettings["ScreenshotView"])
+      parameterNode.SetParameter("ScreenshotView", logic.defaultCaptureSettings["ScreenshotView"])
+
+      # Confidence intervals are included in the report if uncertainty analysis is enabled
+      uncertaintySettings = {"errorModel": "Gaussian", "landmarkError": 0.3, "numberOfSamples": 2000}
+      uncertaintyReportPath = logic.compute("Bolton", inputPointsNode, reportFolder, uncertaintySettings=uncertaintySettings)
+      with open(os.path.splitext(uncertaintyReportPath)[0] + ".json") as file_object:
+        uncertainty = json.load(file_object)["uncertainty"]
+      ratioInterval = uncertainty["intervals"]["bolton.total.ratio"]
+      self.assertLess(ratioInterval["lower"], ratioInterval["value"])
+      self.assertLess(ratioInterval["value"], ratioInterval["upper"])
+      self.assertTrue(0.0 <= uncertainty["thresholds"]["bolton.anterior"]["crossingProbability"] <= 0.5)
+      # Without landmark error the intervals collapse to the computed values
+      from OrthodonticAnalysisLib.UncertaintyAnalysis import computeUncertainty
+      exactInterval = computeUncertainty("Bolton", boltonPoints, landmarkError=0.0, numberOfSamples=10)["intervals"]["bolton.total.ratio"]
+      self.assertAlmostEqual(exactInterval["lower"], exactInterval["upper"])
+
+      # Point lists of a subject hierarchy folder are computed together into a combined report
+      shNode = slicer.vtkMRMLSubjectHierarchyNode.GetSubjectHierarchyNode(slicer.mrmlScene)
+      folderItemID = shNode.CreateFolderItem(shNode.GetSceneItemID(), "Session")
+      sessionPointsNodes = []
+      for caseIndex in range(3):
+        sessionPointsNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLMarkupsFiducialNode", "Case{0}".format(caseIndex))
+        slicer.util.updateMarkupsControlPointsFromArray(sessionPointsNode, boltonPoints + [0.0, 0.0, caseIndex])
+        shNode.SetItemParent(shNode.GetItemByDataNode(sessionPointsNode), folderItemID)
+        sessionPointsNodes.append(sessionPointsNode)
+      self.assertEqual(logic.getInputPointsNodes(folderItemID), sessionPointsNodes)
+      combinedReportPath = logic.computeMultiple("Bolton", sessionPointsNodes, reportFolder,
+        dict(logic.getCaptureSettings(), ScreenshotMode="Thumbnail"))
+      with open(os.path.splitext(combinedReportPath)[0] + ".json") as file_object:
+        combinedResults = json.load(file_object)
+      self.assertEqual([caseResults["name"] for caseResults in combinedResults], ["Case0", "Case1", "Case2"])
+      for caseResults, sessionPointsNode in zip(combinedResults, sessionPointsNodes):
+        self.assertAlmostEqual(caseResults["bolton"]["total"]["ratio"], logic.computeBoltonAnalysis(sessionPointsNode).bolton.total.ratio)
+      self.assertTrue(all(sessionPointsNode.GetDisplayNode().GetVisibility() for sessionPointsNode in sessionPointsNodes))
+      longitudinalReportPath = logic.computeLongitudinal("Bolton", sessionPointsNodes, reportFolder, "Patient")
+      with open(os.path.splitext(longitudinalReportPath)[0] + ".json") as file_object:
+        longitudinalResults = json.load(file_object)
+      self.assertEqual([visit["name"] for visit in longitudinalResults["visits"]], ["Case0", "Case1", "Case2"])
+      self.assertEqual(longitudinalResults["results"]["bolton.total.ratio"]["changeFromBaseline"][0], 0.0)
+    finally:
+      logic.closeReportFolder(reportFolder)
+      shutil.rmtree(reportFolder, ignore_errors=True)
+
+    # Snapped points are on the model surface, surface locator is built only once
+    snappedPosition = logic.snapPoint(boltonPoints[0] + [0.0, 0.0, 2.0], inputModel, "Surface")
+    locator = logic.surfaceLocators.getLocator(inputModel)
+    self.assertAlmostEqual(np.linalg.norm(locator.snapToSurface(snappedPosition) - snappedPosition), 0.0, places=3)
+    logic.snapPoint(boltonPoints[1], inputModel, "Extremum", 1.0)
+    self.assertIs(logic.surfaceLocators.getLocator(inputModel), locator)
+
+    # Decimated copy is displayed instead of the model, and the model is displayed again when disabled
+    maximumNumberOfTriangles = inputModel.GetPolyData().GetNumberOfCells() // 4
+    self.assertTrue(logic.setDisplayProxyEnabled(inputModel, True, maximumNumberOfTriangles))
+    proxyModel = logic.getDisplayProxyModel(inputModel, maximumNumberOfTriangles)
+    self.assertLessEqual(proxyModel.GetPolyData().GetNumberOfCells(), maximumNumberOfTriangles)
+    self.assertFalse(inputModel.GetDisplayVisibility())
+    self.assertTrue(proxyModel.GetDisplayVisibility())
+    logic.setDisplayProxyEnabled(inputModel, False)
+    self.assertTrue(inputModel.GetDisplayVisibility())
+    self.assertFalse(proxyModel.GetDisplayVisibility())
+    self.assertIsNone(logic.getDisplayProxyModel(inputModel, inputModel.GetPolyData().GetNumberOfCells()))
+    logic.removeDisplayProxies()
+
+    # Pre-placed points are on the surface, close to the reference points (the template is placed on the same model)
+    preplacedPointsNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLMarkupsFiducialNode")
+    registrationError = logic.preplacePoints("Bolton", preplacedPointsNode, inputModel, "Rigid")
+    self.assertLess(registrationError, 1.0)
+    preplacedPoints = slicer.util.arrayFromMarkupsControlPoints(preplacedPointsNode)
+    self.assertEqual(len(preplacedPoints), len(boltonPoints))
+    self.assertLess(np.linalg.norm(preplacedPoints - boltonPoints, axis=1).mean(), 1.0)
+
+    self.delayDisplay('Test passed')
+
+  def test_OrthodonticAnalysisBatch(self):
+    """
+    Test that vectorized computation of a stack of patients gives the same results
+    as computing distances one by one.
+    """
+
+    self.delayDisplay("Starting the batch test")
+
+    import numpy as np
+
+    logic = OrthodonticAnalysisLogic()
+    referencePoints = self.getBoltonPoints()
+    numberOfPatients = 5
+    rng = np.random.default_rng(0)
+    points = referencePoints + rng.normal(0, 0.5, (numberOfPatients,) + referencePoints.shape)
+
+    results = logic.computeBatch("Bolton", points)["Bolton"]
+    self.assertEqual(len(results["r_bolt_12"]), numberOfPatients)
+
+    for patientIndex in range(numberOfPatients):
+      labeledPoints = {longName: position for [shortName, longName], position in zip(logic.pointsBolton, points[patientIndex])}
+      for tooth in ["16", "11", "23", "31", "46"]:
+        expectedDiameter = logic.distance(labeledPoints, "Distal point of Tooth "+tooth, "Mesial point of Tooth "+tooth)
+        self.assertAlmostEqual(results["diameters"][tooth][patientIndex], expectedDiameter)
+      self.assertAlmostEqual(results["r_bolt_12"][patientIndex],
+        results["dist_12_inf"][patientIndex] / results["dist_12_sup"][patientIndex] * 100)
+
+    # Streaming statistics of a cohort that is added in several batches
+    from OrthodonticAnalysisLib.CohortStatistics import CohortStatistics
+    from OrthodonticAnalysisLib.ReferenceLandmarks import generateCohort
+    cohortPoints = generateCohort(logic.pointsBolton, 10000)
+    ratios = logic.computeBatch("Bolton", cohortPoints)["Bolton"]["r_bolt_12"]
+    statistics = CohortStatistics()
+    for batchPoints in np.array_split(cohortPoints, 7):
+      statistics.updateEngineResults(logic.computeBatch("Bolton", batchPoints))
+    ratioStatistics = statistics.getSummary()["bolton.total.ratio"]
+    self.assertEqual(ratioStatistics["count"], len(ratios))
+    self.assertAlmostEqual(ratioStatistics["mean"], ratios.mean())
+    self.assertAlmostEqual(ratioStatistics["standardDeviation"], ratios.std(ddof=1))
+    # Quantile sketch has about 1% rank error
+    self.assertAlmostEqual(np.mean(ratios <= ratioStatistics["p50"]), 0.5, delta=0.02)
+
+    # Landmark archive gives the same results as the markups nodes, also if it is processed in slices
+    import tempfile
+    from OrthodonticAnalysisLib.LandmarkArchive import LandmarkArchive
+    markupsPointNodes = []
+    for patientIndex in range(numberOfPatients):
+      markupsPointNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLMarkupsFiducialNode", "Patient{0}".format(patientIndex))
+      slicer.util.updateMarkupsControlPointsFromArray(markupsPointNode, points[patientIndex])
+      markupsPointNodes.append(markupsPointNode)
+    archiveFilename = os.path.join(tempfile.mkdtemp(), "cohort.npy")
+    logic.createLandmarkArchive(archiveFilename, "Bolton", markupsPointNodes)
+    archive = LandmarkArchive(archiveFilename)
+    self.assertEqual(archive.caseNames, ["Patient{0}".format(patientIndex) for patientIndex in range(numberOfPatients)])
+    archiveRatios = np.concatenate([engineResults["Bolton"]["r_bolt_12"] for caseNames, engineResults in archive.computeBatches("Bolton", batchSize=2)])
+    np.testing.assert_allclose(archiveRatios, results["r_bolt_12"], atol=1e-4)
 
     self.delayDisplay('Test passed')
@@ -0,0 +1,106 @@
+#
+# Declarative definitions of the orthodontic analyses
+#
+# Each analysis is a list of measurements, which are evaluated in order. Each measurement is a dict:
+#
+#   operation: how the values are computed
+#     "distances": distance between two points of each tooth (points: suffixes of the point short names,
+#       optionalTeeth: teeth that are only measured if their points are in the point list)
+#     "chainLength": total length of a polyline (chain: short names of the points)
+#     "sum": sum of the distances of some teeth (of: name of a "distances" measurement)
+#     "difference", "ratio": difference or ratio (multiplied by scale) of two measurements (of: their names),
+#       ratio of two "distances" measurements is computed for each tooth
+#     "boltonExcess": excess arch, excess, and ideal arch lengths (outputs: their names) from the superior and
+#       inferior sums and their ratio (of: their names), see AnalysisEngine.boltonExcess
+#   name: key of the result in AnalysisEngine.compute results
+#   label, unit: how the measurement is displayed in live results (see LiveAnalysis), "{0}" in the label
+#     of per-tooth measurements is replaced by the tooth. Measurements without label are not displayed.
+#
+# Definitions are compiled into integer index arrays by AnalysisEngine (once for each point list).
+#
+
+superiorTeeth = ["16", "15", "14", "13", "12", "11", "21", "22", "23", "24", "25", "26"]
+inferiorTeeth = ["36", "35", "34", "33", "32", "31", "41", "42", "43", "44", "45", "46"]
+
+# Teeth that are only reported in space analysis if they are marked (e.g., in "All" analysis)
+spaceAnalysisOptionalTeeth = ["16", "26", "36", "46"]
+
+superiorAnteriorTeeth = ["13", "12", "11", "21", "22", "23"]
+inferiorAnteriorTeeth = ["33", "32", "31", "41", "42", "43"]
+
+superiorSegmentChain = ["15-14-D", "15-14-M-13-D", "13-MS", "SAM", "23-MS", "25-24-M-23-D", "25-24-D"]
+inferiorSegmentChain = ["35-34-D", "35-34-M-33-D", "33-MS", "IAM", "43-MS", "45-44-M-43-D", "45-44-D"]
+
+peckAndPeckTeeth = ["32", "31", "41", "42"]
+
+# Ideal inferior/superior ratios (%) of Bolton analysis
+boltonRatio12 = 91.3
+boltonRatio6 = 77.2
+
+
+def spaceAnalysisDefinition(arch, teeth, segmentChain, suffix):
+  return [
+    {"operation": "distances", "name": "diameters", "teeth": teeth, "points": ("D", "M"),
+      "optionalTeeth": spaceAnalysisOptionalTeeth, "label": "Tooth {0}", "unit": "mm"},
+    {"operation": "sum", "name": "esp_r_"+suffix, "of": "diameters",
+      "teeth": [tooth for tooth in teeth if tooth not in spaceAnalysisOptionalTeeth],
+      "label": "Required space ({0})".format(arch.lower()), "unit": "mm"},
+    {"operation": "chainLength", "name": "esp_a_"+suffix, "chain": segmentChain,
+      "label": "Rated space ({0})".format(arch.lower()), "unit": "mm"},
+    {"operation": "difference", "name": "disc_"+suffix, "of": ["esp_a_"+suffix, "esp_r_"+suffix],
+      "label": "{0} arch discrepancy".format(arch), "unit": "mm"},
+    ]
+
+
+def boltonAnalysisDefinition():
+  measurements = [
+    {"operation": "distances", "name": "diameters", "teeth": superiorTeeth + inferiorTeeth, "points": ("D", "M"),
+      "label": "Tooth {0}", "unit": "mm"},
+    ]
+  for count, title, archTeeth, idealRatio in [
+      ("12", "Total", [superiorTeeth, inferiorTeeth], boltonRatio12),
+      ("6", "Anterior", [superiorAnteriorTeeth, inferiorAnteriorTeeth], boltonRatio6)]:
+    superiorSum, inferiorSum = "dist_{0}_sup".format(count), "dist_{0}_inf".format(count)
+    measurements += [
+      {"operation": "sum", "name": superiorSum, "of": "diameters", "teeth": archTeeth[0],
+        "label": "Sum of {0} superior teeth".format(count), "unit": "mm"},
+      {"operation": "sum", "name": inferiorSum, "of": "diameters", "teeth": archTeeth[1],
+        "label": "Sum of {0} inferior teeth".format(count), "unit": "mm"},
+      {"operation": "ratio", "name": "r_bolt_"+count, "of": [inferiorSum, superiorSum], "scale": 100.0,
+        "label": "{0} Bolton ratio".format(title), "unit": "%"},
+      {"operation": "boltonExcess", "name": "excess_"+count, "of": [superiorSum, inferiorSum, "r_bolt_"+count],
+        "idealRatio": idealRatio, "outputs": ["excess_{0}_arch".format(count), "excess_"+count,
+        "ideal_{0}_sup".format(count), "ideal_{0}_inf".format(count)]},
+      ]
+  return measurements
+
+
+def peckAndPeckAnalysisDefinition():
+  return [
+    {"operation": "distances", "name": "diameters_md", "teeth": peckAndPeckTeeth, "points": ("D", "M"),
+      "label": "Tooth {0}", "unit": "mm"},
+    {"operation": "distances", "name": "diameters_fl", "teeth": peckAndPeckTeeth, "points": ("V", "L"),
+      "label": "Tooth {0} faciolingual", "unit": "mm"},
+    {"operation": "ratio", "name": "indice", "of": ["diameters_md", "diameters_fl"], "scale": 100.0,
+      "label": "Peck and Peck index of tooth {0}", "unit": "%"},
+    ]
+
+
+# Analyses of each section of the results ("All" analysis type computes all of them)
+analysisDefinitions = {
+  "Superior": spaceAnalysisDefinition("Superior", superiorTeeth, superiorSegmentChain, "sup"),
+  "Inferior": spaceAnalysisDefinition("Inferior", inferiorTeeth, inferiorSegmentChain, "inf"),
+  "Bolton": boltonAnalysisDefinition(),
+  "PeckAndPeck": peckAndPeckAnalysisDefinition(),
+  }
+
+
+def getAnalysisSections(analysisType):
+  """
+  Return names of the analyses (keys of analysisDefinitions) that are computed for an analysis type.
+  """
+  if analysisType == "All":
+    return list(analysisDefinitions)
+  if analysisType not in analysisDefinitions:
+    raise ValueError("Invalid analysisType: {0}".format(analysisType))
+  return [analysisType]
@@ -0,0 +1,215 @@
+import numpy as np
+
+from OrthodonticAnalysisLib.AnalysisDefinitions import analysisDefinitions, getAnalysisSections
+
+#
+# Vectorized evaluation of the orthodontic analyses
+#
+# Landmarks of N patients are stacked into a single (N, K, 3) array, where K is the number of
+# points in the point list of the analysis (in the same order as the point list).
+# Analyses are defined in AnalysisDefinitions and compiled into an AnalysisPlan for each point list and analysis type:
+# all distances of all analyses of the type are computed by a single gather followed by a single norm computation,
+# then sums, differences, and ratios are computed from columns of the distance matrix.
+# Distances that are used by several analyses (e.g., tooth diameters in space, Bolton, and Peck and Peck analyses
+# of "All" analysis type) are computed only once.
+#
+
+def norms(points, firstIndices, secondIndices):
+  """
+  Distance between pairs of points for all patients.
+  Returns an (N, len(firstIndices)) array.
+  """
+  return np.linalg.norm(points[:, firstIndices] - points[:, secondIndices], axis=-1)
+
+
+def boltonExcess(sumSuperior, sumInferior, ratio, idealRatio):
+  """
+  Compute excess arch, excess and ideal arch lengths. If the ratio is above the ideal ratio
+  then there is excess on inferior arch (superior is used as ideal), otherwise there is excess
+  on the superior arch (inferior is used as ideal).
+  """
+  excessOnInferior = ratio > idealRatio
+  idealSuperior = np.where(excessOnInferior, sumSuperior, sumInferior / (idealRatio / 100.0))
+  idealInferior = np.where(excessOnInferior, sumSuperior * (idealRatio / 100.0), sumInferior)
+  excess = np.where(excessOnInferior, sumInferior - idealInferior, sumSuperior - idealSuperior)
+  excessArch = np.where(excessOnInferior, "Inferior", "Superior")
+  return excessArch, excess, idealSuperior, idealInferior
+
+
+class AnalysisPlan:
+  """Measurements of analyses (see AnalysisDefinitions) compiled for a point list.
+
+  Point names are resolved into the indices of the point pairs of all distances when the plan is created,
+  and each measurement is compiled into a step that refers to columns of the distance matrix or to the values
+  of previous steps, so evaluation does not look up any names. Each distinct pair of points is a single column
+  of the distance matrix, which is shared by all measurements (and all analyses) that use it.
+  """
+
+  def __init__(self, sections, pointIndices):
+    """
+    sections is a dict that maps analysis name to its measurements.
+    """
+    self.firstIndices = []
+    self.secondIndices = []
+    self.steps = []  # (section, operation, name, arguments)
+    self.keys = {}  # (section, name of per-tooth measurement) -> teeth
+    pairColumns = {}  # (point index, point index) -> column of the distance matrix
+
+    def indices(shortNames):
+      try:
+        return [pointIndices[shortName] for shortName in shortNames]
+      except KeyError as e:
+        raise ValueError("Point {0} is required by the analysis but it is not in the point list".format(e))
+
+    def addDistances(firstShortNames, secondShortNames):
+      columns = []
+      for pair in zip(indices(firstShortNames), indices(secondShortNames)):
+        key = tuple(sorted(pair))
+        if key not in pairColumns:
+          pairColumns[key] = len(self.firstIndices)
+          self.firstIndices.append(pair[0])
+          self.secondIndices.append(pair[1])
+        columns.append(pairColumns[key])
+      return np.array(columns, dtype=int)
+
+    for section, measurements in sections.items():
+      distanceColumns = {}  # name of "distances" measurement -> columns of the distance matrix
+      for measurement in measurements:
+        operation = measurement["operation"]
+        name = measurement["name"]
+        if operation == "distances":
+          suffixes = measurement["points"]
+          optionalTeeth = measurement.get("optionalTeeth", ())
+          teeth = [tooth for tooth in measurement["teeth"] if (tooth not in optionalTeeth)
+            or all("{0}-{1}".format(tooth, suffix) in pointIndices for suffix in suffixes)]
+          columns = addDistances(["{0}-{1}".format(tooth, suffixes[0]) for tooth in teeth],
+            ["{0}-{1}".format(tooth, suffixes[1]) for tooth in teeth])
+          self.keys[(section, name)] = teeth
+          distanceColumns[name] = columns
+          self.steps.append((section, "columns", name, columns))
+        elif operation == "chainLength":
+          chain = measurement["chain"]
+          self.steps.append((section, "sumColumns", name, addDistances(chain[:-1], chain[1:])))
+        elif operation == "sum":
+          teeth = self.keys[(section, measurement["of"])]
+          columns = distanceColumns[measurement["of"]][[teeth.index(tooth) for tooth in measurement["teeth"]]]
+          self.steps.append((section, "sumColumns", name, columns))
+        elif operation in ["difference", "ratio"]:
+          if (section, measurement["of"][0]) in self.keys:
+            self.keys[(section, name)] = self.keys[(section, measurement["of"][0])]
+          self.steps.append((section, operation, name, (measurement["of"], measurement.get("scale", 1.0))))
+        elif operation == "boltonExcess":
+          self.steps.append((section, operation, name, (measurement["of"], measurement["idealRatio"], measurement["outputs"])))
+        else:
+          raise ValueError("Invalid operation of measurement {0}: {1}".format(name, operation))
+    self.sections = list(sections)
+    self.firstIndices = np.array(self.firstIndices, dtype=int)
+    self.secondIndices = np.array(self.secondIndices, dtype=int)
+
+  def evaluate(self, points):
+    """
+    Compute all measurements for a stack of patients (NxKx3 array).
+    Returns a dict that maps analysis name to the results of the analysis: a dict that maps measurement name
+    to an array of N values, or for per-tooth measurements to a dict that maps tooth to an array of N values.
+    """
+    distances = norms(points, self.firstIndices, self.secondIndices)
+    results = {section: {} for section in self.sections}
+    for section, operation, name, arguments in self.steps:
+      values = results[section]
+      if operation == "columns":
+        values[name] = distances[:, arguments]
+      elif operation == "sumColumns":
+        values[name] = distances[:, arguments].sum(axis=1)
+      elif operation == "difference":
+        (first, second), scale = arguments
+        values[name] = values[first] - values[second]
+      elif operation == "ratio":
+        (numerator, denominator), scale = arguments
+        values[name] = (values[numerator] / values[denominator]) * scale
+      elif operation == "boltonExcess":
+        (superiorSum, inferiorSum, ratio), idealRatio, outputs = arguments
+        values.update(zip(outputs, boltonExcess(values[superiorSum], values[inferiorSum], values[ratio], idealRatio)))
+    for (section, name), teeth in self.keys.items():
+      values = results[section]
+      values[name] = {tooth: values[name][:, index] for index, tooth in enumerate(teeth)}
+    return results
+
+
+class AnalysisEngine:
+  """Computes analysis results for a stack of patients in a few vectorized passes.
+
+  The engine is created for a point list (list of [shortName, longName] pairs, as returned
+  by OrthodonticAnalysisLogic.getPointNames) and it can be reused for any number of patients.
+  Analysis definitions are compiled for the point list when an analysis type is computed the first time.
+  All analyses of an analysis type are compiled into a single plan, so "All" analysis computes each distance once.
+  """
+
+  def __init__(self, pointNames):
+    self.pointNames = pointNames
+    self.pointIndices = {shortName: index for index, [shortName, longName] in enumerate(pointNames)}
+    self._plans = {}
+
+  def getPlan(self, analysisType):
+    """
+    Return compiled plan of all analyses of an analysis type.
+    """
+    plan = self._plans.get(analysisType)
+    if plan is None:
+      plan = AnalysisPlan({section: analysisDefinitions[section] for section in getAnalysisSections(analysisType)},
+        self.pointIndices)
+      self._plans[analysisType] = plan
+    return plan
+
+  def validatePoints(self, points):
+    points = np.asarray(points, dtype=float)
+    if points.ndim == 2:
+      points = points[np.newaxis]
+    if points.ndim != 3 or points.shape[1:] != (len(self.pointNames), 3):
+      raise ValueError("Expected an array of shape (N, {0}, 3), got {1}".format(len(self.pointNames), points.shape))
+    return points
+
+  def computeSuperiorSpaceAnalysis(self, points):
+    return self.getPlan("Superior").evaluate(self.validatePoints(points))["Superior"]
+
+  def computeInferiorSpaceAnalysis(self, points):
+    return self.getPlan("Inferior").evaluate(self.validatePoints(points))["Inferior"]
+
+  def computeBoltonAnalysis(self, points):
+    return self.getPlan("Bolton").evaluate(self.validatePoints(points))["Bolton"]
+
+  def computePeckAndPeckAnalysis(self, points):
+    return self.getPlan("PeckAndPeck").evaluate(self.validatePoints(points))["PeckAndPeck"]
+
+  def compute(self, analysisType, points):
+    """
+    Compute all results of an analysis type for a stack of patients.
+    Returns a dict that maps analysis name ("Superior", "Inferior", "Bolton", "PeckAndPeck")
+    to the results of that analysis. "All" analysis type returns results of all analyses.
+    """
+    return self.getPlan(analysisType).evaluate(self.validatePoints(points))
+
+
+_analysisEngines = {}
+
+
+def getAnalysisEngine(pointNames):
+  """
+  Return analysis engine for a point list ([short name, long name] pairs).
+  Engines are cached, because label lookups are performed when the engine is created.
+  """
+  key = tuple(shortName for shortName, longName in pointNames)
+  if key not in _analysisEngines:
+    _analysisEngines[key] = AnalysisEngine(pointNames)
+  return _analysisEngines[key]
+
+
+def computeAnalysis(analysisType, points, pointNames=None):
+  """
+  Compute results of an analysis type for a stack of patients.
+  points is an NxKx3 array, containing points in the order of pointNames
+  (point list of the analysis type by default).
+  """
+  if pointNames is None:
+    from OrthodonticAnalysisLib.AnalysisPoints import getPointNames
+    pointNames = getPointNames(analysisType)
+  return getAnalysisEngine(pointNames).compute(analysisType, points)
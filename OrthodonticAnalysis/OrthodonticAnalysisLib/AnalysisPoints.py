@@ -0,0 +1,121 @@
+#
+# Landmark schema: points of each analysis type
+#
+# Each point list contains [short name, long name] pairs. Control points of the input markups
+# node are expected in the same order as the points in the list of the selected analysis type.
+#
+
+pointsPeckAndPeck = [
+  ["32-D", "Distal point of Tooth 32"], ["32-M", "Mesial point of Tooth 32"], ["32-V", "Vestibular point of Tooth 32"], ["32-L", "Lingual point of Tooth 32"],
+  ["31-D", "Distal point of Tooth 31"], ["31-M", "Mesial point of Tooth 31"], ["31-V", "Vestibular point of Tooth 31"], ["31-L", "Lingual point of Tooth 31"],
+  ["41-D", "Distal point of Tooth 41"], ["41-M", "Mesial point of Tooth 41"], ["41-V", "Vestibular point of Tooth 41"], ["41-L", "Lingual point of Tooth 41"],
+  ["42-D", "Distal point of Tooth 42"], ["42-M", "Mesial point of Tooth 42"], ["42-V", "Vestibular point of Tooth 42"], ["42-L", "Lingual point of Tooth 42"],
+]
+
+pointsBolton = [
+  ["16-D", "Distal point of Tooth 16"],  ["16-M", "Mesial point of Tooth 16"],
+  ["15-D", "Distal point of Tooth 15"],  ["15-M", "Mesial point of Tooth 15"],
+  ["14-D", "Distal point of Tooth 14"],  ["14-M", "Mesial point of Tooth 14"],
+  ["13-D", "Distal point of Tooth 13"],  ["13-M", "Mesial point of Tooth 13"],
+  ["12-D", "Distal point of Tooth 12"],  ["12-M", "Mesial point of Tooth 12"],
+  ["11-D", "Distal point of Tooth 11"],  ["11-M", "Mesial point of Tooth 11"],
+  ["21-M", "Mesial point of Tooth 21"],  ["21-D", "Distal point of Tooth 21"],
+  ["22-M", "Mesial point of Tooth 22"],  ["22-D", "Distal point of Tooth 22"],
+  ["23-M", "Mesial point of Tooth 23"],  ["23-D", "Distal point of Tooth 23"],
+  ["24-M", "Mesial point of Tooth 24"],  ["24-D", "Distal point of Tooth 24"],
+  ["25-M", "Mesial point of Tooth 25"],  ["25-D", "Distal point of Tooth 25"],
+  ["26-M", "Mesial point of Tooth 26"],  ["26-D", "Distal point of Tooth 26"],
+  ["36-D", "Distal point of Tooth 36"],  ["36-M", "Mesial point of Tooth 36"],
+  ["35-D", "Distal point of Tooth 35"],  ["35-M", "Mesial point of Tooth 35"],
+  ["34-D", "Distal point of Tooth 34"],  ["34-M", "Mesial point of Tooth 34"],
+  ["33-D", "Distal point of Tooth 33"],  ["33-M", "Mesial point of Tooth 33"],
+  ["32-D", "Distal point of Tooth 32"],  ["32-M", "Mesial point of Tooth 32"],
+  ["31-D", "Distal point of Tooth 31"],  ["31-M", "Mesial point of Tooth 31"],
+  ["41-M", "Mesial point of Tooth 41"],  ["41-D", "Distal point of Tooth 41"],
+  ["42-M", "Mesial point of Tooth 42"],  ["42-D", "Distal point of Tooth 42"],
+  ["43-M", "Mesial point of Tooth 43"],  ["43-D", "Distal point of Tooth 43"],
+  ["44-M", "Mesial point of Tooth 44"],  ["44-D", "Distal point of Tooth 44"],
+  ["45-M", "Mesial point of Tooth 45"],  ["45-D", "Distal point of Tooth 45"],
+  ["46-M", "Mesial point of Tooth 46"],  ["46-D", "Distal point of Tooth 46"],
+]
+
+pointsInferiorMid = [
+  ["35-34-D", "Distal point of Teeth segment 35-34"],
+  ["35-34-M-33-D", "Mesial point of Teeth segment 35-34 and Distal of Tooth 33"],
+  ["33-MS", "Mesial point of Tooth segment 33"],
+  ["IAM", "Inferior Arch Midpoint"],
+  ["43-MS", "Mesial point of Tooth segment 43"],
+  ["45-44-M-43-D", "Mesial point of Teeth segment 45-44 and Distal of Tooth 43"],
+  ["45-44-D", "Distal point of Teeth segment 45-44"],
+]
+
+pointsInferiorSpace = [
+  ["35-D", "Distal point of Tooth 35"],  ["35-M", "Mesial point of Tooth 35"],
+  ["34-D", "Distal point of Tooth 34"],  ["34-M", "Mesial point of Tooth 34"],
+  ["33-D", "Distal point of Tooth 33"],  ["33-M", "Mesial point of Tooth 33"],
+  ["32-D", "Distal point of Tooth 32"],  ["32-M", "Mesial point of Tooth 32"],
+  ["31-D", "Distal point of Tooth 31"],  ["31-M", "Mesial point of Tooth 31"],
+  ["41-M", "Mesial point of Tooth 41"],  ["41-D", "Distal point of Tooth 41"],
+  ["42-M", "Mesial point of Tooth 42"],  ["42-D", "Distal point of Tooth 42"],
+  ["43-M", "Mesial point of Tooth 43"],  ["43-D", "Distal point of Tooth 43"],
+  ["44-M", "Mesial point of Tooth 44"],  ["44-D", "Distal point of Tooth 44"],
+  ["45-M", "Mesial point of Tooth 45"],  ["45-D", "Distal point of Tooth 45"],
+]
+pointsInferiorSpace.extend(pointsInferiorMid)
+
+pointsSuperiorMid = [
+  ["15-14-D", "Distal point of Teeth segment 15-14"],
+  ["15-14-M-13-D", "Mesial point of Teeth segment 15-14 and Distal of Tooth 13"],
+  ["13-MS", "Mesial point of Tooth segment 13"],
+  ["SAM", "Superior Arch Midpoint"],
+  ["23-MS", "Mesial point of Tooth segment 23"],
+  ["25-24-M-23-D", "Mesial point of Teeth segment 25-24 and Distal of Tooth 23"],
+  ["25-24-D", "Distal point of Teeth segment 25-24"],
+]
+
+pointsSuperiorSpace = [
+  ["15-D", "Distal point of Tooth 15"],  ["15-M", "Mesial point of Tooth 15"],
+  ["14-D", "Distal point of Tooth 14"],  ["14-M", "Mesial point of Tooth 14"],
+  ["13-D", "Distal point of Tooth 13"],  ["13-M", "Mesial point of Tooth 13"],
+  ["12-D", "Distal point of Tooth 12"],  ["12-M", "Mesial point of Tooth 12"],
+  ["11-D", "Distal point of Tooth 11"],  ["11-M", "Mesial point of Tooth 11"],
+  ["21-M", "Mesial point of Tooth 21"],  ["21-D", "Distal point of Tooth 21"],
+  ["22-M", "Mesial point of Tooth 22"],  ["22-D", "Distal point of Tooth 22"],
+  ["23-M", "Mesial point of Tooth 23"],  ["23-D", "Distal point of Tooth 23"],
+  ["24-M", "Mesial point of Tooth 24"],  ["24-D", "Distal point of Tooth 24"],
+  ["25-M", "Mesial point of Tooth 25"],  ["25-D", "Distal point of Tooth 25"],
+]
+pointsSuperiorSpace.extend(pointsSuperiorMid)
+
+pointsAll = []
+pointsAll.extend(pointsBolton)
+pointsAll.extend(pointsSuperiorMid)
+pointsAll.extend(pointsInferiorMid)
+# Peck and Peck without medial-distal points
+pointsAll.extend([
+  ["32-V", "Vestibular point of Tooth 32"], ["32-L", "Lingual point of Tooth 32"],
+  ["31-V", "Vestibular point of Tooth 31"], ["31-L", "Lingual point of Tooth 31"],
+  ["41-V", "Vestibular point of Tooth 41"], ["41-L", "Lingual point of Tooth 41"],
+  ["42-V", "Vestibular point of Tooth 42"], ["42-L", "Lingual point of Tooth 42"],
+])
+
+
+analysisTypes = ["Superior", "Inferior", "Bolton", "PeckAndPeck", "All"]
+
+pointLists = {
+  "Superior": pointsSuperiorSpace,
+  "Inferior": pointsInferiorSpace,
+  "Bolton": pointsBolton,
+  "PeckAndPeck": pointsPeckAndPeck,
+  "All": pointsAll,
+  }
+
+
+def getPointNames(analysisType):
+  """
+  Return point list ([short name, long name] pairs) of an analysis type.
+  """
+  try:
+    return pointLists[analysisType]
+  except KeyError:
+    raise ValueError("Invalid analysisType: {0}".format(analysisType))
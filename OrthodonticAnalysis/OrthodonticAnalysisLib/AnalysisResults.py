@@ -0,0 +1,168 @@
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import Any, Dict, Optional
+
+#
+# Structured analysis results of a single case
+#
+# Values are plain Python floats and strings so that results can be pickled, serialized,
+# and rendered into any format (see ReportRenderers) without keeping formatted text around.
+#
+
+
+def _toPlainValue(value):
+  """
+  Convert dataclasses (recursively) into dicts. Unlike dataclasses.asdict, leaf values are not deep-copied,
+  which would dominate the time of rendering reports of large cohorts.
+  """
+  if is_dataclass(value):
+    return {item.name: _toPlainValue(getattr(value, item.name)) for item in fields(value)}
+  if isinstance(value, dict):
+    return {key: _toPlainValue(item) for key, item in value.items()}
+  if isinstance(value, (list, tuple)):
+    return type(value)(_toPlainValue(item) for item in value)
+  return value
+
+
+@dataclass
+class SpaceAnalysisResults:
+  arch: str  # "Superior" or "Inferior"
+  diameters: Dict[str, float]  # mesiodistal diameter (mm) of each tooth
+  requiredSpace: float  # mm
+  ratedSpace: float  # mm
+  discrepancy: float  # mm, positive if there is excess space
+
+
+@dataclass
+class BoltonRatioResults:
+  ratio: float  # inferior/superior sum (%)
+  superiorSum: float  # mm
+  inferiorSum: float  # mm
+  excessArch: str  # "Superior" or "Inferior"
+  excess: float  # mm
+  idealSuperiorLength: float  # mm
+  idealInferiorLength: float  # mm
+
+
+@dataclass
+class BoltonAnalysisResults:
+  diameters: Dict[str, float]  # mesiodistal diameter (mm) of each tooth
+  total: BoltonRatioResults  # 12 teeth per arch
+  anterior: BoltonRatioResults  # 6 teeth per arch
+
+
+@dataclass
+class PeckAndPeckAnalysisResults:
+  mesiodistalDiameters: Dict[str, float]  # mm
+  faciolingualDiameters: Dict[str, float]  # mm
+  indices: Dict[str, float]  # mesiodistal/faciolingual (%)
+
+
+@dataclass
+class AnalysisResults:
+  analysisType: str
+  name: str = ""  # name of the case (markups node or file name)
+  timestamp: str = ""
+  superior: Optional[SpaceAnalysisResults] = None
+  inferior: Optional[SpaceAnalysisResults] = None
+  bolton: Optional[BoltonAnalysisResults] = None
+  peckAndPeck: Optional[PeckAndPeckAnalysisResults] = None
+  uncertainty: Optional[Dict[str, Any]] = None  # confidence intervals, see UncertaintyAnalysis.computeUncertainty
+
+  def toDict(self):
+    """
+    Return results as nested dict, omitting analyses that were not computed.
+    """
+    return {item.name: _toPlainValue(getattr(self, item.name)) for item in fields(self) if getattr(self, item.name) is not None}
+
+  def flatten(self):
+    """
+    Return results as a flat dict that maps column name (such as "bolton.total.ratio"
+    or "superior.diameters.16") to a value.
+    """
+    columns = {}
+    def addColumns(prefix, value):
+      if is_dataclass(value):
+        for item in fields(value):
+          addColumns("{0}.{1}".format(prefix, item.name), getattr(value, item.name))
+      elif isinstance(value, dict):
+        for key, item in value.items():
+          addColumns("{0}.{1}".format(prefix, key) if prefix else key, item)
+      else:
+        columns[prefix] = value
+    for item in fields(self):
+      value = getattr(self, item.name)
+      if value is not None:
+        addColumns(item.name, value)
+    return columns
+
+  @staticmethod
+  def fromDict(data):
+    """
+    Create results from a dict returned by toDict (e.g., loaded from a JSON file).
+    """
+    data = dict(data)
+    for arch in ["superior", "inferior"]:
+      if data.get(arch) is not None:
+        data[arch] = SpaceAnalysisResults(**data[arch])
+    if data.get("bolton") is not None:
+      bolton = dict(data["bolton"])
+      bolton["total"] = BoltonRatioResults(**bolton["total"])
+      bolton["anterior"] = BoltonRatioResults(**bolton["anterior"])
+      data["bolton"] = BoltonAnalysisResults(**bolton)
+    if data.get("peckAndPeck") is not None:
+      data["peckAndPeck"] = PeckAndPeckAnalysisResults(**data["peckAndPeck"])
+    return AnalysisResults(**data)
+
+  @staticmethod
+  def fromEngineResults(analysisType, engineResults, patientIndex=0, name="", timestamp=""):
+    """
+    Create results of a single case from the results of AnalysisEngine.compute.
+    """
+    def values(valuesByTooth):
+      return {tooth: float(value[patientIndex]) for tooth, value in valuesByTooth.items()}
+
+    results = AnalysisResults(analysisType=analysisType, name=name, timestamp=timestamp)
+
+    for arch, suffix in [("Superior", "sup"), ("Inferior", "inf")]:
+      if arch not in engineResults:
+        continue
+      spaceResults = engineResults[arch]
+      setattr(results, arch.lower(), SpaceAnalysisResults(
+        arch=arch,
+        diameters=values(spaceResults["diameters"]),
+        requiredSpace=float(spaceResults["esp_r_"+suffix][patientIndex]),
+        ratedSpace=float(spaceResults["esp_a_"+suffix][patientIndex]),
+        discrepancy=float(spaceResults["disc_"+suffix][patientIndex])))
+
+    if "Bolton" in engineResults:
+      boltonResults = engineResults["Bolton"]
+      def ratioResults(count):
+        return BoltonRatioResults(
+          ratio=float(boltonResults["r_bolt_"+count][patientIndex]),
+          superiorSum=float(boltonResults["dist_{0}_sup".format(count)][patientIndex]),
+          inferiorSum=float(boltonResults["dist_{0}_inf".format(count)][patientIndex]),
+          excessArch=str(boltonResults["excess_{0}_arch".format(count)][patientIndex]),
+          excess=float(boltonResults["excess_"+count][patientIndex]),
+          idealSuperiorLength=float(boltonResults["ideal_{0}_sup".format(count)][patientIndex]),
+          idealInferiorLength=float(boltonResults["ideal_{0}_inf".format(count)][patientIndex]))
+      results.bolton = BoltonAnalysisResults(
+        diameters=values(boltonResults["diameters"]),
+        total=ratioResults("12"),
+        anterior=ratioResults("6"))
+
+    if "PeckAndPeck" in engineResults:
+      peckAndPeckResults = engineResults["PeckAndPeck"]
+      results.peckAndPeck = PeckAndPeckAnalysisResults(
+        mesiodistalDiameters=values(peckAndPeckResults["diameters_md"]),
+        faciolingualDiameters=values(peckAndPeckResults["diameters_fl"]),
+        indices=values(peckAndPeckResults["indice"]))
+
+    return results
+
+  @staticmethod
+  def listFromEngineResults(analysisType, engineResults, names, timestamp=""):
+    """
+    Create results of each case from the results of AnalysisEngine.compute.
+    """
+    return [AnalysisResults.fromEngineResults(analysisType, engineResults, patientIndex, name, timestamp)
+      for patientIndex, name in enumerate(names)]
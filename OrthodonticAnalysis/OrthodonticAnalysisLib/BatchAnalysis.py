@@ -0,0 +1,265 @@
+"""
+Headless batch analysis of a folder of markups files.
+
+Usage:
+
+  PythonSlicer /path/to/OrthodonticAnalysisLib/BatchAnalysis.py
+    --input-folder /path/to/markups --analysis-type Bolton --output /path/to/results.csv
+
+Only NumPy is required (Slicer is not started), therefore the script can be run by any Python interpreter
+that has NumPy installed. Markups files (.mrk.json, .fcsv) are read directly, without creating MRML nodes
+(see MarkupsReader), and they are distributed among a pool of worker processes while the folder (and its subfolders,
+if --recursive is specified) is being listed. Worker processes only import this module and NumPy.
+Results of all files are written into a single CSV or JSON file (based on the output file extension).
+
+Population statistics (mean, standard deviation, range, and percentiles of each result) can be written
+into a summary report (--statistics, CSV, JSON, or HTML format). Statistics are computed in a streaming pass,
+therefore if no --output is specified then memory usage does not depend on the number of files.
+Results can also be appended to a columnar result store (--store, see ResultStore).
+
+Landmarks of large cohorts can be stored in a memory-mapped landmark archive (see LandmarkArchive), which is
+processed in slices (--input-archive /path/to/cohort.npy instead of --input-folder).
+
+Visits of patients can be compared (--longitudinal /path/to/study, see LongitudinalAnalysis): the input folder contains
+a subfolder for each patient, with markups files of the visits in chronological order of the file names.
+New visits are added to the longitudinal study and a report of each patient that has new visits is written
+into the study folder (patient name with .html extension).
+"""
+
+import itertools
+import json
+import logging
+import os
+
+
+def computeFiles(analysisType, pointNames, filenames, keepResults=True, computeStatistics=False):
+  """
+  Compute analysis results for a list of markups files.
+  This function is executed in worker processes. Points of all files that could be read and validated
+  (see MarkupsReader.validateControlPoints) are stacked and computed in a single vectorized pass.
+  Returns list of AnalysisResults (empty if keepResults is False), list of (filename, error message) pairs,
+  and CohortStatistics of the results (None if computeStatistics is False).
+  """
+  from OrthodonticAnalysisLib.AnalysisEngine import getAnalysisEngine
+  from OrthodonticAnalysisLib.AnalysisResults import AnalysisResults
+  from OrthodonticAnalysisLib.MarkupsReader import readMarkupsFiles
+
+  validFilenames, points, errors = next(readMarkupsFiles(filenames, pointNames, batchSize=len(filenames)), ([], [], []))
+
+  results = []
+  statistics = None
+  if computeStatistics:
+    from OrthodonticAnalysisLib.CohortStatistics import CohortStatistics
+    statistics = CohortStatistics()
+  if len(points):
+    engineResults = getAnalysisEngine(pointNames).compute(analysisType, points)
+    if keepResults:
+      results = AnalysisResults.listFromEngineResults(analysisType, engineResults, validFilenames)
+    if statistics is not None:
+      statistics.updateEngineResults(engineResults)
+  return results, errors, statistics
+
+
+def writeResults(results, errors, outputFilename):
+  """
+  Write results into a CSV or JSON file (depending on the file extension).
+  """
+  from OrthodonticAnalysisLib.ReportRenderers import getRenderer
+  if outputFilename.lower().endswith(".json"):
+    data = {
+      "results": getRenderer("json").renderData(results),
+      "errors": [{"name": filename, "error": error} for filename, error in errors],
+      }
+    with open(outputFilename, "w") as file_object:
+      json.dump(data, file_object, indent=2)
+  else:
+    with open(outputFilename, "w", newline="", encoding="utf-8") as file_object:
+      file_object.write(getRenderer("csv").render(results))
+
+
+def getWorkerContext():
+  """
+  Return multiprocessing context for starting worker processes.
+  Inside Slicer sys.executable is the application launcher, therefore the
+  PythonSlicer interpreter is used for the worker processes.
+  """
+  import multiprocessing
+  import shutil
+  import sys
+  context = multiprocessing.get_context("spawn")
+  if os.path.basename(sys.executable).lower().startswith("slicer"):
+    pythonSlicerExecutablePath = shutil.which("PythonSlicer")
+    if pythonSlicerExecutablePath:
+      context.set_executable(pythonSlicerExecutablePath)
+  return context
+
+
+def computeFolder(analysisType, pointNames, inputFolder, outputFilename, numberOfWorkers=None, chunkSize=200,
+  statisticsFilename=None, storeFolder=None, recursive=False):
+  """
+  Compute analysis results for all markups files in a folder (and its subfolders, if recursive) using a pool
+  of worker processes and write all results into a single CSV or JSON file (if outputFilename is specified),
+  population statistics into a summary report (if statisticsFilename is specified),
+  and append results to a columnar result store (if storeFolder is specified).
+  Files are listed and distributed to workers in chunks of chunkSize files while the folder is being traversed.
+  Returns number of successfully processed files and list of (filename, error message) pairs.
+  """
+  from collections import deque
+  from concurrent.futures import ProcessPoolExecutor
+  from OrthodonticAnalysisLib.MarkupsReader import iterMarkupsFiles
+
+  filenames = iterMarkupsFiles(inputFolder, recursive)
+  chunks = iter(lambda: list(itertools.islice(filenames, chunkSize)), [])
+  if not numberOfWorkers:
+    numberOfWorkers = os.cpu_count() or 1
+  # Worker processes are not started if all files fit in one chunk
+  firstChunks = list(itertools.islice(chunks, 2))
+  if len(firstChunks) < 2:
+    numberOfWorkers = 1
+  chunks = itertools.chain(firstChunks, chunks)
+
+  keepResults = bool(outputFilename or storeFolder)
+  computeStatistics = bool(statisticsFilename)
+  results = []
+  errors = []
+  numberOfFiles = 0
+  statistics = None
+  if computeStatistics:
+    from OrthodonticAnalysisLib.CohortStatistics import CohortStatistics
+    statistics = CohortStatistics()
+  store = None
+  if storeFolder:
+    from OrthodonticAnalysisLib.ResultStore import ResultStore
+    store = ResultStore(storeFolder)
+
+  def addChunkResults(chunkResults, chunkErrors, chunkStatistics):
+    if store is not None:
+      store.appendResults(chunkResults)
+    if outputFilename:
+      results.extend(chunkResults)
+    errors.extend(chunkErrors)
+    if chunkStatistics is not None:
+      statistics.merge(chunkStatistics)
+
+  if numberOfWorkers > 1:
+    with ProcessPoolExecutor(max_workers=numberOfWorkers, mp_context=getWorkerContext()) as executor:
+      pendingFutures = deque()
+      for chunk in chunks:
+        numberOfFiles += len(chunk)
+        pendingFutures.append(executor.submit(computeFiles, analysisType, pointNames, chunk, keepResults, computeStatistics))
+        # Collect results in submission order to make the output deterministic. Number of chunks in progress
+        # is limited, so that memory usage does not depend on the number of files.
+        if len(pendingFutures) >= numberOfWorkers * 2:
+          addChunkResults(*pendingFutures.popleft().result())
+      while pendingFutures:
+        addChunkResults(*pendingFutures.popleft().result())
+  else:
+    for chunk in chunks:
+      numberOfFiles += len(chunk)
+      addChunkResults(*computeFiles(analysisType, pointNames, chunk, keepResults, computeStatistics))
+
+  for filename, error in errors:
+    logging.error("Failed to compute results for {0}: {1}".format(filename, error))
+
+  if outputFilename:
+    writeResults(results, errors, outputFilename)
+  if statisticsFilename:
+    statistics.write(statisticsFilename)
+  return numberOfFiles - len(errors), errors
+
+
+def computeArchive(analysisType, archiveFilename, outputFilename=None, statisticsFilename=None, storeFolder=None, batchSize=100000):
+  """
+  Compute analysis results for all cases of a landmark archive, in slices of batchSize cases, and write
+  the results into a CSV or JSON file, population statistics into a summary report, and/or append the results
+  to a result store (same outputs as computeFolder).
+  Returns number of processed cases.
+  """
+  from OrthodonticAnalysisLib.AnalysisResults import AnalysisResults
+  from OrthodonticAnalysisLib.LandmarkArchive import LandmarkArchive
+
+  archive = LandmarkArchive(archiveFilename)
+  results = []
+  statistics = None
+  if statisticsFilename:
+    from OrthodonticAnalysisLib.CohortStatistics import CohortStatistics
+    statistics = CohortStatistics()
+  store = None
+  if storeFolder:
+    from OrthodonticAnalysisLib.ResultStore import ResultStore
+    store = ResultStore(storeFolder)
+
+  for caseNames, engineResults in archive.computeBatches(analysisType, batchSize):
+    if outputFilename:
+      results.extend(AnalysisResults.listFromEngineResults(analysisType, engineResults, caseNames))
+    if statistics is not None:
+      statistics.updateEngineResults(engineResults)
+    if store is not None:
+      store.appendEngineResults(analysisType, engineResults, caseNames)
+
+  if outputFilename:
+    writeResults(results, [], outputFilename)
+  if statisticsFilename:
+    statistics.write(statisticsFilename)
+  return archive.numberOfCases
+
+
+def computeLongitudinal(analysisType, pointNames, inputFolder, studyFolder):
+  """
+  Add new visits of the patient subfolders of inputFolder to the longitudinal study in studyFolder
+  and write an HTML report of each patient that has new visits into the study folder.
+  Returns number of patients that have new visits and list of (filename, error message) pairs.
+  """
+  from OrthodonticAnalysisLib.LongitudinalAnalysis import LongitudinalStudy
+  study = LongitudinalStudy(studyFolder)
+  patientNames, errors = study.addFolder(analysisType, inputFolder, pointNames)
+  for patientName in patientNames:
+    study.write(patientName, analysisType, os.path.join(studyFolder, patientName + ".html"))
+  for filename, message in errors:
+    logging.warning("Failed to read {0}: {1}".format(filename, message))
+  return len(patientNames), errors
+
+
+def main(argv):
+  import argparse
+  from OrthodonticAnalysisLib.AnalysisPoints import analysisTypes, getPointNames
+  parser = argparse.ArgumentParser(description="Compute orthodontic analysis for a folder of markups files.")
+  inputGroup = parser.add_mutually_exclusive_group(required=True)
+  inputGroup.add_argument("--input-folder", help="Folder containing markups files (.mrk.json, .fcsv).")
+  inputGroup.add_argument("--input-archive", help="Landmark archive (.npy file created by LandmarkArchive).")
+  parser.add_argument("--recursive", action="store_true", help="Process markups files in subfolders of the input folder, too.")
+  parser.add_argument("--analysis-type", required=True, choices=analysisTypes)
+  parser.add_argument("--output", help="Output file. Results are written in JSON format if the extension is .json, otherwise in CSV format.")
+  parser.add_argument("--store", help="Result store folder. Results are appended to the columnar result store in this folder.")
+  parser.add_argument("--statistics", help="Population statistics report file. Written in JSON or HTML format if the extension is .json or .html, otherwise in CSV format.")
+  parser.add_argument("--longitudinal", help="Longitudinal study folder. Subfolders of the input folder are patients, their markups files are visits.")
+  parser.add_argument("--workers", type=int, default=None, help="Number of worker processes. Default is the number of CPU cores.")
+  args = parser.parse_args(argv)
+  if args.longitudinal:
+    if not args.input_folder:
+      parser.error("--longitudinal requires --input-folder")
+    numberOfPatients, errors = computeLongitudinal(args.analysis_type, getPointNames(args.analysis_type), args.input_folder, args.longitudinal)
+    logging.info("Added visits of {0} patients ({1} failed): {2}".format(numberOfPatients, len(errors), args.longitudinal))
+    return 1 if errors else 0
+  if not args.output and not args.statistics and not args.store:
+    parser.error("at least one of --output, --statistics, --store, and --longitudinal is required")
+
+  if args.input_archive:
+    numberOfResults = computeArchive(args.analysis_type, args.input_archive, args.output, args.statistics, args.store)
+    errors = []
+  else:
+    numberOfResults, errors = computeFolder(args.analysis_type, getPointNames(args.analysis_type), args.input_folder,
+      args.output, args.workers, statisticsFilename=args.statistics, storeFolder=args.store, recursive=args.recursive)
+  logging.info("Computed results for {0} cases ({1} failed): {2}".format(numberOfResults, len(errors),
+    ", ".join(filename for filename in [args.output, args.statistics, args.store] if filename)))
+  return 1 if errors else 0
+
+
+if __name__ == "__main__":
+  import sys
+  # Make sure the module folder is in the path when the script is started directly
+  moduleFolder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  if moduleFolder not in sys.path:
+    sys.path.insert(0, moduleFolder)
+  logging.basicConfig(level=logging.INFO, format="%(message)s")
+  sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+#
+# Helpers for measuring computation times and comparing them to stored baselines
+#
+
+
+def measureTime(function, *args, repeat=3, number=1):
+  """
+  Return the shortest average wall time (in seconds) of calling function(*args) number times,
+  out of repeat measurements.
+  """
+  bestTime = None
+  for repeatIndex in range(repeat):
+    startTime = time.perf_counter()
+    for callIndex in range(number):
+      function(*args)
+    elapsedTime = (time.perf_counter() - startTime) / number
+    if bestTime is None or elapsedTime < bestTime:
+      bestTime = elapsedTime
+  return bestTime
+
+
+def loadBaselines(filename):
+  """
+  Return baselines (dict that maps benchmark name to baseline). Returns empty dict if the file does not exist.
+  A baseline is either a measured time (seconds) or a ceiling ({"ceiling": seconds}), see findRegressions.
+  """
+  if not os.path.exists(filename):
+    return {}
+  with open(filename) as file_object:
+    return json.load(file_object)
+
+
+def saveBaselines(filename, baselines):
+  with open(filename, "w") as file_object:
+    json.dump(baselines, file_object, indent=2, sort_keys=True)
+    file_object.write("\n")
+
+
+def isCeiling(baseline):
+  return isinstance(baseline, dict)
+
+
+def getBaselineTime(baseline):
+  """
+  Return time (seconds) of a measured baseline or a ceiling.
+  """
+  return baseline["ceiling"] if isCeiling(baseline) else baseline
+
+
+def findRegressions(timings, baselines, tolerance=2.0, minimumDifference=0.001):
+  """
+  Return list of (name, time, baseline time) of benchmarks that are slower than tolerance times
+  their measured baseline, or slower than their ceiling (tolerance is not applied to ceilings).
+  Differences below minimumDifference (seconds) are ignored, as they are within the measurement noise.
+  Benchmarks without baseline are not reported (see findMissingBaselines).
+  """
+  regressions = []
+  for name, measuredTime in timings.items():
+    baseline = baselines.get(name)
+    if baseline is None:
+      continue
+    baselineTime = getBaselineTime(baseline)
+    limit = baselineTime if isCeiling(baseline) else baselineTime * tolerance
+    if measuredTime > limit and measuredTime - baselineTime > minimumDifference:
+      regressions.append((name, measuredTime, baselineTime))
+  return regressions
+
+
+def findCeilings(baselines):
+  """
+  Return sorted list of names of benchmarks whose baseline is a ceiling, not a measured time.
+  """
+  return sorted(name for name, baseline in baselines.items() if isCeiling(baseline))
+
+
+def findMissingBaselines(timings, baselines):
+  """
+  Return sorted list of names of benchmarks that have no baseline.
+  """
+  return sorted(name for name in timings if name not in baselines)
+
+
+def formatTimings(timings, baselines=None):
+  """
+  Return a text table of measured times (and baseline times or ceilings, if available).
+  """
+  lines = []
+  for name in sorted(timings):
+    line = "{0:<50} {1:12.6f}s".format(name, timings[name])
+    if baselines and name in baselines:
+      baselineTime = getBaselineTime(baselines[name])
+      line += " ({0}: {1:.6f}s, {2:.2f}x)".format("ceiling" if isCeiling(baselines[name]) else "baseline",
+        baselineTime, timings[name] / baselineTime if baselineTime else 0.0)
+    lines.append(line)
+  return "\n".join(lines)
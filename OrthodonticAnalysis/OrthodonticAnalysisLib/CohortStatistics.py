@@ -0,0 +1,344 @@
+import csv
+import html
+import io
+import json
+
+import numpy as np
+
+#
+# Population statistics of analysis results, computed in a single streaming pass
+#
+# Results are ingested in batches of any size (e.g., results of a vectorized batch computation or rows of a CSV file)
+# and only running moments and fixed-size quantile sketches are kept, therefore memory usage does not depend on
+# the number of cases. Statistics computed from separate parts of a cohort (e.g., in worker processes) can be merged.
+#
+
+defaultQuantiles = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+class RunningMoments:
+  """Count, mean, variance, minimum, and maximum of a stream of values.
+
+  Batches are merged with the pairwise update formula of Chan et al., which is the batch
+  generalization of Welford's algorithm and is numerically stable.
+  """
+
+  def __init__(self):
+    self.count = 0
+    self.mean = 0.0
+    self.m2 = 0.0  # sum of squared differences from the mean
+    self.minimum = np.inf
+    self.maximum = -np.inf
+
+  def update(self, values):
+    """
+    Add values (array of any shape). NaN values are ignored.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+      return
+    batch = RunningMoments()
+    batch.count = len(values)
+    batch.mean = values.mean()
+    batch.m2 = ((values - batch.mean) ** 2).sum()
+    batch.minimum = values.min()
+    batch.maximum = values.max()
+    self.merge(batch)
+
+  def merge(self, other):
+    if other.count == 0:
+      return
+    count = self.count + other.count
+    delta = other.mean - self.mean
+    self.mean += delta * other.count / count
+    self.m2 += other.m2 + delta * delta * self.count * other.count / count
+    self.count = count
+    self.minimum = min(self.minimum, other.minimum)
+    self.maximum = max(self.maximum, other.maximum)
+
+  @property
+  def variance(self):
+    """
+    Sample variance (NaN if there are less than two values).
+    """
+    return self.m2 / (self.count - 1) if self.count > 1 else float("nan")
+
+  @property
+  def standardDeviation(self):
+    return np.sqrt(self.variance)
+
+
+class QuantileSketch:
+  """Approximate quantiles of a stream of values, using a KLL sketch (Karnin, Lang, Liberty, 2016).
+
+  Values are stored in a hierarchy of compactors. A full compactor is sorted and every second value
+  (starting at a random offset) is promoted to the next level, where each value represents twice as many values.
+  Memory is proportional to sketchSize (plus a few values per level), rank error is about 1.7/sketchSize.
+  """
+
+  def __init__(self, sketchSize=200, seed=0):
+    self.sketchSize = sketchSize
+    self.count = 0
+    self.compactors = [np.empty(0)]
+    self._rng = np.random.default_rng(seed)
+
+  def capacity(self, level):
+    # Lower levels have geometrically decreasing capacity
+    depth = len(self.compactors) - 1 - level
+    return max(2, int(np.ceil(self.sketchSize * (2.0 / 3.0) ** depth)))
+
+  def update(self, values):
+    """
+    Add values (array of any shape). NaN values are ignored.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+      return
+    self.count += len(values)
+    # A large batch is sorted once and every 2^level-th value is added directly to the level where it fits,
+    # which has the same error bound as compacting the batch level by level (but it is much faster)
+    level = max(0, int(np.ceil(np.log2(len(values) / self.sketchSize)))) if len(values) > self.sketchSize else 0
+    if level > 0:
+      values = np.sort(values)[self._rng.integers(2 ** level)::2 ** level]
+    while len(self.compactors) <= level:
+      self.compactors.append(np.empty(0))
+    self.compactors[level] = np.concatenate([self.compactors[level], values])
+    self._compress()
+
+  def merge(self, other):
+    for level, items in enumerate(other.compactors):
+      if level == len(self.compactors):
+        self.compactors.append(np.empty(0))
+      self.compactors[level] = np.concatenate([self.compactors[level], items])
+    self.count += other.count
+    self._compress()
+
+  def _compress(self):
+    level = 0
+    while level < len(self.compactors):
+      items = self.compactors[level]
+      if len(items) >= self.capacity(level):
+        if level + 1 == len(self.compactors):
+          self.compactors.append(np.empty(0))
+        items = np.sort(items)
+        # With odd number of items, one item stays on this level
+        numberOfKeptItems = len(items) % 2
+        promotedItems = items[numberOfKeptItems:][self._rng.integers(2)::2]
+        self.compactors[level] = items[:numberOfKeptItems]
+        self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promotedItems])
+      level += 1
+
+  @property
+  def size(self):
+    """
+    Number of stored values.
+    """
+    return sum(len(items) for items in self.compactors)
+
+  def quantiles(self, probabilities):
+    """
+    Return approximate quantiles (array) for a list of probabilities (between 0 and 1).
+    """
+    if self.count == 0:
+      return np.full(len(probabilities), np.nan)
+    items = np.concatenate(self.compactors)
+    weights = np.concatenate([np.full(len(levelItems), 2.0 ** level) for level, levelItems in enumerate(self.compactors)])
+    order = np.argsort(items)
+    cumulativeWeights = np.cumsum(weights[order])
+    ranks = np.asarray(probabilities, dtype=float) * cumulativeWeights[-1]
+    indices = np.minimum(np.searchsorted(cumulativeWeights, ranks, side="left"), len(items) - 1)
+    return items[order][indices]
+
+
+def flattenEngineResults(engineResults):
+  """
+  Return numeric results of AnalysisEngine.compute as a dict that maps column name to an array of values
+  (one per case). Column names are the same as in AnalysisResults.flatten (for example "bolton.total.ratio").
+  """
+  columns = {}
+  def addColumns(prefix, valuesByTooth):
+    for tooth, values in valuesByTooth.items():
+      columns["{0}.{1}".format(prefix, tooth)] = values
+
+  for arch, suffix in [("Superior", "sup"), ("Inferior", "inf")]:
+    if arch not in engineResults:
+      continue
+    spaceResults = engineResults[arch]
+    prefix = arch.lower()
+    addColumns(prefix + ".diameters", spaceResults["diameters"])
+    columns[prefix + ".requiredSpace"] = spaceResults["esp_r_"+suffix]
+    columns[prefix + ".ratedSpace"] = spaceResults["esp_a_"+suffix]
+    columns[prefix + ".discrepancy"] = spaceResults["disc_"+suffix]
+
+  if "Bolton" in engineResults:
+    boltonResults = engineResults["Bolton"]
+    addColumns("bolton.diameters", boltonResults["diameters"])
+    for name, count in [("total", "12"), ("anterior", "6")]:
+      prefix = "bolton." + name
+      columns[prefix + ".ratio"] = boltonResults["r_bolt_"+count]
+      columns[prefix + ".superiorSum"] = boltonResults["dist_{0}_sup".format(count)]
+      columns[prefix + ".inferiorSum"] = boltonResults["dist_{0}_inf".format(count)]
+      columns[prefix + ".excess"] = boltonResults["excess_"+count]
+      columns[prefix + ".idealSuperiorLength"] = boltonResults["ideal_{0}_sup".format(count)]
+      columns[prefix + ".idealInferiorLength"] = boltonResults["ideal_{0}_inf".format(count)]
+
+  if "PeckAndPeck" in engineResults:
+    peckAndPeckResults = engineResults["PeckAndPeck"]
+    addColumns("peckAndPeck.mesiodistalDiameters", peckAndPeckResults["diameters_md"])
+    addColumns("peckAndPeck.faciolingualDiameters", peckAndPeckResults["diameters_fl"])
+    addColumns("peckAndPeck.indices", peckAndPeckResults["indice"])
+
+  return columns
+
+
+class CohortStatistics:
+  """Streaming statistics (count, mean, standard deviation, range, quantiles) of each numeric result column.
+
+  Example:
+
+    statistics = CohortStatistics()
+    for points in batches:
+      statistics.updateEngineResults(computeAnalysis("All", points))
+    print(statistics.render("csv"))
+  """
+
+  def __init__(self, quantiles=defaultQuantiles, sketchSize=200):
+    self.quantileProbabilities = tuple(quantiles)
+    self.sketchSize = sketchSize
+    self.moments = {}  # column name -> RunningMoments
+    self.sketches = {}  # column name -> QuantileSketch
+
+  def update(self, columns):
+    """
+    Add values of a batch of cases. columns is a dict that maps column name to values.
+    Non-numeric columns are ignored.
+    """
+    for name, values in columns.items():
+      try:
+        values = np.asarray(values, dtype=float)
+      except (TypeError, ValueError):
+        continue
+      if name not in self.moments:
+        self.moments[name] = RunningMoments()
+        self.sketches[name] = QuantileSketch(self.sketchSize, seed=len(self.sketches))
+      self.moments[name].update(values)
+      self.sketches[name].update(values)
+
+  def updateEngineResults(self, engineResults):
+    """
+    Add results of a batch of cases, as returned by AnalysisEngine.compute.
+    """
+    self.update(flattenEngineResults(engineResults))
+
+  def updateResults(self, results):
+    """
+    Add AnalysisResults of a case or list of cases.
+    """
+    if not isinstance(results, list):
+      results = [results]
+    columns = {}
+    for caseResults in results:
+      for name, value in caseResults.flatten().items():
+        if isinstance(value, float):
+          columns.setdefault(name, []).append(value)
+    self.update(columns)
+
+  def updateFromCsvFile(self, filename, blockSize=10000):
+    """
+    Add results stored in a CSV file (as written by CsvRenderer), reading blockSize rows at a time.
+    Columns that contain text (such as case names) are ignored.
+    """
+    with open(filename, newline="") as file_object:
+      columns = {}
+      textColumns = set()
+      numberOfRows = 0
+      for row in csv.DictReader(file_object):
+        for name, value in row.items():
+          if name in textColumns:
+            continue
+          try:
+            columns.setdefault(name, []).append(float(value) if value != "" else float("nan"))
+          except ValueError:
+            textColumns.add(name)
+            columns.pop(name, None)
+        numberOfRows += 1
+        if numberOfRows == blockSize:
+          self.update(columns)
+          columns = {}
+          numberOfRows = 0
+      self.update(columns)
+
+  def merge(self, other):
+    for name in other.moments:
+      if name not in self.moments:
+        self.moments[name] = RunningMoments()
+        self.sketches[name] = QuantileSketch(self.sketchSize, seed=len(self.sketches))
+      self.moments[name].merge(other.moments[name])
+      self.sketches[name].merge(other.sketches[name])
+
+  @property
+  def count(self):
+    """
+    Number of cases (the largest number of values of any column).
+    """
+    return max((moments.count for moments in self.moments.values()), default=0)
+
+  def getSummary(self):
+    """
+    Return dict that maps column name to a dict of statistics
+    (count, mean, standardDeviation, minimum, maximum, and quantiles such as "p50").
+    Columns without any values are omitted.
+    """
+    summary = {}
+    for name, moments in self.moments.items():
+      if moments.count == 0:
+        continue
+      columnSummary = {
+        "count": moments.count,
+        "mean": float(moments.mean),
+        "standardDeviation": float(moments.standardDeviation),
+        "minimum": float(moments.minimum),
+        "maximum": float(moments.maximum),
+        }
+      for probability, value in zip(self.quantileProbabilities, self.sketches[name].quantiles(self.quantileProbabilities)):
+        columnSummary["p{0:g}".format(probability * 100)] = float(value)
+      summary[name] = columnSummary
+    return summary
+
+  def render(self, reportFormat):
+    """
+    Return summary report as text in "csv", "json", or "html" format.
+    """
+    summary = self.getSummary()
+    statisticNames = list(next(iter(summary.values())).keys()) if summary else ["count"]
+    reportFormat = reportFormat.lower()
+    if reportFormat == "json":
+      return json.dumps(summary, indent=2)
+    elif reportFormat == "csv":
+      output = io.StringIO()
+      writer = csv.writer(output, lineterminator="\n")
+      writer.writerow(["column"] + statisticNames)
+      for name, columnSummary in summary.items():
+        writer.writerow([name] + [columnSummary[statisticName] for statisticName in statisticNames])
+      return output.getvalue()
+    elif reportFormat == "html":
+      rows = ["<tr>{0}</tr>".format("".join("<th>{0}</th>".format(html.escape(name)) for name in ["Result"] + statisticNames))]
+      for name, columnSummary in summary.items():
+        cells = ["<td>{0}</td>".format(html.escape(name))]
+        for statisticName in statisticNames:
+          value = columnSummary[statisticName]
+          cells.append("<td>{0}</td>".format(value if statisticName == "count" else "{0:.2f}".format(value)))
+        rows.append("<tr>{0}</tr>".format("".join(cells)))
+      return "<html>\n<h2>COHORT STATISTICS ({0} cases)</h2>\n<table>\n{1}\n</table>\n</html>".format(self.count, "\n".join(rows))
+    raise ValueError("Invalid report format: {0}".format(reportFormat))
+
+  def write(self, filename):
+    """
+    Write summary report into a file. Format is determined from the file extension (.json, .html, otherwise CSV).
+    """
+    extension = filename.lower().rsplit(".", 1)[-1]
+    reportFormat = extension if extension in ["json", "html"] else "csv"
+    with open(filename, "w", newline="") as file_object:
+      file_object.write(self.render(reportFormat))
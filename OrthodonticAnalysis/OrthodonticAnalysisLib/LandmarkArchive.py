@@ -0,0 +1,174 @@
+import json
+import os
+
+import numpy as np
+
+#
+# Memory-mapped archive of landmarks of a cohort
+#
+# Landmarks of N cases are stored in a single .npy file as an NxKx3 array (RAS coordinates, mm), next to a JSON file
+# that contains the label schema (the [short name, long name] pairs of the K points, in the order of
+# AnalysisPoints point lists), and a text file of case names (one JSON-encoded name per line).
+# The array is opened by memory mapping, so that slices of a very large archive can be analyzed without loading the whole archive (and without creating MRML nodes).
+#
+# Cases can be appended to an archive (the .npy header is updated in place, see ResultStore.writeNpyHeader).
+# The number of valid cases (and size of the case names file) is stored in the schema file, which is written last.
+#
+
+
+def getSchemaFilename(filename):
+  return os.path.splitext(filename)[0] + ".json"
+
+
+def getCaseNamesFilename(filename):
+  return os.path.splitext(filename)[0] + ".names.txt"
+
+
+class LandmarkArchive:
+  """Landmarks of a cohort stored in an NxKx3 .npy file and a label schema.
+
+  Example:
+
+    archive = LandmarkArchive.create("/path/to/cohort.npy", getPointNames("All"))
+    archive.append(points, caseNames)
+    archive = LandmarkArchive("/path/to/cohort.npy")
+    for caseNames, engineResults in archive.computeBatches("Bolton"):
+      ...
+  """
+
+  version = 1
+
+  def __init__(self, filename):
+    """
+    Open an existing archive.
+    """
+    self.filename = filename
+    with open(getSchemaFilename(filename)) as file_object:
+      schema = json.load(file_object)
+    if schema.get("version", 0) > self.version:
+      raise ValueError("Landmark archive {0} was written by a newer version (version {1})".format(filename, schema["version"]))
+    self.pointNames = [list(pointName) for pointName in schema["pointNames"]]
+    self.numberOfCases = schema["numberOfCases"]
+    self._caseNamesSize = schema["caseNamesSize"]
+    self.dtype = np.dtype(schema["dtype"])
+    self._caseNames = None
+
+  @staticmethod
+  def create(filename, pointNames, dtype=np.float32):
+    """
+    Create an empty archive for a point list ([short name, long name] pairs).
+    Points are stored as 32-bit floats by default, which is accurate to about 10 nanometers in a 100mm range.
+    """
+    from OrthodonticAnalysisLib.ResultStore import writeNpyHeader
+    with open(filename, "wb") as file_object:
+      writeNpyHeader(file_object, dtype, (0, len(pointNames), 3))
+    open(getCaseNamesFilename(filename), "w").close()
+    LandmarkArchive._writeSchema(filename, pointNames, np.dtype(dtype), 0, 0)
+    return LandmarkArchive(filename)
+
+  @staticmethod
+  def _writeSchema(filename, pointNames, dtype, numberOfCases, caseNamesSize):
+    schemaFilename = getSchemaFilename(filename)
+    with open(schemaFilename + ".tmp", "w") as file_object:
+      json.dump({"version": LandmarkArchive.version, "dtype": dtype.str, "numberOfCases": numberOfCases,
+        "caseNamesSize": caseNamesSize, "pointNames": pointNames}, file_object, indent=2)
+    os.replace(schemaFilename + ".tmp", schemaFilename)
+
+  @property
+  def caseNames(self):
+    """
+    Name of each case (names are read from disk on first use).
+    """
+    if self._caseNames is None:
+      with open(getCaseNamesFilename(self.filename), encoding="utf-8") as file_object:
+        self._caseNames = [json.loads(line) for line, index in zip(file_object, range(self.numberOfCases))]
+    return self._caseNames
+
+  @property
+  def numberOfPoints(self):
+    return len(self.pointNames)
+
+  @property
+  def points(self):
+    """
+    Read-only memory-mapped NxKx3 array of all cases.
+    """
+    if self.numberOfCases == 0:
+      return np.empty((0, self.numberOfPoints, 3), self.dtype)
+    return np.load(self.filename, mmap_mode="r")[:self.numberOfCases]
+
+  def append(self, points, caseNames):
+    """
+    Append cases. points is an MxKx3 array (points in the order of the archive point list).
+    """
+    from OrthodonticAnalysisLib.ResultStore import writeNpyHeader, headerLength
+    points = np.asarray(points, dtype=self.dtype)
+    if points.ndim != 3 or points.shape[1:] != (self.numberOfPoints, 3):
+      raise ValueError("Points must be an Mx{0}x3 array, got {1}".format(self.numberOfPoints, points.shape))
+    if len(caseNames) != len(points):
+      raise ValueError("Number of case names ({0}) does not match number of cases ({1})".format(len(caseNames), len(points)))
+    with open(self.filename, "r+b") as file_object:
+      # Remove cases of an interrupted append
+      file_object.truncate(headerLength + self.numberOfCases * self.numberOfPoints * 3 * self.dtype.itemsize)
+      file_object.seek(0, os.SEEK_END)
+      file_object.write(np.ascontiguousarray(points).tobytes())
+      writeNpyHeader(file_object, self.dtype, (self.numberOfCases + len(points), self.numberOfPoints, 3))
+    with open(getCaseNamesFilename(self.filename), "r+b") as file_object:
+      file_object.truncate(self._caseNamesSize)
+      file_object.seek(0, os.SEEK_END)
+      file_object.write("".join(json.dumps(name) + "\n" for name in caseNames).encode("utf-8"))
+      self._caseNamesSize = file_object.tell()
+    if self._caseNames is not None:
+      self._caseNames.extend(caseNames)
+    self.numberOfCases += len(points)
+    self._writeSchema(self.filename, self.pointNames, self.dtype, self.numberOfCases, self._caseNamesSize)
+
+  def appendMarkupsFiles(self, filenames, batchSize=10000):
+    """
+    Append cases read from markups files (.mrk.json, .fcsv), each file is a case named after the file.
+    filenames can be any iterable, such as MarkupsReader.iterMarkupsFiles(folder), files are read in batches.
+    Returns list of (filename, error message) pairs of files that could not be read or validated.
+    """
+    from OrthodonticAnalysisLib.MarkupsReader import readMarkupsFiles
+    errors = []
+    for validFilenames, points, batchErrors in readMarkupsFiles(filenames, self.pointNames, batchSize):
+      if validFilenames:
+        self.append(points, validFilenames)
+      errors.extend(batchErrors)
+    return errors
+
+  def getPointIndices(self, pointNames):
+    """
+    Return indices of points of a point list (such as the point list of another analysis type) in the archive.
+    Points are matched by short name.
+    """
+    archiveIndices = {shortName: index for index, [shortName, longName] in enumerate(self.pointNames)}
+    missingPoints = [shortName for shortName, longName in pointNames if shortName not in archiveIndices]
+    if missingPoints:
+      raise ValueError("Points are not found in landmark archive {0}: {1}".format(self.filename, ", ".join(missingPoints)))
+    return [archiveIndices[shortName] for shortName, longName in pointNames]
+
+  def getPoints(self, start=0, stop=None, pointNames=None):
+    """
+    Return points of cases start...stop-1 as an array of 64-bit floats (only this slice is read from disk).
+    If pointNames is specified then only those points are returned, in the order of pointNames.
+    """
+    points = self.points[start:stop]
+    if pointNames is not None and [shortName for shortName, longName in pointNames] != [shortName for shortName, longName in self.pointNames]:
+      points = points[:, self.getPointIndices(pointNames)]
+    return np.array(points, dtype=np.float64)
+
+  def computeBatches(self, analysisType, batchSize=100000, start=0, stop=None):
+    """
+    Compute an analysis for cases start...stop-1 in batches of batchSize cases.
+    Yields case names and results of AnalysisEngine.compute of each batch.
+    The archive must contain all points of the analysis type (it may contain other points, too).
+    """
+    from OrthodonticAnalysisLib.AnalysisEngine import computeAnalysis
+    from OrthodonticAnalysisLib.AnalysisPoints import getPointNames
+    pointNames = getPointNames(analysisType)
+    stop = self.numberOfCases if stop is None else min(stop, self.numberOfCases)
+    for batchStart in range(start, stop, batchSize):
+      batchStop = min(batchStart + batchSize, stop)
+      points = self.getPoints(batchStart, batchStop, pointNames)
+      yield self.caseNames[batchStart:batchStop], computeAnalysis(analysisType, points, pointNames)
@@ -0,0 +1,189 @@
+import numpy as np
+
+from OrthodonticAnalysisLib.AnalysisDefinitions import analysisDefinitions, getAnalysisSections
+
+
+class LiveAnalysis:
+  """Keeps measurements of an analysis up to date while landmarks are being placed.
+
+  Measurements are organized into items: distances (tooth diameters, arch segments) that depend on two points,
+  sums of distances (required and rated spaces, Bolton arch sums) and values derived from them
+  (discrepancies, ratios, indices). When a point changes, only the distances that use that point,
+  the sums that contain those distances (updated by the difference) and the values derived from them
+  are updated, so the cost of an update does not depend on the number of points.
+
+  Sums are available as soon as any of their distances are available (partial sums),
+  derived values are only available when all their inputs are complete.
+  Items are created from the labeled measurements of the analysis definitions (see AnalysisDefinitions).
+  """
+
+  def __init__(self, analysisType, pointNames):
+    self.pointIndices = {shortName: index for index, [shortName, longName] in enumerate(pointNames)}
+    self.positions = np.zeros((len(pointNames), 3))
+    self.defined = np.zeros(len(pointNames), dtype=bool)
+
+    # Display name, unit, and current value of each item
+    self.names = []
+    self.units = []
+    self.values = []
+
+    self._distancePoints = {}  # item index -> (point index, point index)
+    self._pointDistances = [[] for pointName in pointNames]  # point index -> distance item indices
+    self._sumTerms = {}  # sum item index -> list of item indices
+    self._sumCounts = {}  # sum item index -> number of available terms
+    self._itemSums = {}  # item index -> sum item indices
+    self._derivedInputs = {}  # derived item index -> (operation, item index, item index, scale)
+    self._itemDerived = {}  # item index -> derived item indices
+
+    for section in getAnalysisSections(analysisType):
+      self._addMeasurements(analysisDefinitions[section])
+
+  def _addItem(self, name, unit):
+    self.names.append(name)
+    self.units.append(unit)
+    self.values.append(None)
+    return len(self.names) - 1
+
+  def _addDistance(self, name, shortName1, shortName2):
+    """
+    Return index of a distance item. Distances are shared between sections.
+    """
+    if name in self.names:
+      return self.names.index(name)
+    itemIndex = self._addItem(name, "mm")
+    pointIndices = (self.pointIndices[shortName1], self.pointIndices[shortName2])
+    self._distancePoints[itemIndex] = pointIndices
+    for pointIndex in pointIndices:
+      self._pointDistances[pointIndex].append(itemIndex)
+    return itemIndex
+
+  def _addSum(self, name, terms):
+    itemIndex = self._addItem(name, "mm")
+    self._sumTerms[itemIndex] = terms
+    self._sumCounts[itemIndex] = 0
+    for term in terms:
+      self._itemSums.setdefault(term, []).append(itemIndex)
+    return itemIndex
+
+  def _addDerived(self, name, unit, operation, input1, input2, scale=1.0):
+    itemIndex = self._addItem(name, unit)
+    self._derivedInputs[itemIndex] = (operation, input1, input2, scale)
+    for inputIndex in [input1, input2]:
+      self._itemDerived.setdefault(inputIndex, []).append(itemIndex)
+    return itemIndex
+
+  def _addMeasurements(self, measurements):
+    """
+    Add items of the labeled measurements of an analysis. Distances of teeth that are not in the point list are skipped.
+    """
+    items = {}  # measurement name -> item index (or dict that maps tooth to item index)
+    for measurement in measurements:
+      operation = measurement["operation"]
+      name = measurement["name"]
+      label = measurement.get("label")
+      if label is None:
+        continue
+      if operation == "distances":
+        suffixes = measurement["points"]
+        items[name] = {tooth: self._addDistance(label.format(tooth), "{0}-{1}".format(tooth, suffixes[0]), "{0}-{1}".format(tooth, suffixes[1]))
+          for tooth in measurement["teeth"] if all("{0}-{1}".format(tooth, suffix) in self.pointIndices for suffix in suffixes)}
+      elif operation == "chainLength":
+        chain = measurement["chain"]
+        segments = [self._addDistance("Segment {0} - {1}".format(shortName1, shortName2), shortName1, shortName2)
+          for shortName1, shortName2 in zip(chain[:-1], chain[1:])]
+        items[name] = self._addSum(label, segments)
+      elif operation == "sum":
+        distances = items[measurement["of"]]
+        items[name] = self._addSum(label, [distances[tooth] for tooth in measurement["teeth"] if tooth in distances])
+      elif operation in ["difference", "ratio"]:
+        input1, input2 = [items[inputName] for inputName in measurement["of"]]
+        scale = measurement.get("scale", 1.0)
+        if isinstance(input1, dict):
+          items[name] = {tooth: self._addDerived(label.format(tooth), measurement["unit"], operation, input1[tooth], input2[tooth], scale)
+            for tooth in input1 if tooth in input2}
+        else:
+          items[name] = self._addDerived(label, measurement["unit"], operation, input1, input2, scale)
+
+  def isComplete(self, itemIndex):
+    if self.values[itemIndex] is None:
+      return False
+    if itemIndex in self._sumTerms:
+      return self._sumCounts[itemIndex] == len(self._sumTerms[itemIndex])
+    return True
+
+  def formatItem(self, itemIndex):
+    """
+    Return current value of an item as displayable text.
+    """
+    value = self.values[itemIndex]
+    if value is None:
+      return "-"
+    text = "{0:.2f}{1}".format(value, self.units[itemIndex])
+    if not self.isComplete(itemIndex):
+      text += " ({0}/{1})".format(self._sumCounts[itemIndex], len(self._sumTerms[itemIndex]))
+    return text
+
+  def setPoints(self, positions, defined):
+    """
+    Set all point positions (e.g., when the input point list is changed).
+    Returns indices of all items.
+    """
+    self.values = [None] * len(self.names)
+    for sumIndex in self._sumCounts:
+      self._sumCounts[sumIndex] = 0
+    self.defined[:] = False
+    for pointIndex in range(min(len(positions), len(self.defined))):
+      self.updatePoint(pointIndex, positions[pointIndex] if defined[pointIndex] else None)
+    return list(range(len(self.names)))
+
+  def updatePoint(self, pointIndex, position):
+    """
+    Update position of a single point. Position is None if the point is not defined.
+    Returns indices of items that have changed.
+    """
+    if pointIndex >= len(self.defined):
+      return []
+    if position is None:
+      if not self.defined[pointIndex]:
+        return []
+      self.defined[pointIndex] = False
+    else:
+      if self.defined[pointIndex] and np.array_equal(self.positions[pointIndex], position):
+        return []
+      self.positions[pointIndex] = position
+      self.defined[pointIndex] = True
+
+    changedItems = []
+    for distanceIndex in self._pointDistances[pointIndex]:
+      pointIndex1, pointIndex2 = self._distancePoints[distanceIndex]
+      if self.defined[pointIndex1] and self.defined[pointIndex2]:
+        value = float(np.linalg.norm(self.positions[pointIndex1] - self.positions[pointIndex2]))
+      else:
+        value = None
+      self._setValue(distanceIndex, value, changedItems)
+    return changedItems
+
+  def _setValue(self, itemIndex, value, changedItems):
+    oldValue = self.values[itemIndex]
+    if value is None and oldValue is None:
+      return
+    self.values[itemIndex] = value
+    changedItems.append(itemIndex)
+
+    for sumIndex in self._itemSums.get(itemIndex, []):
+      self._sumCounts[sumIndex] += (value is not None) - (oldValue is not None)
+      if self._sumCounts[sumIndex]:
+        sumValue = (self.values[sumIndex] or 0.0) + (value or 0.0) - (oldValue or 0.0)
+      else:
+        sumValue = None
+      self._setValue(sumIndex, sumValue, changedItems)
+
+    for derivedIndex in self._itemDerived.get(itemIndex, []):
+      operation, input1, input2, scale = self._derivedInputs[derivedIndex]
+      derivedValue = None
+      if self.isComplete(input1) and self.isComplete(input2):
+        if operation == "difference":
+          derivedValue = self.values[input1] - self.values[input2]
+        elif operation == "ratio" and self.values[input2]:
+          derivedValue = self.values[input1] / self.values[input2] * scale
+      self._setValue(derivedIndex, derivedValue, changedItems)
@@ -0,0 +1,256 @@
+import csv
+import html
+import io
+import json
+import os
+import time
+
+import numpy as np
+
+#
+# Longitudinal comparison of analysis results of patients scanned at several visits (e.g., before, during, and after treatment)
+#
+# Points of all visits are stacked into a single (T, K, 3) array and computed by the AnalysisEngine in a single
+# vectorized pass (as if visits were patients). Changes of each result column (per-tooth diameters and indices,
+# per-arch sums, spaces, discrepancies, and ratios) are computed from the first visit (baseline) and from the previous visit.
+#
+# Visits of a cohort are kept in a LongitudinalStudy, which is a ResultStore with one row per visit: case name is
+# the patient name, "visit" column is the visit number (1, 2, ...) of the patient, and time is the visit time
+# (NaN if unknown). When visits are added only the new visits are computed, the history is read from the store columns.
+#
+
+visitColumn = "visit"
+
+
+def computeVisits(analysisType, points, pointNames=None):
+  """
+  Compute results of visits (TxKx3 array, points in the order of pointNames) in a single pass.
+  Returns a dict that maps column name (as in AnalysisResults.flatten) to an array of T values.
+  """
+  from OrthodonticAnalysisLib.AnalysisEngine import computeAnalysis
+  from OrthodonticAnalysisLib.CohortStatistics import flattenEngineResults
+  return flattenEngineResults(computeAnalysis(analysisType, points, pointNames))
+
+
+def computeChanges(columns):
+  """
+  Compute changes of results of consecutive visits. columns is a dict that maps column name to values of the visits.
+  Returns a dict that maps column name to a dict of "values", "changeFromBaseline" and "changeFromPrevious" arrays
+  (change from previous visit is NaN for the first visit).
+  """
+  changes = {}
+  for name, values in columns.items():
+    values = np.asarray(values, dtype=float)
+    changes[name] = {
+      "values": values,
+      "changeFromBaseline": values - values[0] if len(values) else values,
+      "changeFromPrevious": np.concatenate([[np.nan], np.diff(values)]) if len(values) else values,
+      }
+  return changes
+
+
+def isToothResult(name):
+  """
+  Return True if the result is a per-tooth result (such as "superior.diameters.16"), False for per-arch results.
+  """
+  return name.rsplit(".", 1)[-1].isdigit()
+
+
+def formatVisitTime(visitTime):
+  return "" if np.isnan(visitTime) else time.strftime("%Y-%m-%d", time.gmtime(visitTime))
+
+
+def renderTrendPlot(values, width=120, height=30):
+  """
+  Return an inline SVG line plot of values (missing values are skipped).
+  """
+  values = np.asarray(values, dtype=float)
+  valid = ~np.isnan(values)
+  if valid.sum() < 2:
+    return ""
+  minimum, maximum = values[valid].min(), values[valid].max()
+  scale = (height - 4) / (maximum - minimum) if maximum > minimum else 0.0
+  xs = np.linspace(2, width - 2, len(values))[valid]
+  ys = (height - 2) - (values[valid] - minimum) * scale if scale else np.full(len(xs), height / 2.0)
+  points = " ".join("{0:.1f},{1:.1f}".format(x, y) for x, y in zip(xs, ys))
+  return ('<svg width="{0}" height="{1}"><polyline points="{2}" fill="none" stroke="steelblue" stroke-width="1.5"/>'
+    '</svg>').format(width, height, points)
+
+
+def renderLongitudinalReport(patientName, analysisType, visitNames, visitTimes, columns, reportFormat):
+  """
+  Return longitudinal report of a patient as text in "csv", "json", or "html" format.
+  visitNames and visitTimes (seconds since epoch, NaN if unknown) describe the visits in chronological order,
+  columns is a dict that maps column name to values of the visits.
+  """
+  changes = computeChanges(columns)
+  visitTimes = [float(visitTime) for visitTime in visitTimes]
+  reportFormat = reportFormat.lower()
+
+  def toList(values):
+    return [None if np.isnan(value) else float(value) for value in values]
+
+  if reportFormat == "json":
+    return json.dumps({
+      "patientName": patientName,
+      "analysisType": analysisType,
+      "visits": [{"name": visitName, "time": formatVisitTime(visitTime)} for visitName, visitTime in zip(visitNames, visitTimes)],
+      "results": {name: {key: toList(values) for key, values in columnChanges.items()} for name, columnChanges in changes.items()},
+      }, indent=2)
+  elif reportFormat == "csv":
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(["result", "visit", "time", "value", "changeFromBaseline", "changeFromPrevious"])
+    for name, columnChanges in changes.items():
+      for visitIndex, (visitName, visitTime) in enumerate(zip(visitNames, visitTimes)):
+        writer.writerow([name, visitName, formatVisitTime(visitTime)] + [
+          "" if np.isnan(columnChanges[key][visitIndex]) else columnChanges[key][visitIndex]
+          for key in ["values", "changeFromBaseline", "changeFromPrevious"]])
+    return output.getvalue()
+  elif reportFormat == "html":
+    headers = ["Result"] + [html.escape(visitName) + ("<br>" + formatVisitTime(visitTime) if not np.isnan(visitTime) else "")
+      for visitName, visitTime in zip(visitNames, visitTimes)] + ["Change", "Trend"]
+    headerRow = "<tr>{0}</tr>".format("".join("<th>{0}</th>".format(header) for header in headers))
+    sections = []
+    for title, toothResults in [("PER-ARCH CHANGES", False), ("PER-TOOTH CHANGES", True)]:
+      rows = [headerRow]
+      for name, columnChanges in changes.items():
+        if isToothResult(name) != toothResults:
+          continue
+        cells = ["<td>{0}</td>".format(html.escape(name))]
+        cells += ["<td>{0}</td>".format("" if np.isnan(value) else "{0:.2f}".format(value)) for value in columnChanges["values"]]
+        change = columnChanges["changeFromBaseline"][-1]
+        cells.append("<td>{0}</td>".format("" if np.isnan(change) else "{0:+.2f}".format(change)))
+        cells.append("<td>{0}</td>".format(renderTrendPlot(columnChanges["values"])))
+        rows.append("<tr>{0}</tr>".format("".join(cells)))
+      if len(rows) > 1:
+        sections.append("<h2>{0}</h2>\n<table>\n{1}\n</table>".format(title, "\n".join(rows)))
+    return "<html>\n<h1>LONGITUDINAL ANALYSIS OF {0}</h1>\n<p>{1} analysis, {2} visits. Change is the change from the first visit.</p>\n{3}\n</html>".format(
+      html.escape(patientName), analysisType, len(visitNames), "\n".join(sections))
+  raise ValueError("Invalid report format: {0}".format(reportFormat))
+
+
+class LongitudinalStudy:
+  """Results of visits of a cohort of patients, stored in a ResultStore (one row per visit).
+
+  Example:
+
+    study = LongitudinalStudy("/path/to/study")
+    updatedPatientNames, errors = study.addFolder("All", "/path/to/patients")
+    study.write("patient1", "All", "/path/to/patient1.html")
+  """
+
+  def __init__(self, folder):
+    from OrthodonticAnalysisLib.ResultStore import ResultStore
+    self.folder = folder
+    self.store = ResultStore(folder)
+
+  def _getRowMask(self, analysisType):
+    return self.store.getAnalysisTypes() == analysisType
+
+  def getPatientNames(self, analysisType=None):
+    """
+    Return names of patients that have visits (of an analysis type, if specified), in the order they were added.
+    """
+    caseNames = self.store.getCaseNames()
+    if analysisType is not None:
+      caseNames = caseNames[self._getRowMask(analysisType)]
+    return list(dict.fromkeys(caseNames))
+
+  def getNumberOfVisits(self, analysisType):
+    """
+    Return dict that maps patient name to the number of visits of an analysis type.
+    """
+    caseNames, counts = np.unique(self.store.getCaseNames()[self._getRowMask(analysisType)].astype(str), return_counts=True)
+    return dict(zip(caseNames.tolist(), counts.tolist()))
+
+  def addVisits(self, analysisType, patientNames, points, visitTimes=None, pointNames=None):
+    """
+    Compute and append new visits of one or more patients in a single pass.
+    points is an MxKx3 array, patientNames is the patient name of each row (visits of a patient in chronological order),
+    visitTimes is the time of each visit (seconds since epoch, unknown by default).
+    Visits are numbered after the already stored visits of the patient, which are not recomputed.
+    """
+    if len(patientNames) == 0:
+      return
+    columns = computeVisits(analysisType, points, pointNames)
+    numberOfVisits = self.getNumberOfVisits(analysisType)
+    visitNumbers = []
+    for patientName in patientNames:
+      numberOfVisits[patientName] = numberOfVisits.get(patientName, 0) + 1
+      visitNumbers.append(numberOfVisits[patientName])
+    columns[visitColumn] = np.array(visitNumbers, dtype=float)
+    self.store.append(columns, list(patientNames), analysisType, np.nan if visitTimes is None else visitTimes)
+
+  def addFolder(self, analysisType, inputFolder, pointNames=None):
+    """
+    Add new visits from a folder that contains a subfolder for each patient (the subfolder name is the patient name).
+    Markups files of a patient subfolder are the visits, in chronological order of their names.
+    Only files after the already stored visits of the patient are read and computed (all in a single pass).
+    If a visit cannot be read then it and the later visits of the patient are not added.
+    Returns names of patients that have new visits and list of (filename, error message) pairs.
+    """
+    from OrthodonticAnalysisLib.AnalysisPoints import getPointNames
+    from OrthodonticAnalysisLib.MarkupsReader import iterMarkupsFiles, readMarkupsFiles
+    if pointNames is None:
+      pointNames = getPointNames(analysisType)
+    numberOfVisits = self.getNumberOfVisits(analysisType)
+    newFiles = {}  # patient name -> filenames of new visits
+    with os.scandir(inputFolder) as entries:
+      for entry in sorted(entries, key=lambda entry: entry.name):
+        if entry.is_dir():
+          filenames = list(iterMarkupsFiles(entry.path, recursive=False))[numberOfVisits.get(entry.name, 0):]
+          if filenames:
+            newFiles[entry.name] = filenames
+    allFilenames = [filename for filenames in newFiles.values() for filename in filenames]
+    validFilenames, points, errors = next(readMarkupsFiles(allFilenames, pointNames, batchSize=len(allFilenames)), ([], [], []))
+    fileIndices = {filename: index for index, filename in enumerate(validFilenames)}
+    rowIndices = []
+    patientNames = []
+    for patientName, filenames in newFiles.items():
+      for filename in filenames:
+        if filename not in fileIndices:
+          break
+        rowIndices.append(fileIndices[filename])
+        patientNames.append(patientName)
+    if rowIndices:
+      self.addVisits(analysisType, patientNames, points[rowIndices], pointNames=pointNames)
+    return list(dict.fromkeys(patientNames)), errors
+
+  def getHistory(self, patientName, analysisType):
+    """
+    Return visit numbers, visit times, and results (dict that maps column name to values) of the visits of a patient,
+    in chronological order. Columns that have no values for the patient are omitted.
+    """
+    rows = np.flatnonzero(self._getRowMask(analysisType) & (self.store.getCaseNames() == patientName))
+    visitNumbers = self.store.getColumn(visitColumn)[rows] if rows.size else np.empty(0)
+    order = np.argsort(visitNumbers, kind="stable")
+    rows = rows[order]
+    columns = {}
+    for name in self.store.columnNames:
+      if name == visitColumn:
+        continue
+      values = np.array(self.store.getColumn(name)[rows])
+      if not np.isnan(values).all():
+        columns[name] = values
+    return visitNumbers[order].astype(int).tolist(), np.array(self.store.getTimes()[rows]), columns
+
+  def render(self, patientName, analysisType, reportFormat):
+    """
+    Return longitudinal report of a patient in "csv", "json", or "html" format.
+    """
+    visitNumbers, visitTimes, columns = self.getHistory(patientName, analysisType)
+    if not visitNumbers:
+      raise ValueError("No visits are found for patient {0} in study {1}".format(patientName, self.folder))
+    return renderLongitudinalReport(patientName, analysisType, ["Visit {0}".format(number) for number in visitNumbers],
+      visitTimes, columns, reportFormat)
+
+  def write(self, patientName, analysisType, filename):
+    """
+    Write longitudinal report of a patient into a file. Format is determined from the file extension (.json, .html, otherwise CSV).
+    """
+    extension = filename.lower().rsplit(".", 1)[-1]
+    reportFormat = extension if extension in ["json", "html"] else "csv"
+    content = self.render(patientName, analysisType, reportFormat)
+    with open(filename, "w", newline="", encoding="utf-8") as file_object:
+      file_object.write(content)
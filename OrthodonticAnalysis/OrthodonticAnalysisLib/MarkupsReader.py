@@ -0,0 +1,139 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+#
+# Bulk reading of markups files without creating MRML nodes
+#
+# Control point labels and positions are parsed from markups files (.mrk.json, .fcsv) directly into NumPy arrays
+# and validated against the point list of an analysis type. Files of directory trees are listed lazily,
+# so that reading can start immediately and memory usage does not depend on the number of files.
+#
+
+markupsFileExtensions = (".mrk.json", ".fcsv")
+
+fcsvDefaultColumns = ["id", "x", "y", "z", "ow", "ox", "oy", "oz", "vis", "sel", "lock", "label", "desc", "associatedNodeID"]
+
+
+def readJsonControlPoints(filename):
+  with open(filename, "rb") as file_object:
+    markups = json.load(file_object)["markups"][0]
+  controlPoints = markups.get("controlPoints", [])
+  labels = [controlPoint.get("label", "") for controlPoint in controlPoints]
+  positions = np.array([controlPoint.get("position", [np.nan] * 3) for controlPoint in controlPoints], dtype=float).reshape(-1, 3)
+  # Positions of points that have not been placed yet ("undefined") or are being placed ("preview") are not valid
+  notPlaced = [controlPoint.get("positionStatus", "defined") != "defined" for controlPoint in controlPoints]
+  positions[np.array(notPlaced, dtype=bool)] = np.nan
+  return labels, positions, (markups.get("coordinateSystem", "LPS") == "LPS")
+
+
+def readFcsvControlPoints(filename):
+  columns = fcsvDefaultColumns
+  lps = False
+  with open(filename, encoding="utf-8") as file_object:
+    lines = file_object.read().splitlines()
+  dataLines = []
+  for line in lines:
+    if line.startswith("#"):
+      if line.startswith("# CoordinateSystem"):
+        lps = line.split("=")[1].strip() in ["1", "LPS"]
+      elif line.startswith("# columns"):
+        columns = [column.strip() for column in line.split("=")[1].split(",")]
+    elif line.strip():
+      dataLines.append(line)
+  # Quoted values (labels or descriptions that contain commas) require the CSV parser, otherwise split is faster
+  rows = list(csv.reader(dataLines)) if any('"' in line for line in dataLines) else [line.split(",") for line in dataLines]
+  positionColumns = [columns.index(name) for name in ["x", "y", "z"]]
+  labelColumn = columns.index("label") if "label" in columns else None
+  labels = [row[labelColumn] if labelColumn is not None and labelColumn < len(row) else "" for row in rows]
+  positions = np.array([[row[column] for column in positionColumns] for row in rows], dtype=float).reshape(-1, 3)
+  return labels, positions, lps
+
+
+def readControlPoints(filename):
+  """
+  Read control point labels and positions (in RAS coordinate system) from a markups file.
+  Returns a list of labels and a Kx3 array of positions (NaN for points that have not been placed).
+  """
+  lowerFilename = filename.lower()
+  if lowerFilename.endswith(".json"):
+    labels, positions, lps = readJsonControlPoints(filename)
+  elif lowerFilename.endswith(".fcsv"):
+    labels, positions, lps = readFcsvControlPoints(filename)
+  else:
+    raise ValueError("Unsupported markups file format: {0}".format(filename))
+  if lps:
+    positions[:, :2] *= -1
+  return labels, positions
+
+
+def validateControlPoints(labels, positions, pointNames):
+  """
+  Return positions (Kx3 array) of the points of a point list ([short name, long name] pairs).
+
+  If every point is labeled with a short name of the point list then points are matched by label (in any order).
+  Otherwise points must be in the order of the point list: a label may be empty (only the current point is labeled
+  while points are placed), but it must not be the short name of a different point.
+  Raises ValueError if points are missing, mislabeled, or not placed.
+  """
+  shortNames = [shortName for shortName, longName in pointNames]
+  labelIndices = {}
+  for index, label in enumerate(labels):
+    labelIndices.setdefault(label, index)
+  if all(shortName in labelIndices for shortName in shortNames) and len(set(labels)) == len(labels):
+    positions = positions[[labelIndices[shortName] for shortName in shortNames]]
+  else:
+    if len(positions) < len(shortNames):
+      raise ValueError("Analysis requires {0} points but only {1} points are defined".format(len(shortNames), len(positions)))
+    expectedShortNames = set(shortNames)
+    for index, (label, shortName) in enumerate(zip(labels, shortNames)):
+      if label and label != shortName and label in expectedShortNames:
+        raise ValueError("Point {0} is labeled {1}, expected {2}".format(index + 1, label, shortName))
+    positions = positions[:len(shortNames)]
+  notPlaced = np.isnan(positions).any(axis=1)
+  if notPlaced.any():
+    raise ValueError("Points are not placed: {0}".format(", ".join(np.array(shortNames)[notPlaced])))
+  return positions
+
+
+def iterMarkupsFiles(inputFolder, recursive=True):
+  """
+  Yield paths of markups files in a folder (and its subfolders, if recursive), in sorted order.
+  Folders are listed lazily, one at a time.
+  """
+  with os.scandir(inputFolder) as entries:
+    entries = sorted(entries, key=lambda entry: entry.name)
+  subfolders = []
+  for entry in entries:
+    if entry.is_dir():
+      if recursive:
+        subfolders.append(entry.path)
+    elif entry.name.lower().endswith(markupsFileExtensions):
+      yield entry.path
+  for subfolder in subfolders:
+    yield from iterMarkupsFiles(subfolder, recursive)
+
+
+def readMarkupsFiles(filenames, pointNames, batchSize=1000):
+  """
+  Read and validate points of markups files (any iterable of filenames, such as iterMarkupsFiles).
+  Yields batches of at most batchSize files: list of valid filenames, their points (NxKx3 array, in the order
+  of pointNames), and list of (filename, error message) pairs of files that could not be read or validated.
+  """
+  validFilenames = []
+  points = []
+  errors = []
+  for filename in filenames:
+    try:
+      labels, positions = readControlPoints(filename)
+      points.append(validateControlPoints(labels, positions, pointNames))
+      validFilenames.append(filename)
+    except Exception as e:
+      errors.append((filename, str(e)))
+    if len(validFilenames) + len(errors) >= batchSize:
+      yield validFilenames, np.array(points).reshape(-1, len(pointNames), 3), errors
+      validFilenames, points, errors = [], [], []
+  if validFilenames or errors:
+    yield validFilenames, np.array(points).reshape(-1, len(pointNames), 3), errors
@@ -0,0 +1,91 @@
+import math
+
+#
+# Low-resolution proxies of large surface meshes
+#
+# While points are placed, a decimated copy of the scan is displayed and picked instead of the
+# full-resolution mesh, so that rendering stays interactive. Measurements always use the full-resolution mesh.
+#
+
+
+def decimateSurface(polyData, maximumNumberOfTriangles):
+  """
+  Return a decimated copy of a surface mesh that has at most maximumNumberOfTriangles triangles
+  (approximately), or None if the mesh is already small enough.
+
+  Vertex clustering (vtkQuadricClustering) is used instead of edge collapse decimation,
+  because it runs in linear time (a fraction of a second for millions of triangles),
+  and preserves the shape well at the resolution that is needed for display.
+  """
+  import vtk
+  numberOfTriangles = polyData.GetNumberOfCells()
+  if numberOfTriangles <= maximumNumberOfTriangles:
+    return None
+
+  # Each occupied bin results in about two triangles, therefore bin size is estimated from the surface area.
+  # The estimate is refined if the actual number of triangles is not close enough to the target.
+  massProperties = vtk.vtkMassProperties()
+  massProperties.SetInputData(polyData)
+  surfaceArea = massProperties.GetSurfaceArea()
+  bounds = polyData.GetBounds()
+  extents = [max(bounds[axis * 2 + 1] - bounds[axis * 2], 1e-6) for axis in range(3)]
+  if surfaceArea <= 0:
+    surfaceArea = max(extents[0] * extents[1], extents[1] * extents[2], extents[0] * extents[2])
+  binSize = math.sqrt(2.0 * surfaceArea / maximumNumberOfTriangles)
+
+  proxyPolyData = None
+  for iteration in range(3):
+    clustering = vtk.vtkQuadricClustering()
+    clustering.SetInputData(polyData)
+    clustering.AutoAdjustNumberOfDivisionsOff()
+    clustering.SetNumberOfXDivisions(max(2, math.ceil(extents[0] / binSize)))
+    clustering.SetNumberOfYDivisions(max(2, math.ceil(extents[1] / binSize)))
+    clustering.SetNumberOfZDivisions(max(2, math.ceil(extents[2] / binSize)))
+    clustering.Update()
+    numberOfProxyTriangles = clustering.GetOutput().GetNumberOfCells()
+    if numberOfProxyTriangles <= maximumNumberOfTriangles:
+      proxyPolyData = clustering.GetOutput()
+      if numberOfProxyTriangles >= maximumNumberOfTriangles * 0.6:
+        break
+    binSize *= math.sqrt(max(numberOfProxyTriangles, 1) / maximumNumberOfTriangles) * 1.03
+  if proxyPolyData is None:
+    proxyPolyData = clustering.GetOutput()
+
+  # Smooth shading
+  normals = vtk.vtkPolyDataNormals()
+  normals.SetInputData(proxyPolyData)
+  normals.SplittingOff()
+  normals.Update()
+  proxyPolyData = vtk.vtkPolyData()
+  proxyPolyData.DeepCopy(normals.GetOutput())
+  return proxyPolyData
+
+
+class ModelProxyCache:
+  """Keeps a decimated copy of the mesh of each model node.
+
+  A proxy is rebuilt only if the mesh of the model node is replaced or modified,
+  or a different triangle budget is requested.
+  """
+
+  def __init__(self):
+    self._proxies = {}  # model node ID -> (mesh, mesh modified time, maximum number of triangles, proxy mesh)
+
+  def getProxyPolyData(self, modelNode, maximumNumberOfTriangles):
+    """
+    Return decimated mesh of the model node, or None if the model mesh is already small enough.
+    """
+    polyData = modelNode.GetPolyData()
+    if polyData is None:
+      return None
+    proxy = self._proxies.get(modelNode.GetID())
+    if proxy is None or proxy[:3] != (polyData, polyData.GetMTime(), maximumNumberOfTriangles):
+      proxy = (polyData, polyData.GetMTime(), maximumNumberOfTriangles, decimateSurface(polyData, maximumNumberOfTriangles))
+      self._proxies[modelNode.GetID()] = proxy
+    return proxy[3]
+
+  def remove(self, modelNodeID):
+    self._proxies.pop(modelNodeID, None)
+
+  def clear(self):
+    self._proxies.clear()
@@ -0,0 +1,105 @@
+import numpy as np
+
+#
+# Reference landmarks for testing, benchmarking, and pre-placing points (see TemplateRegistration)
+#
+
+# Distal and mesial points of the 12 teeth of each arch, placed on the TeethSurface sample data set (RAS, mm)
+referenceToothPoints = {
+  "16-D": (22.08201981, -23.33771133, 20.25755501),
+  "16-M": (22.24702835, -31.33755684, 21.34285164),
+  "15-D": (21.05020905, -33.57769394, 20.82586288),
+  "15-M": (19.80578232, -38.49482346, 21.96247864),
+  "14-D": (18.11996651, -39.62874985, 20.58876419),
+  "14-M": (15.6773119, -43.51329041, 20.84062958),
+  "13-D": (14.88829422, -45.93460083, 22.75982285),
+  "13-M": (13.19761467, -49.92071915, 24.98643875),
+  "12-D": (11.26348495, -51.92196655, 24.92158699),
+  "12-M": (8.64679909, -54.30356979, 24.28428459),
+  "11-D": (6.33776236, -56.0610466, 25.04037094),
+  "11-M": (1.78006351, -56.95132446, 25.48031998),
+  "21-M": (-2.16635013, -56.97172546, 25.0060463),
+  "21-D": (-6.92025566, -56.07076645, 25.30604935),
+  "22-M": (-9.60852814, -54.69460678, 22.86414337),
+  "22-D": (-12.39715576, -51.92007065, 24.64757919),
+  "23-M": (-13.62540627, -50.76442337, 22.39550209),
+  "23-D": (-16.08952713, -47.632267, 24.58095741),
+  "24-M": (-16.86974907, -44.14796448, 21.01618767),
+  "24-D": (-19.02500725, -40.79146957, 21.13197517),
+  "25-M": (-20.02264214, -38.30114746, 20.2833786),
+  "25-D": (-22.63177681, -33.98239517, 21.14200592),
+  "26-M": (-22.84235001, -32.13227844, 20.34781075),
+  "26-D": (-23.02272606, -23.87202072, 20.32165146),
+  "36-D": (-21.21748734, 28.36712456, 19.8465004),
+  "36-M": (-20.2088089, 35.91403961, 19.19993591),
+  "35-D": (-19.53867912, 39.61227798, 18.90285492),
+  "35-M": (-18.82330132, 42.92764664, 18.90742874),
+  "34-D": (-17.66699791, 45.53125, 19.33840942),
+  "34-M": (-14.75944424, 48.4083519, 18.84576416),
+  "33-D": (-13.24126625, 50.82159424, 17.86232758),
+  "33-M": (-10.98532295, 53.38891983, 19.96564484),
+  "32-D": (-8.72065449, 55.52565384, 18.94808769),
+  "32-M": (-7.38320017, 56.39972687, 18.83339882),
+  "31-D": (-4.97158384, 57.34194565, 19.23067856),
+  "31-M": (-1.77612793, 57.65716171, 19.53565407),
+  "41-M": (1.08269632, 57.6644516, 18.88643074),
+  "41-D": (3.59803629, 57.58930969, 18.73008728),
+  "42-M": (6.15127277, 57.16143036, 18.54046822),
+  "42-D": (9.16291714, 55.95013428, 19.57354355),
+  "43-M": (10.80373573, 54.19895172, 20.96066284),
+  "43-D": (13.1416111, 52.37386703, 20.06233978),
+  "44-M": (15.6479454, 49.06868744, 19.79941177),
+  "44-D": (16.05915833, 45.21175385, 19.17629242),
+  "45-M": (17.35715103, 43.17802811, 19.32717133),
+  "45-D": (18.95762825, 38.32523727, 19.18061638),
+  "46-M": (20.97534943, 36.32210541, 19.83763313),
+  "46-D": (21.8088131, 28.76040459, 20.85327911),
+  }
+
+# Arch segment points that coincide with a tooth point or lie halfway between two tooth points
+referenceSegmentPoints = {
+  "15-14-D": ["15-D"], "15-14-M-13-D": ["14-M", "13-D"], "13-MS": ["13-M"], "SAM": ["11-M", "21-M"],
+  "23-MS": ["23-M"], "25-24-M-23-D": ["24-M", "23-D"], "25-24-D": ["25-D"],
+  "35-34-D": ["35-D"], "35-34-M-33-D": ["34-M", "33-D"], "33-MS": ["33-M"], "IAM": ["31-M", "41-M"],
+  "43-MS": ["43-M"], "45-44-M-43-D": ["44-M", "43-D"], "45-44-D": ["45-D"],
+  }
+
+# Typical Peck and Peck index (mesiodistal/faciolingual diameter), used for synthesizing faciolingual points
+referencePeckAndPeckIndex = 0.9
+
+
+def getReferencePoint(shortName):
+  """
+  Return reference position of a point. Vestibular and lingual points are placed
+  in the occlusal (axial) plane, perpendicular to the mesiodistal axis of the tooth.
+  """
+  if shortName in referenceToothPoints:
+    return np.array(referenceToothPoints[shortName])
+  if shortName in referenceSegmentPoints:
+    return np.mean([referenceToothPoints[name] for name in referenceSegmentPoints[shortName]], axis=0)
+  tooth, side = shortName.rsplit("-", 1)
+  if side not in ["V", "L"]:
+    raise ValueError("No reference position for point {0}".format(shortName))
+  distal = np.array(referenceToothPoints[tooth+"-D"])
+  mesial = np.array(referenceToothPoints[tooth+"-M"])
+  faciolingualDirection = np.cross(mesial - distal, [0.0, 0.0, 1.0])
+  faciolingualDirection /= np.linalg.norm(faciolingualDirection)
+  faciolingualRadius = np.linalg.norm(mesial - distal) / referencePeckAndPeckIndex / 2.0
+  return (distal + mesial) / 2.0 + (faciolingualRadius if side == "V" else -faciolingualRadius) * faciolingualDirection
+
+
+def getReferencePoints(pointNames):
+  """
+  Return reference positions (Kx3 array) of a point list ([shortName, longName] pairs).
+  """
+  return np.array([getReferencePoint(shortName) for shortName, longName in pointNames])
+
+
+def generateCohort(pointNames, numberOfPatients, standardDeviation=0.5, seed=0):
+  """
+  Return synthetic landmarks of a cohort (NxKx3 array) by adding random
+  displacements (normal distribution, in mm) to the reference positions.
+  """
+  referencePoints = getReferencePoints(pointNames)
+  rng = np.random.default_rng(seed)
+  return referencePoints + rng.normal(0.0, standardDeviation, (numberOfPatients,) + referencePoints.shape)
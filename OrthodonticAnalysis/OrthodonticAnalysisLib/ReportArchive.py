@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+#
+# Content-addressed archive of generated reports
+#
+# Report files (HTML, JSON, and CSV reports and screenshots) are stored as blobs named by the SHA-256 hash of their
+# content, so identical files (e.g., a report generated again from unchanged landmarks and view) are stored only once.
+# Blobs are compressed by zlib, unless that does not make them smaller (PNG and JPEG screenshots are already compressed).
+# Blobs are distributed into subfolders by the first two digits of the hash, so that no folder gets large.
+#
+# Reports are listed in an append-only manifest (one JSON object per line): report time, analysis type, case names,
+# cache key (see ResultCache.getCacheKey), and the hash of each file. The manifest is read once into an in-memory index
+# (later only the appended lines are read), therefore looking up a report does not list any folder.
+# Each distinct report is identified by the hash of its file list (report id), and it is extracted into
+# a subfolder of a view folder (named after the report id) to be opened.
+#
+
+
+class ReportArchive:
+  """Content-addressed, compressed storage of report files in a folder.
+
+  Example:
+
+    archive = ReportArchive("/path/to/reports/OrthodonticAnalysisArchive")
+    entry = archive.addReport([("report.html", html), ("report.png", image)], "report.html", key=cacheKey)
+    reportFilename = archive.extractReport(archive.findReport(cacheKey), "/path/to/view")
+  """
+
+  folderName = "OrthodonticAnalysisArchive"
+  manifestFilename = "manifest.jsonl"
+  blobsFolderName = "blobs"
+
+  def __init__(self, folder):
+    self.folder = folder
+    self._entries = []
+    self._keyIndices = {}  # cache key -> index of the latest entry of the key
+    self._reportIdIndices = {}  # report id -> index of the latest entry of the report
+    self._manifestSize = 0  # size of the part of the manifest that is already indexed
+    self._lock = threading.Lock()
+
+  @property
+  def manifestPath(self):
+    return os.path.join(self.folder, self.manifestFilename)
+
+  def getBlobFilename(self, digest, compressed):
+    return os.path.join(self.folder, self.blobsFolderName, digest[:2], digest + (".z" if compressed else ""))
+
+  def hasBlob(self, digest):
+    return os.path.exists(self.getBlobFilename(digest, True)) or os.path.exists(self.getBlobFilename(digest, False))
+
+  def addBlob(self, content):
+    """
+    Store content (bytes) unless it is already stored. Returns the hash of the content.
+    """
+    from OrthodonticAnalysisLib.ReportWriter import writeFile
+    digest = hashlib.sha256(content).hexdigest()
+    if not self.hasBlob(digest):
+      compressedContent = zlib.compress(content, 6)
+      if len(compressedContent) < len(content):
+        writeFile(self.getBlobFilename(digest, True), compressedContent)
+      else:
+        writeFile(self.getBlobFilename(digest, False), content)
+    return digest
+
+  def readBlob(self, digest):
+    try:
+      with open(self.getBlobFilename(digest, True), "rb") as file_object:
+        return zlib.decompress(file_object.read())
+    except FileNotFoundError:
+      with open(self.getBlobFilename(digest, False), "rb") as file_object:
+        return file_object.read()
+
+  def _updateIndex(self):
+    """
+    Add entries that were appended to the manifest since it was last read (only complete lines are read).
+    """
+    try:
+      if os.path.getsize(self.manifestPath) == self._manifestSize:
+        return
+      with open(self.manifestPath, "rb") as file_object:
+        file_object.seek(self._manifestSize)
+        content = file_object.read()
+    except OSError:
+      return
+    content = content[:content.rfind(b"\n") + 1]
+    for line in content.splitlines():
+      if line.strip():
+        self._addToIndex(json.loads(line))
+    self._manifestSize += len(content)
+
+  def _addToIndex(self, entry):
+    self._entries.append(entry)
+    if entry.get("key"):
+      self._keyIndices[entry["key"]] = len(self._entries) - 1
+    self._reportIdIndices[self.getReportId(entry)] = len(self._entries) - 1
+
+  @staticmethod
+  def getReportId(entry):
+    """
+    Return the id of the report of a manifest entry: hash of its file list, so identical reports have the same id.
+    """
+    return hashlib.sha256(json.dumps(entry["files"], sort_keys=True).encode()).hexdigest()[:16]
+
+  def addReport(self, files, report, timestamp="", analysisType="", caseNames=(), key=None):
+    """
+    Store files of a report and add the report to the manifest. files is a list of (filename, content) pairs
+    (content types are the same as in ReportWriter.writeFile, only the base name of the filename is stored),
+    report is the name of the main file (the one that is opened). Returns the manifest entry (dict).
+    """
+    from OrthodonticAnalysisLib.ReportWriter import encodeContent
+    entry = {
+      "report": report,
+      "timestamp": timestamp,
+      "analysisType": analysisType,
+      "caseNames": list(caseNames),
+      "key": key,
+      "files": {os.path.basename(filename): self.addBlob(encodeContent(content)) for filename, content in files},
+      }
+    line = (json.dumps(entry) + "\n").encode("utf-8")
+    with self._lock:
+      self._updateIndex()
+      os.makedirs(self.folder, exist_ok=True)
+      with open(self.manifestPath, "ab") as file_object:
+        file_object.write(line)
+      self._manifestSize += len(line)
+      self._addToIndex(entry)
+    return entry
+
+  def findReport(self, key):
+    """
+    Return the latest manifest entry of a cache key or None if not found.
+    """
+    with self._lock:
+      self._updateIndex()
+      index = self._keyIndices.get(key)
+      return self._entries[index] if index is not None else None
+
+  def findReportById(self, reportId):
+    """
+    Return the latest manifest entry of a report id (see getReportId) or None if not found.
+    """
+    with self._lock:
+      self._updateIndex()
+      index = self._reportIdIndices.get(reportId)
+      return self._entries[index] if index is not None else None
+
+  def getReports(self, caseName=None, analysisType=None):
+    """
+    Return manifest entries (oldest first), optionally only those of a case or analysis type.
+    """
+    with self._lock:
+      self._updateIndex()
+      entries = list(self._entries)
+    return [entry for entry in entries if (caseName is None or caseName in entry["caseNames"])
+      and (analysisType is None or entry["analysisType"] == analysisType)]
+
+  def extractReport(self, entry, viewFolder):
+    """
+    Write files of a report into a subfolder of viewFolder (files that are already there are not written again).
+    The subfolder is named after the report id (see getReportId), so identical reports are extracted once.
+    Returns the filename of the main file of the report.
+    """
+    from OrthodonticAnalysisLib.ReportWriter import writeFile
+    folder = os.path.join(viewFolder, self.getReportId(entry))
+    for filename, digest in entry["files"].items():
+      path = os.path.join(folder, filename)
+      if not os.path.exists(path):
+        writeFile(path, self.readBlob(digest))
+    return os.path.join(folder, entry["report"])
@@ -0,0 +1,231 @@
+"""
+SQLite index of the results of generated reports.
+
+Usage:
+
+  PythonSlicer /path/to/OrthodonticAnalysisLib/ReportIndex.py --index /path/to/reports/OrthodonticAnalysisIndex.sqlite
+    --where "bolton.anterior.excessArch=Inferior" --where "bolton.anterior.excess>1.5" --latest
+
+Each generated report is a row of the reports table (case name, analysis type, timestamp, and report filename, or
+report id if the report is stored in the report archive, see ReportArchive.getReportId) and each result (named as in
+AnalysisResults.flatten, for example "bolton.anterior.excess") is a row of the results table. Results are indexed by
+name and value, therefore cohort queries (such as all patients with anterior Bolton excess on the inferior arch above
+1.5mm) are answered by index range scans, without opening any report.
+Reports are indexed by case name, analysis type, and time, too. Every indexed report is a new row (identified by
+an autoincremented id), so reports of a case that are generated within the same second are all kept.
+Query planner statistics are updated whenever the number of reports doubles, so that queries start from the most
+selective condition.
+
+Only the Python standard library is required, so the script can be run by any Python interpreter.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+schema = """
+CREATE TABLE IF NOT EXISTS reports (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  caseName TEXT NOT NULL,
+  analysisType TEXT NOT NULL,
+  timestamp TEXT NOT NULL,
+  time REAL,
+  report TEXT,
+  archived INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS reportsByCase ON reports (caseName, analysisType, time);
+CREATE INDEX IF NOT EXISTS reportsByAnalysisType ON reports (analysisType, time);
+CREATE INDEX IF NOT EXISTS reportsByTime ON reports (time);
+CREATE TABLE IF NOT EXISTS results (
+  reportId INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,
+  name TEXT NOT NULL,
+  value,
+  PRIMARY KEY (reportId, name)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS resultsByValue ON results (name, value);
+"""
+
+operators = ["<=", ">=", "!=", "=", "<", ">"]
+
+
+def parseCondition(condition):
+  """
+  Parse a condition such as "bolton.anterior.excess>1.5" into a (name, operator, value) tuple.
+  The value is a number if possible, otherwise text.
+  """
+  match = re.match(r"^\s*([\w.]+)\s*(<=|>=|!=|=|<|>)\s*(.*?)\s*$", condition)
+  if not match:
+    raise ValueError("Invalid condition: {0}".format(condition))
+  name, operator, value = match.groups()
+  try:
+    value = float(value)
+  except ValueError:
+    pass
+  return name, operator, value
+
+
+class ReportIndex:
+  """Index of report results in an SQLite database.
+
+  Example:
+
+    index = ReportIndex("/path/to/reports/OrthodonticAnalysisIndex.sqlite")
+    index.addResults(results, "OrthodonticAnalysis-Bolton-20240101-120000.html")
+    rows = index.query([("bolton.anterior.excessArch", "=", "Inferior"), ("bolton.anterior.excess", ">", 1.5)])
+  """
+
+  filename = "OrthodonticAnalysisIndex.sqlite"
+
+  def __init__(self, path):
+    self.path = path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Reports are indexed by the report writer thread when they are written, therefore access is serialized by a lock
+    self.connection = sqlite3.connect(path, check_same_thread=False)
+    self._lock = threading.Lock()
+    self.connection.execute("PRAGMA foreign_keys = ON")
+    self.connection.executescript(schema)
+
+  def close(self):
+    with self._lock:
+      self.connection.close()
+
+  def addResults(self, results, report="", archived=False):
+    """
+    Add results of a case or list of cases as new reports (results that are added again are indexed as another report).
+    report is the filename of the report (relative to the report folder) or, if archived is True, the report id in
+    the report archive (see ReportArchive.getReportId). Confidence intervals of uncertainty analysis are not indexed.
+    """
+    from OrthodonticAnalysisLib.ResultStore import parseTimestamp
+    if not isinstance(results, list):
+      results = [results]
+    with self._lock:
+      with self.connection:
+        for caseResults in results:
+          reportId = self.connection.execute(
+            "INSERT INTO reports (caseName, analysisType, timestamp, time, report, archived) VALUES (?, ?, ?, ?, ?, ?)",
+            (caseResults.name, caseResults.analysisType, caseResults.timestamp, parseTimestamp(caseResults.timestamp),
+            report, int(archived))).lastrowid
+          self.connection.executemany("INSERT INTO results (reportId, name, value) VALUES (?, ?, ?)",
+            [(reportId, name, value) for name, value in caseResults.flatten().items()
+              if isinstance(value, (float, str)) and not name.startswith("uncertainty.") and name not in ["name", "analysisType", "timestamp"]])
+      self._updateStatistics()
+
+  def _updateStatistics(self, minimumNumberOfReports=100):
+    """
+    Update statistics of the query planner (ANALYZE) if the number of reports has doubled since the last update.
+    Without statistics, queries may start from a condition that most reports match (e.g., excessArch=Inferior).
+    """
+    numberOfReports = self.connection.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+    try:
+      row = self.connection.execute("SELECT stat FROM sqlite_stat1 WHERE idx = 'reportsByTime'").fetchone()
+    except sqlite3.OperationalError:
+      row = None  # statistics have not been computed yet
+    analyzedNumberOfReports = int(row[0].split()[0]) if row else 0
+    if numberOfReports >= max(2 * analyzedNumberOfReports, minimumNumberOfReports):
+      self.connection.execute("ANALYZE")
+      self.connection.commit()
+
+  def query(self, conditions=(), columns=(), analysisType=None, caseName=None, since=None, until=None, latest=False):
+    """
+    Return reports whose results match all conditions ((name, operator, value) tuples, see parseCondition).
+    Reports can be filtered by analysis type, case name, and time (seconds since epoch, see ResultStore.parseTimestamp).
+    If latest is True then only the latest report of each case and analysis type is considered.
+    Returns list of dicts of caseName, analysisType, timestamp, report, archived (see addResults),
+    and the values of the conditions and columns.
+    """
+    names = list(dict.fromkeys([name for name, operator, value in conditions] + list(columns)))
+    selects = ["reports.caseName", "reports.analysisType", "reports.timestamp", "reports.report", "reports.archived"]
+    joins = []
+    where = []
+    parameters = []
+    for index, name in enumerate(names):
+      selects.append("r{0}.value".format(index))
+      nameConditions = [(operator, value) for conditionName, operator, value in conditions if conditionName == name]
+      joins.append("{0} JOIN results r{1} ON r{1}.reportId = reports.id AND r{1}.name = ?".format(
+        "" if nameConditions else "LEFT", index))
+      parameters.append(name)
+      for operator, value in nameConditions:
+        if operator not in operators:
+          raise ValueError("Invalid operator: {0}".format(operator))
+        joins[-1] += " AND r{0}.value {1} ?".format(index, operator)
+        parameters.append(value)
+    for column, value in [("analysisType", analysisType), ("caseName", caseName)]:
+      if value is not None:
+        where.append("reports.{0} = ?".format(column))
+        parameters.append(value)
+    for operator, value in [(">=", since), ("<=", until)]:
+      if value is not None:
+        where.append("reports.time {0} ?".format(operator))
+        parameters.append(value)
+    if latest:
+      # Reports generated within the same second are ordered by id
+      where.append("reports.id = (SELECT latest.id FROM reports latest"
+        " WHERE latest.caseName = reports.caseName AND latest.analysisType = reports.analysisType"
+        " ORDER BY latest.time DESC, latest.id DESC LIMIT 1)")
+    sql = "SELECT {0} FROM reports {1}{2} ORDER BY reports.time, reports.id".format(
+      ", ".join(selects), " ".join(joins), " WHERE " + " AND ".join(where) if where else "")
+    rows = []
+    with self._lock:
+      for row in self.connection.execute(sql, parameters):
+        rowDict = dict(zip(["caseName", "analysisType", "timestamp", "report"], row[:4]))
+        rowDict["archived"] = bool(row[4])
+        rowDict.update(zip(names, row[5:]))
+        rows.append(rowDict)
+    return rows
+
+  def getResultNames(self):
+    """
+    Return names of all indexed results.
+    """
+    with self._lock:
+      return [row[0] for row in self.connection.execute("SELECT DISTINCT name FROM results ORDER BY name")]
+
+
+def main(argv):
+  import argparse
+  import calendar
+  import csv
+  import sys
+  import time
+  parser = argparse.ArgumentParser(description="Query the index of generated orthodontic analysis reports.")
+  parser.add_argument("--index", required=True, help="Index file ({0} in the report folder).".format(ReportIndex.filename))
+  parser.add_argument("--where", action="append", default=[], help="Condition, such as \"bolton.anterior.excess>1.5\" (can be repeated).")
+  parser.add_argument("--columns", default="", help="Comma-separated list of results to show.")
+  parser.add_argument("--analysis-type", help="Only reports of this analysis type.")
+  parser.add_argument("--case", help="Only reports of this case.")
+  parser.add_argument("--since", help="Only reports generated on or after this date (YYYY-MM-DD).")
+  parser.add_argument("--until", help="Only reports generated before this date (YYYY-MM-DD).")
+  parser.add_argument("--latest", action="store_true", help="Only the latest report of each case and analysis type.")
+  parser.add_argument("--format", choices=["csv", "json"], default="csv")
+  args = parser.parse_args(argv)
+  if not os.path.exists(args.index):
+    parser.error("index file not found: {0}".format(args.index))
+
+  def parseDate(date):
+    return float(calendar.timegm(time.strptime(date, "%Y-%m-%d"))) if date else None
+
+  index = ReportIndex(args.index)
+  rows = index.query([parseCondition(condition) for condition in args.where],
+    [column for column in args.columns.split(",") if column], args.analysis_type, args.case,
+    parseDate(args.since), parseDate(args.until) - 1.0 if args.until else None, args.latest)
+  index.close()
+  if args.format == "json":
+    sys.stdout.write(json.dumps(rows, indent=2) + "\n")
+  else:
+    fieldNames = list(rows[0]) if rows else ["caseName", "analysisType", "timestamp", "report", "archived"]
+    writer = csv.DictWriter(sys.stdout, fieldNames, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+  logging.info("{0} reports found".format(len(rows)))
+  return 0
+
+
+if __name__ == "__main__":
+  import sys
+  # Make sure the module folder is in the path when the script is started directly
+  moduleFolder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  if moduleFolder not in sys.path:
+    sys.path.insert(0, moduleFolder)
+  logging.basicConfig(level=logging.INFO, format="%(message)s")
+  sys.exit(main(sys.argv[1:]))
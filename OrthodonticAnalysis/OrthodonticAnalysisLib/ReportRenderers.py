@@ -0,0 +1,227 @@
+import csv
+import html
+import io
+import json
+
+#
+# Renderers that create reports from AnalysisResults
+#
+# Templates are module-level constants, so they are created only once per process
+# and each render call only fills in the values.
+#
+
+spaceAnalysisTemplate = """<h2>{title} SPACE ANALYSIS</h2>
+
+<h3>Spaces</h3>
+<ul>
+  <li>{arch} arch discrepancy: {discrepancy:.2f}mm</li>
+  <li>Required Space: {requiredSpace:.2f}mm</li>
+  <li>Rated Space: {ratedSpace:.2f}mm</li>
+</ul>
+<h3>Diameters</h3>
+<ul>
+{diameters}</ul>
+""".format
+
+spaceAnalysisDiameterTemplate = "  <li>Tooth {0}: {1:.2f}mm</li>\n".format
+
+boltonAnalysisTemplate = """<h2>BOLTON ANALYSIS</h2>{total}{anterior}""".format
+
+boltonRatioTemplate = """
+<h3>{title} Bolton Analysis</h3>
+<ul>
+<li>Excess on {excessArch} arch: {excess:.1f}mm</li>
+<li>Ideal superior arch length: {idealSuperiorLength:.1f}mm</li>
+<li>Ideal inferior arch length: {idealInferiorLength:.1f}mm</li>
+</ul>
+""".format
+
+peckAndPeckAnalysisTemplate = """<h2>PECK & PECK ANALYSIS</h2>
+
+<h3>Results (%)</h3>
+
+<table border="1">
+  <tr> <th>Tooth</th>  <th>Result</th>    <th>Normal range</th>  </tr>
+{indices}</table>
+
+<h3>Diameters (mm)</h3>
+
+<table border="1">
+  <tr> <th>Tooth</th>  <th>Axis</th>          <th>Diameter</th>  </tr>
+{diameters}</table>
+""".format
+
+peckAndPeckIndexTemplate = "  <tr> <td>{0}</td>     <td>{1:.2f}%</td>  <td>{2}</td>        </tr>\n".format
+
+peckAndPeckDiameterTemplate = "  <tr> <td>{0}</td>     <td>{1}</td>   <td>{2:.2f}mm</td>   </tr>\n".format
+
+uncertaintyAnalysisTemplate = """<h2>UNCERTAINTY ANALYSIS</h2>
+
+<p>Landmark error: {errorModel} ({landmarkError}), {numberOfSamples} samples</p>
+<ul>
+{thresholds}</ul>
+<h3>Confidence intervals ({confidence:g}%)</h3>
+
+<table border="1">
+  <tr> <th>Result</th>  <th>Value</th>  <th>Interval</th>  </tr>
+{intervals}</table>
+""".format
+
+uncertaintyThresholdTemplate = "  <li>{title} Bolton ratio above {idealRatio}%: {probabilityAbove:.1%} probability (crossing the ideal ratio: {crossingProbability:.1%})</li>\n".format
+
+uncertaintyIntervalTemplate = "  <tr> <td>{0}</td>  <td>{1:.2f}</td>  <td>{2:.2f} - {3:.2f}</td>  </tr>\n".format
+
+reportTemplate = "<html>\n<meta charset=\"utf-8\">\n{0}\n{1}\n</html>".format
+
+# Combined report of several cases: list of cases, followed by the results and screenshot of each case
+casesReportTemplate = """<h1>ORTHODONTIC ANALYSIS OF {count} CASES</h1>
+<ul>
+{index}</ul>
+""".format
+
+caseIndexTemplate = '  <li><a href="#case{0}">{1}</a></li>\n'.format
+
+caseTemplate = """<hr>
+<h1 id="case{0}">{1}</h1>
+{2}
+{3}
+""".format
+
+# Normal range of Peck and Peck index of each tooth
+peckAndPeckNormalRanges = {"32": "90-95%", "31": "88-92%", "41": "88-92%", "42": "90-95%"}
+
+
+class HtmlRenderer:
+  """Renders analysis results as an HTML report."""
+
+  fileExtension = ".html"
+
+  @staticmethod
+  def renderSpaceAnalysis(spaceResults):
+    diameters = "".join(spaceAnalysisDiameterTemplate(tooth, diameter) for tooth, diameter in spaceResults.diameters.items())
+    return spaceAnalysisTemplate(title=spaceResults.arch.upper(), arch=spaceResults.arch,
+      discrepancy=spaceResults.discrepancy, requiredSpace=spaceResults.requiredSpace, ratedSpace=spaceResults.ratedSpace,
+      diameters=diameters)
+
+  @staticmethod
+  def renderBoltonAnalysis(boltonResults):
+    return boltonAnalysisTemplate(
+      total=boltonRatioTemplate(title="Total", **vars(boltonResults.total)),
+      anterior=boltonRatioTemplate(title="Anterior", **vars(boltonResults.anterior)))
+
+  @staticmethod
+  def renderPeckAndPeckAnalysis(peckAndPeckResults):
+    teeth = list(peckAndPeckResults.indices.keys())
+    indices = "".join(peckAndPeckIndexTemplate(tooth, peckAndPeckResults.indices[tooth], peckAndPeckNormalRanges.get(tooth, ""))
+      for tooth in teeth)
+    diameters = "".join(
+      peckAndPeckDiameterTemplate(tooth, "Mesiodistal", peckAndPeckResults.mesiodistalDiameters[tooth])
+      + peckAndPeckDiameterTemplate(tooth, "Faciolingual", peckAndPeckResults.faciolingualDiameters[tooth])
+      for tooth in teeth)
+    return peckAndPeckAnalysisTemplate(indices=indices, diameters=diameters)
+
+  @staticmethod
+  def renderUncertaintyAnalysis(uncertainty):
+    landmarkError = uncertainty["landmarkError"]
+    if isinstance(landmarkError, list):
+      landmarkError = "specified for each point"
+    elif uncertainty["errorModel"] == "Uniform":
+      landmarkError = "up to {0:.2f}mm".format(landmarkError)
+    else:
+      landmarkError = "{0:.2f}mm standard deviation".format(landmarkError)
+    thresholds = "".join(uncertaintyThresholdTemplate(title=name.split(".")[-1].capitalize(), **threshold)
+      for name, threshold in uncertainty["thresholds"].items())
+    # Intervals of tooth diameters are only stored in the JSON file
+    intervals = "".join(uncertaintyIntervalTemplate(name, interval["value"], interval["lower"], interval["upper"])
+      for name, interval in uncertainty["intervals"].items() if not name.split(".")[-1].isdigit())
+    return uncertaintyAnalysisTemplate(errorModel=uncertainty["errorModel"], landmarkError=landmarkError,
+      numberOfSamples=uncertainty["numberOfSamples"], thresholds=thresholds,
+      confidence=uncertainty["confidenceLevel"] * 100, intervals=intervals)
+
+  def renderAnalyses(self, results):
+    """
+    Return HTML fragment that contains all computed analyses.
+    """
+    html = ""
+    if results.superior:
+      html += self.renderSpaceAnalysis(results.superior)
+    if results.inferior:
+      html += self.renderSpaceAnalysis(results.inferior)
+    if results.bolton:
+      html += self.renderBoltonAnalysis(results.bolton)
+    if results.peckAndPeck:
+      html += self.renderPeckAndPeckAnalysis(results.peckAndPeck)
+    if results.uncertainty:
+      html += self.renderUncertaintyAnalysis(results.uncertainty)
+    return html
+
+  def render(self, results, screenshotFilename=None):
+    """
+    Return complete HTML document. Screenshot filename is relative to the report file.
+    """
+    screenshot = '<img src="{0}">'.format(screenshotFilename) if screenshotFilename else ""
+    return reportTemplate(self.renderAnalyses(results), screenshot)
+
+  def renderCases(self, results, screenshotFilenames=None):
+    """
+    Return complete HTML document of a list of results (one section per case).
+    screenshotFilenames is a list that contains a screenshot filename (or None) for each case.
+    """
+    if screenshotFilenames is None:
+      screenshotFilenames = [None] * len(results)
+    index = "".join(caseIndexTemplate(caseIndex, html.escape(caseResults.name)) for caseIndex, caseResults in enumerate(results))
+    cases = "".join(caseTemplate(caseIndex, html.escape(caseResults.name), self.renderAnalyses(caseResults),
+      '<img src="{0}">'.format(screenshotFilename) if screenshotFilename else "")
+      for caseIndex, (caseResults, screenshotFilename) in enumerate(zip(results, screenshotFilenames)))
+    return reportTemplate(casesReportTemplate(count=len(results), index=index), cases)
+
+
+class JsonRenderer:
+  """Renders analysis results of one or more cases as JSON."""
+
+  fileExtension = ".json"
+
+  @staticmethod
+  def renderData(results):
+    """
+    Return JSON-serializable data. A list of results is rendered into a list.
+    """
+    if isinstance(results, list):
+      return [caseResults.toDict() for caseResults in results]
+    return results.toDict()
+
+  def render(self, results):
+    return json.dumps(self.renderData(results), indent=2)
+
+
+class CsvRenderer:
+  """Renders analysis results of one or more cases as CSV, one row per case."""
+
+  fileExtension = ".csv"
+
+  def render(self, results):
+    if not isinstance(results, list):
+      results = [results]
+    rows = [caseResults.flatten() for caseResults in results]
+    fieldnames = {}  # ordered set of column names of all rows
+    for row in rows:
+      fieldnames.update(dict.fromkeys(row))
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(fieldnames), lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+renderers = {
+  "html": HtmlRenderer(),
+  "json": JsonRenderer(),
+  "csv": CsvRenderer(),
+  }
+
+
+def getRenderer(reportFormat):
+  try:
+    return renderers[reportFormat.lower()]
+  except KeyError:
+    raise ValueError("Invalid report format: {0}".format(reportFormat))
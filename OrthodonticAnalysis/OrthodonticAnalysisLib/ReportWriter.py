@@ -0,0 +1,235 @@
+import os
+import struct
+import zlib
+
+import numpy as np
+
+
+def encodePng(image, compressionLevel=6):
+  """
+  Encode an image (HxW, HxWx3 or HxWx4 uint8 array, first row is the top of the image) as PNG.
+  Compression is done by zlib, which releases the GIL, so encoding in a background thread
+  does not block the application.
+  """
+  image = np.ascontiguousarray(image, dtype=np.uint8)
+  if image.ndim == 2:
+    image = image[:, :, np.newaxis]
+  height, width, channels = image.shape
+  colorType = {1: 0, 3: 2, 4: 6}[channels]
+
+  # Each row is prefixed by the filter type. "Up" filter (difference from the row above)
+  # makes screenshots with large uniform areas compress well.
+  rows = image.reshape(height, width * channels)
+  scanlines = np.empty((height, 1 + width * channels), dtype=np.uint8)
+  scanlines[:, 0] = 2
+  scanlines[0, 0] = 0
+  scanlines[0, 1:] = rows[0]
+  scanlines[1:, 1:] = rows[1:] - rows[:-1]
+
+  def chunk(chunkType, data):
+    return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data) & 0xffffffff)
+
+  return (b"\x89PNG\r\n\x1a\n"
+    + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, colorType, 0, 0, 0))
+    + chunk(b"IDAT", zlib.compress(scanlines.tobytes(), compressionLevel))
+    + chunk(b"IEND", b""))
+
+
+def downscaleImage(image, maximumSize):
+  """
+  Shrink an image by an integer factor (averaging blocks of pixels) so that
+  its width and height are not larger than maximumSize.
+  """
+  height, width = image.shape[:2]
+  factor = -(-max(height, width) // maximumSize)
+  if factor <= 1:
+    return image
+  height, width = (height // factor) * factor, (width // factor) * factor
+  blocks = image[:height, :width].reshape(height // factor, factor, width // factor, factor, -1)
+  return blocks.mean(axis=(1, 3)).round().astype(np.uint8)
+
+
+def isPillowFormatSupported(imageFormat):
+  try:
+    from PIL import features
+  except ImportError:
+    return False
+  if imageFormat == "WebP":
+    return features.check("webp")
+  return True
+
+
+def isImageFormatSupported(imageFormat):
+  """
+  PNG is always supported, JPEG is supported by Pillow or VTK, WebP requires Pillow.
+  """
+  if imageFormat in ["PNG", "JPEG"]:
+    return True
+  if imageFormat == "WebP":
+    return isPillowFormatSupported(imageFormat)
+  return False
+
+
+class ImageContent:
+  """Image to be written into a file. Downscaling and encoding are done when the file is written
+  (in the report writer thread), the caller only needs to grab the pixels.
+
+  image is an HxWxC uint8 array (first row is the top of the image),
+  imageFormat is "PNG", "JPEG", or "WebP", quality (1-100) is used for lossy formats,
+  image is shrunk to fit maximumSize if it is specified.
+  """
+
+  fileExtensions = {"PNG": ".png", "JPEG": ".jpg", "WebP": ".webp"}
+
+  def __init__(self, image, imageFormat="PNG", quality=90, maximumSize=None):
+    self.image = image
+    self.imageFormat = imageFormat
+    self.quality = quality
+    self.maximumSize = maximumSize
+
+  @property
+  def fileExtension(self):
+    return self.fileExtensions[self.imageFormat]
+
+  def encode(self):
+    image = self.image
+    if self.maximumSize:
+      image = downscaleImage(image, self.maximumSize)
+    if self.imageFormat == "PNG":
+      return encodePng(image)
+    if self.imageFormat not in ["JPEG", "WebP"]:
+      raise ValueError("Invalid image format: {0}".format(self.imageFormat))
+    if image.ndim == 3 and image.shape[2] == 4:
+      # lossy formats are written without alpha channel
+      image = image[:, :, :3]
+    if isPillowFormatSupported(self.imageFormat):
+      import io
+      from PIL import Image
+      output = io.BytesIO()
+      Image.fromarray(np.ascontiguousarray(image)).save(output, format=self.imageFormat, quality=int(self.quality))
+      return output.getvalue()
+    if self.imageFormat == "JPEG":
+      return self.encodeJpegWithVtk(image, self.quality)
+    raise ValueError("Writing {0} images requires Pillow Python package".format(self.imageFormat))
+
+  @staticmethod
+  def encodeJpegWithVtk(image, quality):
+    import vtk
+    from vtk.util.numpy_support import numpy_to_vtk
+    height, width = image.shape[:2]
+    channels = image.shape[2] if image.ndim == 3 else 1
+    imageData = vtk.vtkImageData()
+    imageData.SetDimensions(width, height, 1)
+    # VTK image starts with the bottom row
+    scalars = numpy_to_vtk(np.ascontiguousarray(image[::-1]).reshape(-1, channels), deep=True)
+    imageData.GetPointData().SetScalars(scalars)
+    writer = vtk.vtkJPEGWriter()
+    writer.SetInputData(imageData)
+    writer.SetQuality(int(quality))
+    writer.WriteToMemoryOn()
+    writer.Write()
+    from vtk.util.numpy_support import vtk_to_numpy
+    return vtk_to_numpy(writer.GetResult()).tobytes()
+
+
+def encodeContent(content):
+  """
+  Return content of a file (text, bytes, or image) as bytes. Text is encoded as UTF-8, images as in writeFile.
+  """
+  if isinstance(content, np.ndarray):
+    return encodePng(content)
+  elif isinstance(content, ImageContent):
+    return content.encode()
+  elif isinstance(content, str):
+    return content.encode("utf-8")
+  return content
+
+
+def writeFile(filename, content):
+  """
+  Write text (encoded as UTF-8), bytes, or image (ImageContent or numpy array, saved as PNG) into a file.
+  Content is written into a temporary file first and then renamed, so that
+  a partially written file is never visible (e.g., on network drives).
+  The parent folder is created if it does not exist.
+  """
+  if isinstance(content, np.ndarray):
+    content = encodePng(content)
+  elif isinstance(content, ImageContent):
+    content = content.encode()
+  os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+  temporaryFilename = filename + ".tmp"
+  if isinstance(content, str):
+    with open(temporaryFilename, "w", encoding="utf-8") as file_object:
+      file_object.write(content)
+  else:
+    with open(temporaryFilename, "wb") as file_object:
+      file_object.write(content)
+  os.replace(temporaryFilename, filename)
+
+
+class ReportWriter:
+  """Writes report files in a background thread.
+
+  Files of each submitted report are written in order, and reports are written
+  in the order they were submitted (a single worker thread is used).
+  If a StageTimer is specified then image encoding and file writing times are measured.
+  """
+
+  def __init__(self, stageTimer=None):
+    self._executor = None
+    self.stageTimer = stageTimer
+
+  def submit(self, files, result=None, writtenCallback=None):
+    """
+    Write files in the background. files is a list of (filename, content) pairs,
+    see writeFile for supported content types.
+    If writtenCallback is specified then it is called (in the writer thread) when all files are written.
+    Returns a concurrent.futures.Future, which provides result (list of written filenames by default)
+    when all files are written, or the exception that occurred during writing.
+    """
+    return self._getExecutor().submit(self.writeFiles, files, result, writtenCallback)
+
+  def submitToArchive(self, archive, files, viewFolder, report, addedCallback=None, **reportProperties):
+    """
+    Store report files in a ReportArchive in the background (see addToArchive), in order with other submitted reports.
+    Returns a concurrent.futures.Future, which provides the filename of the extracted report.
+    """
+    return self._getExecutor().submit(self.addToArchive, archive, files, viewFolder, report, addedCallback, **reportProperties)
+
+  def _getExecutor(self):
+    if self._executor is None:
+      from concurrent.futures import ThreadPoolExecutor
+      self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="OrthodonticAnalysisReportWriter")
+    return self._executor
+
+  def writeFiles(self, files, result=None, writtenCallback=None):
+    import contextlib
+    def stage(name):
+      return self.stageTimer.stage(name) if self.stageTimer else contextlib.nullcontext()
+    for filename, content in files:
+      if isinstance(content, (ImageContent, np.ndarray)):
+        with stage("encodeImage"):
+          content = content.encode() if isinstance(content, ImageContent) else encodePng(content)
+      with stage("writeFile"):
+        writeFile(filename, content)
+    if writtenCallback:
+      writtenCallback()
+    return result if result is not None else [filename for filename, content in files]
+
+  def addToArchive(self, archive, files, viewFolder, report, addedCallback=None, **reportProperties):
+    """
+    Store files of a report in a ReportArchive (see ReportArchive.addReport) and extract the report into viewFolder.
+    If addedCallback is specified then it is called with the manifest entry when the report is stored (before it is extracted).
+    Returns the filename of the extracted report.
+    """
+    import contextlib
+    with self.stageTimer.stage("archive") if self.stageTimer else contextlib.nullcontext():
+      entry = archive.addReport(files, report, **reportProperties)
+      if addedCallback:
+        addedCallback(entry)
+      return archive.extractReport(entry, viewFolder)
+
+  def shutdown(self, wait=True):
+    if self._executor is not None:
+      self._executor.shutdown(wait=wait)
+      self._executor = None
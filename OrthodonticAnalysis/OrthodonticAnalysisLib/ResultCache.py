@@ -0,0 +1,129 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from OrthodonticAnalysisLib.AnalysisResults import AnalysisResults
+
+
+def getCacheKey(analysisType, points, options=None):
+  """
+  Return cache key of an analysis: hash of the analysis type and control point positions
+  (array returned by slicer.util.arrayFromMarkupsControlPoints).
+  Other settings that affect the generated report (such as screenshot capture settings)
+  can be specified in the options dict.
+  """
+  points = np.ascontiguousarray(points, dtype=np.float64)
+  digest = hashlib.sha256()
+  digest.update(analysisType.encode())
+  if options:
+    digest.update(json.dumps(options, sort_keys=True).encode())
+  digest.update(str(points.shape).encode())
+  digest.update(points.tobytes())
+  return digest.hexdigest()
+
+
+class ResultCache:
+  """Two-level cache of analysis results and generated reports.
+
+  The first level is an in-memory LRU cache, limited by the total size of the stored entries.
+  The second level is stored in the report folder (one small JSON file per entry in cacheFolderName),
+  so that reports can be reused after the application is restarted.
+  Entries are only valid while the report file that they refer to exists.
+
+  Entries are added from the report writer thread, therefore access to the in-memory cache is synchronized.
+  """
+
+  cacheFolderName = ".OrthodonticAnalysisCache"
+
+  def __init__(self, maximumSize=16*1024*1024):
+    self.maximumSize = maximumSize  # bytes
+    self.size = 0
+    self._entries = collections.OrderedDict()  # (report folder, key) -> (AnalysisResults, report filename, size)
+    self._lock = threading.Lock()
+
+  def getCacheFilename(self, reportFolder, key):
+    return os.path.join(reportFolder, self.cacheFolderName, key + ".json")
+
+  def get(self, reportFolder, key):
+    """
+    Return (AnalysisResults, report filename) of a previously generated report or None if not found.
+    """
+    with self._lock:
+      entry = self._entries.get((reportFolder, key))
+      if entry is not None:
+        self._entries.move_to_end((reportFolder, key))
+    if entry is None:
+      entry = self._readEntry(reportFolder, key)
+      if entry is None:
+        return None
+      self._addEntry(reportFolder, key, *entry)
+    results, reportFilename = entry[:2]
+    if not os.path.exists(reportFilename):
+      self.remove(reportFolder, key)
+      return None
+    return results, reportFilename
+
+  def getEntryContent(self, reportFolder, results, reportFilename):
+    """
+    Return content of the cache file of an entry. The report filename is stored relative to the
+    report folder, so that the folder can be moved.
+    """
+    return json.dumps({
+      "reportFilename": os.path.relpath(reportFilename, reportFolder),
+      "results": results.toDict(),
+      })
+
+  def add(self, reportFolder, key, results, reportFilename):
+    """
+    Add an entry to the in-memory cache. The cache file (see getEntryContent) is expected to be
+    written by the caller, along with the report files.
+    """
+    self._addEntry(reportFolder, key, results, reportFilename)
+
+  def remove(self, reportFolder, key):
+    with self._lock:
+      entry = self._entries.pop((reportFolder, key), None)
+      if entry is not None:
+        self.size -= entry[2]
+    try:
+      os.remove(self.getCacheFilename(reportFolder, key))
+    except OSError:
+      pass
+
+  def clear(self):
+    """
+    Clear the in-memory cache. Cache files in report folders are kept.
+    """
+    with self._lock:
+      self._entries.clear()
+      self.size = 0
+
+  def _addEntry(self, reportFolder, key, results, reportFilename, size=None):
+    if size is None:
+      size = len(self.getEntryContent(reportFolder, results, reportFilename))
+    with self._lock:
+      oldEntry = self._entries.pop((reportFolder, key), None)
+      if oldEntry is not None:
+        self.size -= oldEntry[2]
+      self._entries[(reportFolder, key)] = (results, reportFilename, size)
+      self.size += size
+      # Evict least recently used entries
+      while self.size > self.maximumSize and len(self._entries) > 1:
+        evictedKey, evictedEntry = self._entries.popitem(last=False)
+        self.size -= evictedEntry[2]
+
+  def _readEntry(self, reportFolder, key):
+    cacheFilename = self.getCacheFilename(reportFolder, key)
+    try:
+      with open(cacheFilename) as file_object:
+        content = file_object.read()
+      data = json.loads(content)
+      results = AnalysisResults.fromDict(data["results"])
+      reportFilename = os.path.join(reportFolder, data["reportFilename"])
+    except (OSError, ValueError, KeyError, TypeError):
+      return None
+    return results, reportFilename, len(content)
@@ -0,0 +1,220 @@
+import calendar
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+#
+# Append-only columnar store of analysis results
+#
+# Each result (such as "bolton.total.ratio" or "superior.diameters.16", see AnalysisResults.flatten) is stored
+# in a separate NumPy .npy file, one row per case, so that cohort queries read contiguous arrays (memory mapped)
+# instead of opening a report file per case. Results that were not computed for a case are NaN.
+#
+# Key columns:
+#   caseName: index into caseName.txt (one JSON-encoded name per line)
+#   analysisType: index into AnalysisPoints.analysisTypes
+#   time: computation time (seconds since epoch, UTC)
+#
+# Appending a row only appends a few bytes to each column file and rewrites its fixed-size header.
+# The number of valid rows is stored in store.json, which is written last, therefore rows of an interrupted
+# append are ignored (and overwritten by the next append). Only one process may write a store at a time.
+#
+
+headerLength = 128
+keyColumns = {"caseName": np.int32, "analysisType": np.int8, "time": np.float64}
+
+
+def writeNpyHeader(file_object, dtype, shape):
+  """
+  Write .npy header at the beginning of a file. Header is padded to a fixed size (headerLength),
+  so that it can be updated in place when rows are appended to the array.
+  """
+  header = "{{'descr': {0!r}, 'fortran_order': False, 'shape': {1!r}, }}".format(
+    np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(shape))
+  header = header.ljust(headerLength - 11) + "\n"
+  file_object.seek(0)
+  file_object.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+
+def parseTimestamp(timestamp):
+  """
+  Return seconds since epoch of a report timestamp (YYYYmmdd-HHMMSS, UTC), or NaN if it is empty or invalid.
+  """
+  try:
+    return float(calendar.timegm(time.strptime(timestamp, "%Y%m%d-%H%M%S")))
+  except (TypeError, ValueError):
+    return float("nan")
+
+
+class ResultStore:
+  """Append-only columnar store of analysis results in a folder.
+
+  Example:
+
+    store = ResultStore("/path/to/reports/OrthodonticAnalysisResults")
+    store.appendResults(results)
+    ratios = store.getColumn("bolton.total.ratio")
+    names = store.getCaseNames()
+  """
+
+  folderName = "OrthodonticAnalysisResults"
+  manifestFilename = "store.json"
+  caseNamesFilename = "caseName.txt"
+
+  def __init__(self, folder):
+    self.folder = folder
+    self.numberOfRows = 0
+    self.columns = {}  # column name -> dtype string
+    self._caseNames = None  # list of case names
+    self._caseNameCodes = None  # case name -> index
+    manifestPath = os.path.join(folder, self.manifestFilename)
+    if os.path.exists(manifestPath):
+      with open(manifestPath) as file_object:
+        manifest = json.load(file_object)
+      self.numberOfRows = manifest["numberOfRows"]
+      self.columns = manifest["columns"]
+
+  @property
+  def columnNames(self):
+    """
+    Names of result columns (key columns are not included).
+    """
+    return [name for name in self.columns if name not in keyColumns]
+
+  def getColumnFilename(self, name):
+    return os.path.join(self.folder, name + ".npy")
+
+  def _appendColumn(self, name, values):
+    dtype = np.dtype(self.columns[name])
+    filename = self.getColumnFilename(name)
+    if not os.path.exists(filename):
+      # New column, previous rows are filled with NaN
+      with open(filename, "wb") as file_object:
+        writeNpyHeader(file_object, dtype, (0,))
+        file_object.write(np.full(self.numberOfRows, np.nan, dtype).tobytes())
+    with open(filename, "r+b") as file_object:
+      # Remove rows of an interrupted append
+      file_object.truncate(headerLength + self.numberOfRows * dtype.itemsize)
+      file_object.seek(0, os.SEEK_END)
+      file_object.write(np.asarray(values, dtype).tobytes())
+      writeNpyHeader(file_object, dtype, (self.numberOfRows + len(values),))
+
+  def _loadCaseNames(self):
+    if self._caseNames is None:
+      self._caseNames = []
+      caseNamesPath = os.path.join(self.folder, self.caseNamesFilename)
+      if os.path.exists(caseNamesPath):
+        with open(caseNamesPath, encoding="utf-8") as file_object:
+          self._caseNames = [json.loads(line) for line in file_object if line.strip()]
+      self._caseNameCodes = {name: index for index, name in enumerate(self._caseNames)}
+    return self._caseNames
+
+  def _getCaseNameCodes(self, caseNames):
+    """
+    Return index of each case name, new names are added to the case name list.
+    """
+    self._loadCaseNames()
+    newNames = []
+    for name in caseNames:
+      if name not in self._caseNameCodes:
+        self._caseNameCodes[name] = len(self._caseNames)
+        self._caseNames.append(name)
+        newNames.append(name)
+    if newNames:
+      with open(os.path.join(self.folder, self.caseNamesFilename), "a", encoding="utf-8") as file_object:
+        file_object.writelines(json.dumps(name) + "\n" for name in newNames)
+    return [self._caseNameCodes[name] for name in caseNames]
+
+  def _writeManifest(self):
+    manifestPath = os.path.join(self.folder, self.manifestFilename)
+    with open(manifestPath + ".tmp", "w") as file_object:
+      json.dump({"numberOfRows": self.numberOfRows, "columns": self.columns}, file_object, indent=2)
+    os.replace(manifestPath + ".tmp", manifestPath)
+
+  def append(self, columns, caseNames, analysisType, times):
+    """
+    Append rows of results. columns is a dict that maps column name to values (one per case),
+    caseNames is a list of case names, times is a list of times (seconds since epoch).
+    """
+    from OrthodonticAnalysisLib.AnalysisPoints import analysisTypes
+    numberOfNewRows = len(caseNames)
+    if numberOfNewRows == 0:
+      return
+    os.makedirs(self.folder, exist_ok=True)
+    for name in keyColumns:
+      self.columns.setdefault(name, np.dtype(keyColumns[name]).str)
+    for name in columns:
+      self.columns.setdefault(name, np.dtype(np.float64).str)
+
+    self._appendColumn("caseName", self._getCaseNameCodes(caseNames))
+    self._appendColumn("analysisType", np.full(numberOfNewRows, analysisTypes.index(analysisType)))
+    self._appendColumn("time", np.broadcast_to(np.asarray(times, dtype=np.float64), (numberOfNewRows,)))
+    for name in self.columnNames:
+      values = columns.get(name)
+      self._appendColumn(name, np.full(numberOfNewRows, np.nan) if values is None else values)
+
+    self.numberOfRows += numberOfNewRows
+    self._writeManifest()
+
+  def appendEngineResults(self, analysisType, engineResults, caseNames, timestamp=""):
+    """
+    Append results of AnalysisEngine.compute (one row per case).
+    """
+    from OrthodonticAnalysisLib.CohortStatistics import flattenEngineResults
+    self.append(flattenEngineResults(engineResults), caseNames, analysisType, parseTimestamp(timestamp))
+
+  def appendResults(self, results):
+    """
+    Append AnalysisResults of a case or list of cases (all of the same analysis type).
+    Confidence intervals of uncertainty analysis are not stored (they would add several columns per result).
+    """
+    if not isinstance(results, list):
+      results = [results]
+    if not results:
+      return
+    columns = {}
+    for rowIndex, caseResults in enumerate(results):
+      for name, value in caseResults.flatten().items():
+        if isinstance(value, float) and not name.startswith("uncertainty."):
+          columns.setdefault(name, np.full(len(results), np.nan))[rowIndex] = value
+    self.append(columns, [caseResults.name for caseResults in results], results[0].analysisType,
+      [parseTimestamp(caseResults.timestamp) for caseResults in results])
+
+  def getColumn(self, name):
+    """
+    Return values of a column (read-only memory-mapped array, one value per row).
+    """
+    if name not in self.columns:
+      raise KeyError("Column {0} is not found in result store {1}".format(name, self.folder))
+    if self.numberOfRows == 0:
+      return np.empty(0, np.dtype(self.columns[name]))
+    return np.load(self.getColumnFilename(name), mmap_mode="r")[:self.numberOfRows]
+
+  def getColumns(self, names=None):
+    """
+    Return dict that maps column name to values (all result columns if names are not specified).
+    """
+    return {name: self.getColumn(name) for name in (self.columnNames if names is None else names)}
+
+  def getCaseNames(self):
+    """
+    Return case name of each row (array of strings).
+    """
+    caseNames = np.array(self._loadCaseNames() or [""], dtype=object)
+    return caseNames[self.getColumn("caseName")] if "caseName" in self.columns else np.empty(0, dtype=object)
+
+  def getAnalysisTypes(self):
+    """
+    Return analysis type of each row (array of strings).
+    """
+    from OrthodonticAnalysisLib.AnalysisPoints import analysisTypes
+    return np.array(analysisTypes, dtype=object)[self.getColumn("analysisType")] if "analysisType" in self.columns else np.empty(0, dtype=object)
+
+  def getTimes(self):
+    """
+    Return computation time of each row (seconds since epoch).
+    """
+    return self.getColumn("time") if "time" in self.columns else np.empty(0)
@@ -0,0 +1,111 @@
+import contextlib
+import io
+import logging
+import threading
+import time
+
+
+class StageTimer:
+  """Measures wall time and number of calls of named processing stages.
+
+  Measurements are accumulated until reset() is called, and each measurement is logged
+  on the "OrthodonticAnalysis.timing" logger at DEBUG level.
+  Stages can be measured from any thread (e.g., the report writer thread). Stages can be nested,
+  each stage is measured separately (the time of a stage includes the time of its nested stages).
+
+  If profiling is enabled then outermost stages of the main thread are also run under cProfile
+  and accumulated statistics are available from getProfileStats().
+  """
+
+  loggerName = "OrthodonticAnalysis.timing"
+
+  def __init__(self):
+    self.logger = logging.getLogger(self.loggerName)
+    self.profile = None
+    self._lock = threading.Lock()
+    self._local = threading.local()
+    self.reset()
+
+  def reset(self):
+    """
+    Clear all measurements and profiling statistics.
+    """
+    with self._lock:
+      self.callCounts = {}
+      self.totalTimes = {}
+      self.lastTimes = {}
+    if self.profile is not None:
+      self.setProfilingEnabled(False)
+      self.setProfilingEnabled(True)
+
+  @property
+  def profilingEnabled(self):
+    return self.profile is not None
+
+  def setProfilingEnabled(self, enabled):
+    if enabled and self.profile is None:
+      import cProfile
+      self.profile = cProfile.Profile()
+    elif not enabled:
+      self.profile = None
+
+  @contextlib.contextmanager
+  def stage(self, name):
+    """
+    Context manager that measures the time of a stage:
+
+      with timer.stage("capture"):
+        ...
+    """
+    depth = getattr(self._local, "depth", 0)
+    profile = self.profile if (depth == 0 and threading.current_thread() is threading.main_thread()) else None
+    self._local.depth = depth + 1
+    if profile is not None:
+      profile.enable()
+    startTime = time.perf_counter()
+    try:
+      yield
+    finally:
+      elapsedTime = time.perf_counter() - startTime
+      if profile is not None:
+        profile.disable()
+      self._local.depth = depth
+      self.addTime(name, elapsedTime)
+
+  def addTime(self, name, elapsedTime):
+    with self._lock:
+      self.callCounts[name] = self.callCounts.get(name, 0) + 1
+      self.totalTimes[name] = self.totalTimes.get(name, 0.0) + elapsedTime
+      self.lastTimes[name] = elapsedTime
+    self.logger.debug("{0}: {1:.3f}ms".format(name, elapsedTime * 1000.0))
+
+  def getSummary(self):
+    """
+    Return dict that maps stage name to number of calls, total time and time of the last call (in seconds).
+    """
+    with self._lock:
+      return {name: {"calls": self.callCounts[name], "total": self.totalTimes[name], "last": self.lastTimes[name]}
+        for name in self.callCounts}
+
+  def formatSummary(self):
+    lines = ["{0:<30} {1:>8} {2:>12} {3:>12} {4:>12}".format("Stage", "Calls", "Total (ms)", "Mean (ms)", "Last (ms)")]
+    for name, timing in sorted(self.getSummary().items(), key=lambda item: -item[1]["total"]):
+      lines.append("{0:<30} {1:>8} {2:>12.3f} {3:>12.3f} {4:>12.3f}".format(name, timing["calls"],
+        timing["total"] * 1000.0, timing["total"] / timing["calls"] * 1000.0, timing["last"] * 1000.0))
+    return "\n".join(lines)
+
+  def getProfileStats(self, sortBy="cumulative", limit=30):
+    """
+    Return profiling statistics as text (empty string if profiling is not enabled or no stages have been profiled).
+    """
+    if self.profile is None:
+      return ""
+    import pstats
+    output = io.StringIO()
+    try:
+      stats = pstats.Stats(self.profile, stream=output)
+    except TypeError:
+      # No profiling data has been collected yet
+      return ""
+    stats.sort_stats(sortBy).print_stats(limit)
+    return output.getvalue()
@@ -0,0 +1,167 @@
+import numpy as np
+
+#
+# Snapping landmarks to a surface mesh
+#
+# Spatial search structures (locators) are built once per mesh and reused until the mesh is modified,
+# so that snapping a point only costs a few tree lookups, even on meshes with millions of triangles.
+#
+
+snapModes = ["None", "Surface", "Extremum"]
+
+
+class SurfaceLocator:
+  """Spatial search structures of a surface mesh (vtkPolyData).
+
+  Static locators are used, which are fast to build and query (they are not incrementally
+  updatable, but the mesh is not expected to change while landmarks are placed).
+  Locators are built on first use.
+  """
+
+  def __init__(self, polyData):
+    self.polyData = polyData
+    self.meshModifiedTime = polyData.GetMTime()
+    self._cellLocator = None
+    self._pointLocator = None
+
+  def isValid(self, polyData):
+    """
+    Returns True if the locator can be used for the mesh (it is the same mesh and it has not been modified).
+    """
+    return (polyData is self.polyData) and (polyData.GetMTime() == self.meshModifiedTime)
+
+  @property
+  def cellLocator(self):
+    if self._cellLocator is None:
+      import vtk
+      self._cellLocator = vtk.vtkStaticCellLocator()
+      self._cellLocator.SetDataSet(self.polyData)
+      self._cellLocator.BuildLocator()
+      # Building cells may update the modified time of the mesh
+      self.meshModifiedTime = self.polyData.GetMTime()
+    return self._cellLocator
+
+  @property
+  def pointLocator(self):
+    if self._pointLocator is None:
+      import vtk
+      self._pointLocator = vtk.vtkStaticPointLocator()
+      self._pointLocator.SetDataSet(self.polyData)
+      self._pointLocator.BuildLocator()
+      self.meshModifiedTime = self.polyData.GetMTime()
+    return self._pointLocator
+
+  @property
+  def points(self):
+    """
+    Mesh point positions as an Nx3 array (shares memory with the mesh).
+    """
+    from vtk.util.numpy_support import vtk_to_numpy
+    return vtk_to_numpy(self.polyData.GetPoints().GetData())
+
+  def findClosestPoint(self, position):
+    """
+    Return closest point on the surface and the ID of the cell that contains it.
+    """
+    import vtk
+    closestPoint = [0.0, 0.0, 0.0]
+    cellId = vtk.reference(0)
+    subId = vtk.reference(0)
+    squaredDistance = vtk.reference(0.0)
+    self.cellLocator.FindClosestPoint(position, closestPoint, cellId, subId, squaredDistance)
+    return np.array(closestPoint), int(cellId)
+
+  def findClosestPoints(self, positions):
+    """
+    Return closest points on the surface (Nx3 array) of a list of positions.
+    """
+    import vtk
+    cellLocator = self.cellLocator
+    closestPoints = np.zeros((len(positions), 3))
+    closestPoint = [0.0, 0.0, 0.0]
+    cellId = vtk.reference(0)
+    subId = vtk.reference(0)
+    squaredDistance = vtk.reference(0.0)
+    for index, position in enumerate(positions):
+      cellLocator.FindClosestPoint(position, closestPoint, cellId, subId, squaredDistance)
+      closestPoints[index] = closestPoint
+    return closestPoints
+
+  def getCellNormal(self, cellId):
+    """
+    Return unit normal vector of a polygon cell (oriented by the point order of the cell).
+    """
+    import vtk
+    pointIds = vtk.vtkIdList()
+    self.polyData.GetCellPoints(cellId, pointIds)
+    cellPoints = self.points[[pointIds.GetId(index) for index in range(pointIds.GetNumberOfIds())]]
+    normal = np.cross(cellPoints[1] - cellPoints[0], cellPoints[2] - cellPoints[0])
+    length = np.linalg.norm(normal)
+    return normal / length if length > 0 else normal
+
+  def snapToSurface(self, position):
+    """
+    Return closest point on the surface.
+    """
+    closestPoint, cellId = self.findClosestPoint(position)
+    return closestPoint
+
+  def snapToExtremum(self, position, radius):
+    """
+    Return the mesh point that protrudes the most from the surface within radius around the closest
+    surface point, such as a cusp tip or the most convex point of a contact area.
+    Protrusion is measured along the normal of the plane fitted to the surface points in the neighborhood
+    (oriented as the surface at the closest point).
+    """
+    import vtk
+    closestPoint, cellId = self.findClosestPoint(position)
+    pointIds = vtk.vtkIdList()
+    self.pointLocator.FindPointsWithinRadius(radius, closestPoint, pointIds)
+    if pointIds.GetNumberOfIds() < 3:
+      return closestPoint
+    neighborPoints = self.points[[pointIds.GetId(index) for index in range(pointIds.GetNumberOfIds())]]
+    # Plane normal is the direction of the smallest variance of the points
+    eigenvalues, eigenvectors = np.linalg.eigh(np.cov(neighborPoints, rowvar=False))
+    normal = eigenvectors[:, 0]
+    if normal.dot(self.getCellNormal(cellId)) < 0:
+      normal = -normal
+    heights = (neighborPoints - closestPoint).dot(normal)
+    highestIndex = np.argmax(heights)
+    if heights[highestIndex] <= 0:
+      return closestPoint
+    return neighborPoints[highestIndex]
+
+  def snap(self, position, snapMode, radius=1.0):
+    if snapMode == "Surface":
+      return self.snapToSurface(position)
+    elif snapMode == "Extremum":
+      return self.snapToExtremum(position, radius)
+    elif snapMode == "None":
+      return np.array(position)
+    raise ValueError("Invalid snap mode: {0}".format(snapMode))
+
+
+class SurfaceLocatorCache:
+  """Keeps a SurfaceLocator for each model node.
+
+  A locator is rebuilt only if the mesh of the model node is replaced or modified.
+  """
+
+  def __init__(self):
+    self._locators = {}  # model node ID -> SurfaceLocator
+
+  def getLocator(self, modelNode):
+    polyData = modelNode.GetPolyData()
+    if polyData is None or polyData.GetNumberOfPoints() == 0:
+      raise ValueError("Model {0} does not contain a surface mesh".format(modelNode.GetName()))
+    locator = self._locators.get(modelNode.GetID())
+    if locator is None or not locator.isValid(polyData):
+      locator = SurfaceLocator(polyData)
+      self._locators[modelNode.GetID()] = locator
+    return locator
+
+  def remove(self, modelNodeID):
+    self._locators.pop(modelNodeID, None)
+
+  def clear(self):
+    self._locators.clear()
@@ -0,0 +1,161 @@
+import numpy as np
+
+#
+# Registration of a landmark template to a surface mesh
+#
+# Template landmarks are aligned to the surface with iterative closest point (ICP) registration:
+# in each iteration the closest surface point of each landmark is found (using the spatial search structures
+# of a SurfaceLocator) and the transform that best maps the landmarks to these points is computed in closed form.
+# As only the landmarks (not the template surface) are matched, an iteration costs a few dozen locator queries.
+#
+
+transformTypes = ["Rigid", "Similarity", "Affine"]
+
+
+def fitTransform(sourcePoints, targetPoints, transformType="Rigid"):
+  """
+  Return 4x4 homogeneous transform matrix that maps sourcePoints to targetPoints (Kx3 arrays) with minimum
+  squared error. Rigid and similarity transforms are computed with the method of Umeyama (1991).
+  """
+  if transformType not in transformTypes:
+    raise ValueError("Invalid transform type: {0}".format(transformType))
+  matrix = np.eye(4)
+  sourceCenter = sourcePoints.mean(axis=0)
+  targetCenter = targetPoints.mean(axis=0)
+  centeredSource = sourcePoints - sourceCenter
+  centeredTarget = targetPoints - targetCenter
+  if transformType == "Affine":
+    linear, residuals, rank, singularValues = np.linalg.lstsq(centeredSource, centeredTarget, rcond=None)
+    matrix[:3, :3] = linear.T
+  else:
+    u, s, vt = np.linalg.svd(centeredTarget.T.dot(centeredSource))
+    # Prevent reflection
+    d = np.ones(3)
+    if np.linalg.det(u) * np.linalg.det(vt) < 0:
+      d[2] = -1.0
+    rotation = (u * d).dot(vt)
+    scale = 1.0
+    if transformType == "Similarity":
+      scale = (s * d).sum() / (centeredSource ** 2).sum()
+    matrix[:3, :3] = scale * rotation
+  matrix[:3, 3] = targetCenter - matrix[:3, :3].dot(sourceCenter)
+  return matrix
+
+
+def applyTransform(matrix, points):
+  """
+  Transform points (Kx3 array) by a 4x4 homogeneous transform matrix.
+  """
+  return points.dot(matrix[:3, :3].T) + matrix[:3, 3]
+
+
+def getInitialTransforms(templatePoints, surfacePoints):
+  """
+  Return candidate initial transforms (list of 4x4 matrices) that align the template to the surface.
+  The centroids are always aligned. The first candidate keeps the orientation of the template (it is the best
+  if the template and the surface are in the same anatomical coordinate system), the others align the principal
+  axes (all four orientations without reflection are tried, as the sign of the axes is ambiguous).
+  """
+  templateCenter = templatePoints.mean(axis=0)
+  surfaceCenter = surfacePoints.mean(axis=0)
+
+  def getPrincipalAxes(points):
+    eigenvalues, eigenvectors = np.linalg.eigh(np.cov(points, rowvar=False))
+    axes = eigenvectors[:, ::-1]  # largest variance first
+    if np.linalg.det(axes) < 0:
+      axes[:, 2] = -axes[:, 2]
+    return axes
+
+  templateAxes = getPrincipalAxes(templatePoints)
+  surfaceAxes = getPrincipalAxes(surfacePoints)
+  rotations = [np.eye(3)]
+  for signs in [[1, 1, 1], [-1, -1, 1], [-1, 1, -1], [1, -1, -1]]:
+    rotations.append((surfaceAxes * signs).dot(templateAxes.T))
+
+  initialTransforms = []
+  for rotation in rotations:
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation
+    matrix[:3, 3] = surfaceCenter - rotation.dot(templateCenter)
+    initialTransforms.append(matrix)
+  return initialTransforms
+
+
+def registerToSurface(templatePoints, locator, initialTransform, transformType="Rigid",
+  maximumNumberOfIterations=50, tolerance=1e-4, outlierFactor=3.0):
+  """
+  Register template points (Kx3 array) by ICP to the surface of a SurfaceLocator (or to the points of
+  a PointCloudLocator), starting from initialTransform.
+  Landmarks that are farther than outlierFactor times the median distance from the surface are ignored in each
+  iteration. Affine registration starts with similarity transforms, to not get trapped in a degenerate solution.
+  Returns the transform (4x4 matrix) and the root mean square distance of the landmarks from the surface.
+  """
+  matrix = initialTransform
+  stages = ["Similarity", "Affine"] if transformType == "Affine" else [transformType]
+  for stageTransformType in stages:
+    previousError = None
+    for iteration in range(maximumNumberOfIterations):
+      transformedPoints = applyTransform(matrix, templatePoints)
+      closestPoints = locator.findClosestPoints(transformedPoints)
+      distances = np.linalg.norm(closestPoints - transformedPoints, axis=1)
+      error = np.sqrt((distances ** 2).mean())
+      if previousError is not None and previousError - error < tolerance:
+        break
+      previousError = error
+      inliers = distances <= max(outlierFactor * np.median(distances), 1e-6)
+      if inliers.sum() < 4:
+        inliers[:] = True
+      # Incremental transform is computed from the current (transformed) positions
+      matrix = fitTransform(transformedPoints[inliers], closestPoints[inliers], stageTransformType).dot(matrix)
+  transformedPoints = applyTransform(matrix, templatePoints)
+  error = np.sqrt(((locator.findClosestPoints(transformedPoints) - transformedPoints) ** 2).sum(axis=1).mean())
+  return matrix, error
+
+
+class PointCloudLocator:
+  """Closest point search in a point set (Kx3 array), using a k-d tree.
+
+  Used for coarse registration to a sample of the surface points, because closest surface point queries are
+  slow far from the surface of a large mesh, which is often the case before the template is aligned.
+  """
+
+  def __init__(self, points):
+    import vtk
+    from vtk.util.numpy_support import numpy_to_vtk
+    self.points = np.ascontiguousarray(points, dtype=float)
+    vtkPoints = vtk.vtkPoints()
+    vtkPoints.SetData(numpy_to_vtk(self.points))
+    polyData = vtk.vtkPolyData()
+    polyData.SetPoints(vtkPoints)
+    self.kdTree = vtk.vtkKdTreePointLocator()
+    self.kdTree.SetDataSet(polyData)
+    self.kdTree.BuildLocator()
+
+  def findClosestPoints(self, positions):
+    return self.points[[self.kdTree.FindClosestPoint(position) for position in positions]]
+
+
+def placeTemplate(templatePoints, locator, transformType="Rigid", registrationPoints=None, sampleSize=20000):
+  """
+  Register a landmark template to the surface of a SurfaceLocator and return the template points projected
+  onto the surface (Kx3 array) and the root mean square registration error.
+  If registrationPoints (Mx3 array, in the template coordinate system) are specified then they are used for
+  the registration instead of templatePoints (e.g., only those landmarks that are exactly on the template surface).
+
+  Each initial transform (see getInitialTransforms) is refined by rigid registration to a sample of sampleSize
+  surface points and the best one is then registered to the full-resolution surface.
+  """
+  if registrationPoints is None:
+    registrationPoints = templatePoints
+  surfacePoints = locator.points
+  if len(surfacePoints) > sampleSize:
+    surfacePoints = surfacePoints[::len(surfacePoints) // sampleSize]
+  sampleLocator = PointCloudLocator(surfacePoints)
+  bestMatrix, bestError = None, None
+  for initialTransform in getInitialTransforms(registrationPoints, surfacePoints):
+    # Candidates are compared after rigid registration, it is much more robust than the other transform types
+    matrix, error = registerToSurface(registrationPoints, sampleLocator, initialTransform, "Rigid", maximumNumberOfIterations=20)
+    if bestError is None or error < bestError:
+      bestMatrix, bestError = matrix, error
+  bestMatrix, bestError = registerToSurface(registrationPoints, locator, bestMatrix, transformType)
+  return locator.findClosestPoints(applyTransform(bestMatrix, templatePoints)), bestError
@@ -0,0 +1,91 @@
+import numpy as np
+
+#
+# Sensitivity of analysis results to landmark placement error
+#
+# Landmarks of a case are randomly perturbed many times according to an error model and all perturbed copies
+# are evaluated by the AnalysisEngine in a few vectorized passes (as if they were a stack of patients).
+# Confidence intervals are percentiles of the results of the perturbed copies.
+#
+
+errorModels = ["Gaussian", "Uniform"]
+
+
+def perturbLandmarks(points, numberOfSamples, landmarkError, errorModel="Gaussian", rng=None):
+  """
+  Return numberOfSamples randomly perturbed copies of points (Kx3 array) as an MxKx3 array.
+  landmarkError (mm) is a scalar or it can be specified for each point (K-element array) or each point and axis (Kx3 array).
+  Gaussian: landmarkError is the standard deviation of the error along each axis.
+  Uniform: points are displaced uniformly within a sphere of landmarkError radius.
+  """
+  if rng is None:
+    rng = np.random.default_rng()
+  points = np.asarray(points, dtype=float)
+  landmarkError = np.asarray(landmarkError, dtype=float)
+  if landmarkError.ndim == 1:
+    landmarkError = landmarkError[:, np.newaxis]
+  shape = (numberOfSamples,) + points.shape
+  if errorModel == "Gaussian":
+    offsets = rng.standard_normal(shape)
+  elif errorModel == "Uniform":
+    offsets = rng.standard_normal(shape)
+    offsets *= (rng.random(shape[:-1] + (1,)) ** (1.0 / 3.0)) / np.linalg.norm(offsets, axis=-1, keepdims=True)
+  else:
+    raise ValueError("Invalid landmark error model: {0}".format(errorModel))
+  offsets *= landmarkError
+  offsets += points
+  return offsets
+
+
+def computeUncertainty(analysisType, points, pointNames=None, landmarkError=0.3, errorModel="Gaussian",
+  numberOfSamples=2000, confidenceLevel=0.95, seed=0, batchSize=10000):
+  """
+  Compute confidence intervals of the results of an analysis of a single case.
+  points is a Kx3 array, containing points in the order of pointNames (point list of the analysis type by default).
+  Perturbed copies of the landmarks (see perturbLandmarks) are computed in batches of batchSize copies.
+  The random generator is initialized by seed, so that the same inputs always give the same report.
+
+  Returns a JSON-serializable dict that contains the error model settings, "intervals" (maps result name, as in
+  AnalysisResults.flatten, to the unperturbed value and mean, standard deviation, lower and upper bound of the
+  perturbed results) and "thresholds" (for each Bolton ratio, the probability that the ratio is above the ideal ratio
+  and the probability that it is on the other side of the ideal ratio than the unperturbed ratio).
+  """
+  from OrthodonticAnalysisLib.AnalysisDefinitions import boltonRatio12, boltonRatio6
+  from OrthodonticAnalysisLib.AnalysisEngine import computeAnalysis
+  from OrthodonticAnalysisLib.CohortStatistics import flattenEngineResults
+  points = np.asarray(points, dtype=float)
+  rng = np.random.default_rng(seed)
+
+  values = flattenEngineResults(computeAnalysis(analysisType, points[np.newaxis], pointNames))
+  sampleValues = {name: [] for name in values}
+  for batchStart in range(0, numberOfSamples, batchSize):
+    samples = perturbLandmarks(points, min(batchSize, numberOfSamples - batchStart), landmarkError, errorModel, rng)
+    for name, batchValues in flattenEngineResults(computeAnalysis(analysisType, samples, pointNames)).items():
+      sampleValues[name].append(batchValues)
+  names = list(values)
+  sampleValues = np.array([np.concatenate(sampleValues[name]) for name in names])
+
+  lower, upper = np.percentile(sampleValues, [50.0 * (1.0 - confidenceLevel), 50.0 * (1.0 + confidenceLevel)], axis=1)
+  means = sampleValues.mean(axis=1)
+  standardDeviations = sampleValues.std(axis=1, ddof=1) if numberOfSamples > 1 else np.zeros(len(names))
+  intervals = {}
+  for index, name in enumerate(names):
+    intervals[name] = {"value": float(values[name][0]), "mean": float(means[index]),
+      "standardDeviation": float(standardDeviations[index]), "lower": float(lower[index]), "upper": float(upper[index])}
+
+  thresholds = {}
+  for name, idealRatio in [("bolton.total", boltonRatio12), ("bolton.anterior", boltonRatio6)]:
+    if name + ".ratio" not in values:
+      continue
+    above = sampleValues[names.index(name + ".ratio")] > idealRatio
+    thresholds[name] = {"idealRatio": idealRatio, "probabilityAbove": float(above.mean()),
+      "crossingProbability": float((above != (values[name + ".ratio"][0] > idealRatio)).mean())}
+
+  return {
+    "errorModel": errorModel,
+    "landmarkError": np.asarray(landmarkError, dtype=float).tolist(),
+    "numberOfSamples": numberOfSamples,
+    "confidenceLevel": confidenceLevel,
+    "intervals": intervals,
+    "thresholds": thresholds,
+    }
@@ -0,0 +1,165 @@
+"""
+Performance benchmarks of the OrthodonticAnalysis module on synthetic cohorts.
+
+Cohorts are generated by perturbing the reference landmarks (see OrthodonticAnalysisLib.ReferenceLandmarks).
+Measured times are compared to the baselines stored in OrthodonticAnalysisBenchmarkBaselines.json
+(next to this file) and the test fails if any stage became much slower, or if a benchmark has no baseline.
+
+A baseline is either a measured time (seconds), which may be exceeded by the tolerance factor, or a ceiling
+({"ceiling": seconds}), which must not be exceeded at all. Ceilings are upper limits, not measurements: they are used
+for stages that require Slicer (reading points from markups nodes, computing single nodes, and generating reports)
+until their times are recorded on the machine that runs the benchmark. Measured times replace ceilings when
+baselines are updated.
+
+Environment variables:
+
+- ORTHODONTIC_ANALYSIS_BENCHMARK_BASELINES: baseline file path (default: next to this file).
+- ORTHODONTIC_ANALYSIS_BENCHMARK_UPDATE: if set to 1 then measured times are saved as new baselines
+  (and the test does not fail). Updated baselines should be reviewed before they are committed.
+- ORTHODONTIC_ANALYSIS_BENCHMARK_TOLERANCE: allowed slowdown factor (default: 2.0).
+
+Run the benchmark:
+
+  Slicer --no-main-window --python-script /path/to/OrthodonticAnalysisBenchmark.py
+
+Wall-clock times depend on the machine, therefore the benchmark is added to the tests only if
+the OrthodonticAnalysis_BENCHMARKS CMake option is enabled.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import slicer
+
+
+class OrthodonticAnalysisBenchmark(unittest.TestCase):
+
+  analysisTypes = ["Superior", "Inferior", "Bolton", "PeckAndPeck", "All"]
+
+  # Number of patients in cohorts that are computed in a single vectorized pass
+  cohortSizes = [1, 100, 10000, 100000]
+
+  # Number of patients that are loaded into markups nodes
+  numberOfNodes = 20
+
+  # Number of results rendered into a single CSV/JSON file
+  numberOfRenderedResults = 1000
+
+  def setUp(self):
+    slicer.mrmlScene.Clear()
+    self.reportFolder = tempfile.mkdtemp()
+    self.timings = {}
+
+  def tearDown(self):
+    shutil.rmtree(self.reportFolder, ignore_errors=True)
+
+  def runTest(self):
+    self.setUp()
+    try:
+      self.test_Benchmark()
+    finally:
+      self.tearDown()
+
+  def measure(self, name, function, *args, **kwargs):
+    from OrthodonticAnalysisLib.Benchmark import measureTime
+    self.timings[name] = measureTime(function, *args, **kwargs)
+    logging.info("{0}: {1:.6f}s".format(name, self.timings[name]))
+
+  def benchmarkComputeBatch(self, logic, analysisType):
+    from OrthodonticAnalysisLib.ReferenceLandmarks import generateCohort
+    pointNames = logic.getPointNames(analysisType)
+    for cohortSize in self.cohortSizes:
+      points = generateCohort(pointNames, cohortSize)
+      self.measure("computeBatch.{0}.{1}".format(analysisType, cohortSize), logic.computeBatch, analysisType, points)
+
+  def benchmarkNodes(self, logic, analysisType):
+    from OrthodonticAnalysisLib.ReferenceLandmarks import generateCohort
+    from OrthodonticAnalysisLib.ReportRenderers import getRenderer
+
+    pointNames = logic.getPointNames(analysisType)
+    nodes = []
+    for points in generateCohort(pointNames, self.numberOfNodes):
+      node = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLMarkupsFiducialNode")
+      slicer.util.updateMarkupsControlPointsFromArray(node, points)
+      nodes.append(node)
+
+    computeAnalysis = {
+      "Superior": logic.computeSuperiorSpaceAnalysis,
+      "Inferior": logic.computeInferiorSpaceAnalysis,
+      "Bolton": logic.computeBoltonAnalysis,
+      "PeckAndPeck": logic.computePeckAndPeckAnalysis,
+      "All": logic.computeAllAnalysis,
+      }[analysisType]
+
+    # Times are per node
+    def forEachNode(function, *args):
+      for node in nodes:
+        function(*args, node)
+    self.measure("getLabeledPoints.{0}".format(analysisType), forEachNode, logic.getLabeledPoints, pointNames)
+    self.timings["getLabeledPoints.{0}".format(analysisType)] /= self.numberOfNodes
+    self.measure("computeAnalysis.{0}".format(analysisType), forEachNode, computeAnalysis)
+    self.timings["computeAnalysis.{0}".format(analysisType)] /= self.numberOfNodes
+
+    # Rendering
+    results = computeAnalysis(nodes[0])
+    self.measure("render.html.{0}".format(analysisType), getRenderer("html").render, results, "screenshot.png", number=10)
+    resultsList = [results] * self.numberOfRenderedResults
+    for reportFormat in ["json", "csv"]:
+      self.measure("render.{0}.{1}.{2}".format(reportFormat, analysisType, self.numberOfRenderedResults),
+        getRenderer(reportFormat).render, resultsList)
+
+    # End-to-end report generation (compute, capture, render, write).
+    # Each report is written into a new folder, so that the report cache is not used.
+    captureSettings = logic.getCaptureSettings()
+    def computeReport():
+      logic.compute(analysisType, nodes[0], tempfile.mkdtemp(dir=self.reportFolder), captureSettings)
+    self.measure("compute.{0}".format(analysisType), computeReport)
+    # Report that has been already generated
+    logic.compute(analysisType, nodes[0], self.reportFolder, captureSettings)
+    self.measure("compute.{0}.cached".format(analysisType), logic.compute, analysisType, nodes[0], self.reportFolder, captureSettings, number=10)
+
+    for node in nodes:
+      slicer.mrmlScene.RemoveNode(node)
+
+  def test_Benchmark(self):
+    from OrthodonticAnalysis import OrthodonticAnalysisLogic
+    from OrthodonticAnalysisLib import Benchmark
+
+    logic = OrthodonticAnalysisLogic()
+    for analysisType in self.analysisTypes:
+      self.benchmarkComputeBatch(logic, analysisType)
+      self.benchmarkNodes(logic, analysisType)
+    logic.reportWriter.shutdown()
+
+    baselinesFilename = os.environ.get("ORTHODONTIC_ANALYSIS_BENCHMARK_BASELINES",
+      os.path.join(os.path.dirname(os.path.abspath(__file__)), "OrthodonticAnalysisBenchmarkBaselines.json"))
+    tolerance = float(os.environ.get("ORTHODONTIC_ANALYSIS_BENCHMARK_TOLERANCE", "2.0"))
+    baselines = Benchmark.loadBaselines(baselinesFilename)
+    logging.info("Benchmark results:\n" + Benchmark.formatTimings(self.timings, baselines))
+
+    if os.environ.get("ORTHODONTIC_ANALYSIS_BENCHMARK_UPDATE") == "1":
+      baselines.update(self.timings)
+      Benchmark.saveBaselines(baselinesFilename, baselines)
+      logging.info("Baselines are saved into {0}".format(baselinesFilename))
+      return
+
+    ceilings = Benchmark.findCeilings(baselines)
+    if ceilings:
+      logging.warning("Benchmarks compared to ceilings instead of measured baselines (run with"
+        " ORTHODONTIC_ANALYSIS_BENCHMARK_UPDATE=1 to record them):\n{0}".format("\n".join(ceilings)))
+
+    missingBaselines = Benchmark.findMissingBaselines(self.timings, baselines)
+    self.assertEqual(missingBaselines, [], "Benchmarks without baseline in {0} (run with ORTHODONTIC_ANALYSIS_BENCHMARK_UPDATE=1"
+      " to record them):\n{1}".format(baselinesFilename, "\n".join(missingBaselines)))
+
+    regressions = Benchmark.findRegressions(self.timings, baselines, tolerance)
+    self.assertEqual(regressions, [], "Performance regression (more than {0}x slower than baseline, or slower than ceiling):\n{1}".format(
+      tolerance, "\n".join("{0}: {1:.6f}s (baseline: {2:.6f}s)".format(*regression) for regression in regressions)))
+
+
+if __name__ == "__main__":
+  result = unittest.TextTestRunner(verbosity=2).run(unittest.defaultTestLoader.loadTestsFromTestCase(OrthodonticAnalysisBenchmark))
+  slicer.util.exit(0 if result.wasSuccessful() else 1)